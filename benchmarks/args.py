@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of command argument parsing
+
+Compares an ArgParser, compiled once when the command is added, with what
+handlers did before it: an argparse parser built for every message, and one
+built once but fed by shlex.  Reports microseconds per message.
+
+    python -m benchmarks.args
+"""
+
+import argparse
+import shlex
+import timeit
+
+from ciscosparkbot.args import Arg, ArgParser, Flag, Option
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+MESSAGES = (
+    "web",
+    "web 3 --env prod --dry-run",
+    '"web app" 12 --env=staging',
+)
+
+SPEC = [
+    Arg("service"),
+    Arg("replicas", type=int, default=1),
+    Option("env", choices=("staging", "prod"), default="staging"),
+    Flag("dry-run"),
+]
+
+
+def build_argparse():
+    parser = argparse.ArgumentParser(prog="/deploy", add_help=False)
+    parser.add_argument("service")
+    parser.add_argument("replicas", type=int, nargs="?", default=1)
+    parser.add_argument("--env", choices=("staging", "prod"),
+                        default="staging")
+    parser.add_argument("--dry-run", action="store_true")
+    return parser
+
+
+def per_message(text):
+    """An argparse parser built by the handler for each message"""
+    return build_argparse().parse_args(shlex.split(text))
+
+
+def run(number=5000):
+    compiled = ArgParser("/deploy", SPEC)
+    prebuilt = build_argparse()
+    rows = []
+    for text in MESSAGES:
+        built = timeit.timeit(lambda: per_message(text), number=number)
+        shared = timeit.timeit(
+            lambda: prebuilt.parse_args(shlex.split(text)), number=number)
+        spec = timeit.timeit(lambda: compiled.parse(text), number=number)
+        rows.append((text, built / number * 1e6, shared / number * 1e6,
+                     spec / number * 1e6))
+    return rows
+
+
+def main():
+    print("%-28s  %14s  %14s  %12s" % ("arguments", "argparse (us)",
+                                       "prebuilt (us)", "spec (us)"))
+    for text, built, shared, spec in run():
+        print("%-28s  %14.2f  %14.2f  %12.2f" % (text, built, shared, spec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark of file uploads
+
+Uploads large attachments to a local server and reports the high-water mark
+of memory allocated while sending each, as measured by tracemalloc: reading
+the file into memory as ciscosparkapi's files= upload used to, streaming it
+from disk, streaming it from a memory map, and sending it again as the URL
+of the first upload.
+
+    python -m benchmarks.files
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from ciscosparkbot.files import Attachment, FileUploader
+from ciscosparkbot.session import PooledHTTPAdapter, build_spark_api
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover - Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+SIZES_MB = (8, 64)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Reads and discards a message upload"""
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 65536)))
+        body = (b'{"id": "m1", "files": '
+                b'["https://api.example.com/v1/contents/c1"]}')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def in_memory(api, path):
+    """The upload reading the whole file first"""
+    with open(path, "rb") as f:
+        data = f.read()
+    api._session.post("messages", data=dict(roomId="room1"),
+                      files={"files": (os.path.basename(path), data)})
+
+
+def measure(func):
+    """
+    :return: Tuple of peak bytes allocated and seconds taken by func
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def run(sizes_mb=SIZES_MB):
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = "http://127.0.0.1:%d/v1/" % server.server_port
+    api = build_spark_api("somefaketoken", base_url=url,
+                          adapter=PooledHTTPAdapter())
+    directory = tempfile.mkdtemp()
+    rows = []
+    try:
+        for size in sizes_mb:
+            path = os.path.join(directory, "report-%d.bin" % size)
+            with open(path, "wb") as f:
+                chunk = os.urandom(1024 * 1024)
+                for _ in range(size):
+                    f.write(chunk)
+            payload = dict(roomId="room1", files=[path])
+            streamed = FileUploader()
+            mapped = FileUploader(use_mmap=True)
+            cached = FileUploader(reuse_uploads=True)
+            cached.create_message(api, payload)
+            rows.append((size, [
+                ("read into memory", measure(lambda: in_memory(api, path))),
+                ("streamed", measure(
+                    lambda: streamed.create_message(api, payload))),
+                ("memory mapped", measure(
+                    lambda: mapped.upload(api, payload,
+                                          Attachment(path, use_mmap=True)))),
+                ("cached URL", measure(
+                    lambda: cached.create_message(
+                        api, dict(payload, roomId="room2")))),
+            ]))
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+    return rows
+
+
+def main():
+    print("%-8s  %-18s  %12s  %10s" % ("file", "upload", "peak (KiB)",
+                                       "time (ms)"))
+    for size, results in run():
+        for name, (peak, elapsed) in results:
+            print("%-8s  %-18s  %12.0f  %10.1f"
+                  % ("%d MiB" % size, name, peak / 1024.0, elapsed * 1000))
+
+
+if __name__ == "__main__":
+    main()
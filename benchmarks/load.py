@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Load test of the webhook path
+
+Runs a SparkBot against the local Spark API simulator and posts webhooks to
+it at a fixed rate, with a mix of commands.  Reports webhook latency
+percentiles, throughput and Spark API calls per message, and can save the
+results as a baseline and compare later runs with it.
+
+    python -m benchmarks.load --rate 200 --duration 10
+    python -m benchmarks.load --latency 0.02 --rate-limit 0.01 --save main
+    python -m benchmarks.load --compare main
+
+Latency is measured from when each webhook was due to be sent, so a bot
+falling behind shows up in the percentiles rather than slowing the load.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from ciscosparkbot import SparkBot, __version__
+from ciscosparkbot.session import PooledHTTPAdapter
+
+from benchmarks.simulator import BOT_EMAIL, SparkSimulator
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Message text and weight
+DEFAULT_MIX = (("/echo hello", 6), ("/help", 2), ("/ping", 1),
+               ("no command here", 1))
+
+# Changes reported as regressions, as a fraction of the baseline
+TOLERANCE = 0.10
+
+
+def parse_mix(text):
+    """
+    :param text: Comma separated text=weight pairs, "/echo hi=3,/help=1"
+    :return: Tuple of (text, weight) pairs
+    """
+    mix = []
+    for part in text.split(","):
+        message, _, weight = part.rpartition("=")
+        mix.append((message, float(weight)))
+    return tuple(mix)
+
+
+def percentile(samples, fraction):
+    """
+    :param samples: Sorted list of samples
+    :param fraction: The percentile as a fraction, 0.99 for p99
+    :return: The nearest rank percentile
+    """
+    if not samples:
+        return 0.0
+    rank = max(int(round(fraction * len(samples) + 0.5)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def webhook(message_id, room_id):
+    return json.dumps({
+        "id": "webhook-1", "resource": "messages", "event": "created",
+        "data": {"id": message_id, "roomId": room_id, "roomType": "group",
+                 "personId": "person-" + message_id,
+                 "personEmail": "user@example.com"}})
+
+
+def build_bot(simulator, **options):
+    bot = SparkBot("loadtest", spark_bot_token="simulated-token",
+                   spark_api_url=simulator.url, spark_bot_email=BOT_EMAIL,
+                   spark_bot_url="http://127.0.0.1/webhook",
+                   http_adapter=PooledHTTPAdapter(pool_maxsize=64),
+                   **options)
+    bot.add_command("/ping", "Reply pong", lambda message: "pong")
+    # Failed webhooks are counted rather than logged
+    bot.logger.setLevel(logging.CRITICAL)
+    return bot
+
+
+def run(rate=100, duration=5.0, mix=DEFAULT_MIX, rooms=20, senders=32,
+        latency=0.0, jitter=0.0, rate_limit=0.0, retry_after=1,
+        error_rate=0.0, dispatch_workers=0, seed=1):
+    """
+    Drive a bot at a rate and measure it.
+    :param rate: Webhooks per second
+    :param duration: Seconds to send for
+    :param mix: Tuple of (message text, weight)
+    :param rooms: Rooms the messages are spread over
+    :param senders: Threads posting webhooks
+    :param latency: Simulated API latency in seconds
+    :param jitter: Random extra API latency, up to this many seconds
+    :param rate_limit: Fraction of API calls answered 429
+    :param retry_after: Retry-After of the 429s
+    :param error_rate: Fraction of API calls answered 500
+    :param dispatch_workers: The bot's dispatch_workers
+    :param seed: Random seed
+    :return: dict of results
+    """
+    simulator = SparkSimulator(latency=latency, jitter=jitter,
+                               rate_limit=0, error_rate=0, seed=seed)
+    simulator.start()
+    try:
+        bot = build_bot(simulator, dispatch_workers=dispatch_workers,
+                        dispatch_queue_size=max(rate * 10, 100))
+        # Setup is done; inject faults into the messages only
+        simulator.rate_limit = rate_limit
+        simulator.retry_after = retry_after
+        simulator.error_rate = error_rate
+
+        chooser = random.Random(seed)
+        texts = [text for text, _ in mix]
+        weights = [weight for _, weight in mix]
+        total = int(rate * duration)
+        schedule = []
+        for i in range(total):
+            message_id = "message-%d" % i
+            room_id = "room-%d" % (i % rooms)
+            simulator.add_message(message_id,
+                                  chooser.choices(texts, weights)[0],
+                                  room_id)
+            schedule.append((i / float(rate), webhook(message_id, room_id)))
+        simulator.reset()
+
+        latencies = []
+        failures = [0]
+        lock = threading.Lock()
+        cursor = [0]
+        start = time.time() + 0.1
+
+        def send():
+            client = bot.test_client()
+            while True:
+                with lock:
+                    i = cursor[0]
+                    cursor[0] += 1
+                if i >= total:
+                    return
+                due, body = schedule[i]
+                delay = start + due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                resp = client.post("/", data=body,
+                                   content_type="application/json")
+                elapsed = time.time() - (start + due)
+                with lock:
+                    latencies.append(elapsed)
+                    if resp.status_code != 200:
+                        failures[0] += 1
+
+        threads = [threading.Thread(target=send) for _ in range(senders)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        bot.shutdown()
+        elapsed = time.time() - start
+    finally:
+        simulator.stop()
+
+    latencies.sort()
+    return dict(
+        version=__version__, rate=rate, duration=duration, messages=total,
+        latency=latency, rate_limit=rate_limit, error_rate=error_rate,
+        dispatch_workers=dispatch_workers,
+        throughput=total / elapsed,
+        p50=percentile(latencies, 0.50), p95=percentile(latencies, 0.95),
+        p99=percentile(latencies, 0.99),
+        api_calls_per_message=simulator.api_calls() / float(total),
+        calls=dict(simulator.calls), throttled=simulator.throttled,
+        api_errors=simulator.errors, failed=failures[0],
+        python=sys.version.split()[0])
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, name + ".json")
+
+
+def save(results, name):
+    """
+    Save results as a named baseline.
+    :return: Path written
+    """
+    if not os.path.isdir(BASELINE_DIR):
+        os.makedirs(BASELINE_DIR)
+    path = baseline_path(name)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compare results with a baseline.
+    :return: list of (metric, baseline, current, change, regressed)
+    """
+    rows = []
+    # Lower is better for these, higher for throughput
+    for metric, lower_better in (("p50", True), ("p95", True), ("p99", True),
+                                 ("throughput", False),
+                                 ("api_calls_per_message", True)):
+        before, after = baseline[metric], results[metric]
+        change = (after - before) / before if before else 0.0
+        regressed = change > tolerance if lower_better else \
+            change < -tolerance
+        rows.append((metric, before, after, change, regressed))
+    return rows
+
+
+def report(results):
+    print("ciscosparkbot %s, %d messages at %d/s, API latency %.0fms, "
+          "%.1f%% 429s, %.1f%% errors"
+          % (results["version"], results["messages"], results["rate"],
+             results["latency"] * 1000, results["rate_limit"] * 100,
+             results["error_rate"] * 100))
+    print("  p50 %8.1f ms" % (results["p50"] * 1000))
+    print("  p95 %8.1f ms" % (results["p95"] * 1000))
+    print("  p99 %8.1f ms" % (results["p99"] * 1000))
+    print("  throughput %8.1f messages/s" % results["throughput"])
+    print("  API calls per message %.2f  (429s %d, errors %d)"
+          % (results["api_calls_per_message"], results["throttled"],
+             results["api_errors"]))
+    for endpoint, count in sorted(results["calls"].items()):
+        print("    %-24s %d" % (endpoint, count))
+    if results["failed"]:
+        print("  %d webhooks failed" % results["failed"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rate", type=int, default=100,
+                        help="webhooks per second")
+    parser.add_argument("--duration", type=float, default=5.0,
+                        help="seconds to send for")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help='message mix, "/echo hi=3,/help=1"')
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--senders", type=int, default=32,
+                        help="threads posting webhooks")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="fraction of API calls answered 429")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of API calls answered 500")
+    parser.add_argument("--dispatch-workers", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME",
+                        help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="NAME",
+                        help="compare with a saved baseline")
+    args = parser.parse_args(argv)
+
+    results = run(rate=args.rate, duration=args.duration, mix=args.mix,
+                  rooms=args.rooms, senders=args.senders,
+                  latency=args.latency, jitter=args.jitter,
+                  rate_limit=args.rate_limit, error_rate=args.error_rate,
+                  dispatch_workers=args.dispatch_workers)
+    report(results)
+
+    regressed = False
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+        print("Against %s (ciscosparkbot %s):"
+              % (args.compare, baseline.get("version")))
+        for metric, before, after, change, worse in compare(results,
+                                                            baseline):
+            regressed = regressed or worse
+            print("  %-22s %10.4f -> %10.4f  %+6.1f%%%s"
+                  % (metric, before, after, change * 100,
+                     "  REGRESSION" if worse else ""))
+    if args.save:
+        print("Saved %s" % save(results, args.save))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of building replies
+
+Reports how many replies per second can be created, addressed and turned into
+messages.create arguments, with Response and with the dict backed class it
+replaced.
+
+    python -m benchmarks.response
+"""
+
+import json
+import sys
+import timeit
+
+from ciscosparkbot.models import Response
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+class LegacyResponse(object):
+    """The previous Response: fields in a dict behind properties"""
+
+    def __init__(self, attributes=None):
+        if attributes:
+            self.attributes = attributes
+        else:
+            self.attributes = dict()
+            self.attributes['text'] = None
+            self.attributes['roomId'] = None
+            self.attributes['markdown'] = None
+            self.attributes['html'] = None
+            self.attributes['files'] = list()
+
+    @property
+    def text(self):
+        return self.attributes['text']
+
+    @text.setter
+    def text(self, val):
+        self.attributes['text'] = val
+
+    @property
+    def roomId(self):
+        return self.attributes['roomId']
+
+    @roomId.setter
+    def roomId(self, val):
+        self.attributes['roomId'] = val
+
+    @property
+    def markdown(self):
+        return self.attributes['markdown']
+
+    @markdown.setter
+    def markdown(self, val):
+        self.attributes['markdown'] = val
+
+    def as_dict(self):
+        ret = dict()
+        for k, v in self.attributes.items():
+            if v:
+                ret[k] = v
+        return ret
+
+    def json(self):
+        return json.dumps(self.attributes)
+
+
+def reply(cls):
+    """What a command and the bot do with a reply"""
+    r = cls()
+    r.markdown = "**Build finished** in 42s"
+    r.roomId = "Y2lzY29zcGFyazovL3VzL1JPT00vYmJjZWIxYWQtNDNmMS0zYjU4"
+    return r.as_dict()
+
+
+def reply_json(cls):
+    r = cls()
+    r.markdown = "**Build finished** in 42s"
+    r.roomId = "Y2lzY29zcGFyazovL3VzL1JPT00vYmJjZWIxYWQtNDNmMS0zYjU4"
+    return r.json()
+
+
+def run(number=200000):
+    rows = []
+    for name, func in (("as_dict", reply), ("json", reply_json)):
+        legacy = timeit.timeit(lambda: func(LegacyResponse), number=number)
+        current = timeit.timeit(lambda: func(Response), number=number)
+        rows.append((name, number / legacy, number / current))
+    return rows
+
+
+def main():
+    print("%-8s  %14s  %14s  %8s" % ("path", "legacy (/s)", "Response (/s)",
+                                     "speedup"))
+    for name, legacy, current in run():
+        print("%-8s  %14.0f  %14.0f  %7.2fx"
+              % (name, legacy, current, current / legacy))
+    print("instance size: legacy %d bytes (+ %d dict), Response %d bytes"
+          % (sys.getsizeof(LegacyResponse()),
+             sys.getsizeof(LegacyResponse().attributes),
+             sys.getsizeof(Response())))
+
+
+if __name__ == "__main__":
+    main()
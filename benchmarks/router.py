@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of command lookup
+
+Compares the CommandIndex automaton with the linear str.find scan SparkBot
+used before it, for 10, 100 and 1000 registered commands.
+
+    python -m benchmarks.router
+"""
+
+import timeit
+
+from ciscosparkbot.router import CommandIndex
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+SIZES = (10, 100, 1000)
+MESSAGES = (
+    "BotName /cmd{last} with some arguments after it",
+    "BotName just chatting in the room, no command in this one at all",
+)
+
+
+def linear_scan(commands, text):
+    """The original lookup from SparkBot.process_incoming_message"""
+    for c in commands.items():
+        if text.find(c[0]) != -1:
+            return c[0]
+    return ""
+
+
+def run(number=2000):
+    rows = []
+    for size in SIZES:
+        commands = dict(("/cmd%d" % i, None) for i in range(size))
+        index = CommandIndex(commands)
+        for template in MESSAGES:
+            text = template.format(last=size - 1)
+            scan = timeit.timeit(lambda: linear_scan(commands, text),
+                                 number=number)
+            trie = timeit.timeit(lambda: index.match(text), number=number)
+            rows.append((size, text[:24], scan / number * 1e6,
+                         trie / number * 1e6))
+    return rows
+
+
+def main():
+    print("%8s  %-24s  %12s  %12s" % ("commands", "message", "scan (us)",
+                                      "index (us)"))
+    for size, text, scan, trie in run():
+        print("%8d  %-24s  %12.2f  %12.2f" % (size, text, scan, trie))
+
+
+if __name__ == "__main__":
+    main()
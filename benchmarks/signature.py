@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of webhook signature verification
+
+Reports the time WebhookVerifier.verify adds per request for typical webhook
+body sizes, next to the cost of parsing the same body as JSON, and compares
+it with keying a new HMAC for every request.
+
+    python -m benchmarks.signature
+"""
+
+import hashlib
+import hmac
+import json
+import timeit
+
+from ciscosparkbot.security import WebhookVerifier
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+SECRET = "86dacc007724d8ea666f88fc77d918dad9537a15"
+SIZES = (512, 2048, 16384)
+
+
+def make_body(size):
+    """A webhook payload padded to roughly size bytes"""
+    data = {"id": "webhook_id", "resource": "messages", "event": "created",
+            "data": {"id": "message_id", "roomId": "room_id",
+                     "personEmail": "matt@example.com", "padding": ""}}
+    body = json.dumps(data)
+    data["data"]["padding"] = "x" * max(0, size - len(body))
+    return json.dumps(data).encode("utf-8")
+
+
+def fresh_hmac(body, signature):
+    """Verification without reusing the keyed HMAC"""
+    digest = hmac.new(SECRET.encode("utf-8"), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(digest, signature)
+
+
+def run(number=20000):
+    verifier = WebhookVerifier(SECRET)
+    rows = []
+    for size in SIZES:
+        body = make_body(size)
+        signature = verifier.sign(body)
+        verify = timeit.timeit(lambda: verifier.verify(body, signature),
+                               number=number)
+        fresh = timeit.timeit(lambda: fresh_hmac(body, signature),
+                              number=number)
+        parse = timeit.timeit(lambda: json.loads(body), number=number)
+        rows.append((len(body), verify / number * 1e6,
+                     fresh / number * 1e6, parse / number * 1e6))
+    return rows
+
+
+def main():
+    print("%8s  %12s  %12s  %12s" % ("bytes", "verify (us)", "rekey (us)",
+                                     "json (us)"))
+    for size, verify, fresh, parse in run():
+        print("%8d  %12.2f  %12.2f  %12.2f" % (size, verify, fresh, parse))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the Spark API
+
+Answers the calls a bot makes, over real HTTP with keep-alive, and can add
+latency, answer some calls with 429 Too Many Requests and others with
+server errors.  Counts the calls made, by endpoint.
+
+    simulator = SparkSimulator(latency=0.02, rate_limit=0.01)
+    simulator.start()
+    bot = SparkBot(..., spark_api_url=simulator.url)
+
+Classes:
+    SparkSimulator: The simulated API, served from a background thread.
+"""
+
+import collections
+import json
+import random
+import re
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # pragma: no cover - Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+BOT_ID = "simulated-bot-id"
+BOT_EMAIL = "bot@simulated.bot"
+
+_MESSAGE = re.compile(r"^/v1/messages/([^/?]+)")
+_WEBHOOK = re.compile(r"^/v1/webhooks/([^/?]+)")
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, as the Spark API does
+    protocol_version = "HTTP/1.1"
+    # The headers and body go out in separate writes; without this the
+    # client's delayed ACK adds 40ms to every call
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith(
+                "application/json") and data:
+            return json.loads(data.decode("utf-8"))
+        return data
+
+    def _reply(self, status, data=None, headers=None):
+        body = b"" if data is None else json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        simulator = self.server.simulator
+        path = self.path.split("?", 1)[0]
+        endpoint = simulator.endpoint(method, path)
+        body = self._body()
+        status, data, headers = simulator.answer(method, path, endpoint,
+                                                 body)
+        self._reply(status, data, headers)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class SparkSimulator(object):
+    """A simulated Spark API with injected latency, 429s and errors"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=0.0,
+                 retry_after=1, error_rate=0.0, seed=None):
+        """
+        :param latency: Seconds every call takes
+        :param jitter: Up to this many seconds added at random
+        :param rate_limit: Fraction of calls answered 429
+        :param retry_after: Retry-After seconds of a 429
+        :param error_rate: Fraction of calls answered 500
+        :param seed: Random seed, for repeatable runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.throttled = 0
+        self.errors = 0
+        # Message ID -> message dict, for GET /messages/<id>
+        self.messages = {}
+        self.webhooks = {}
+        self.sent = 0
+        self._server = None
+
+    @property
+    def url(self):
+        """
+        :return: Base URL of the API, for spark_api_url
+        """
+        return "http://127.0.0.1:%d/v1/" % self._server.server_port
+
+    def start(self):
+        """
+        Serve the API from a background thread.
+        :return:
+        """
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.simulator = self
+        t = threading.Thread(target=self._server.serve_forever,
+                             args=(0.05,), name="spark-simulator")
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        """
+        Stop serving.
+        :return:
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_message(self, message_id, text, room_id="room", person_id=None,
+                    person_email="user@example.com"):
+        """
+        Make a message available to GET /messages/<id>.
+        :return:
+        """
+        self.messages[message_id] = dict(
+            id=message_id, roomId=room_id, roomType="group", text=text,
+            personId=person_id or "person-" + message_id,
+            personEmail=person_email, created="2016-01-01T00:00:00.000Z")
+
+    # noinspection PyMethodMayBeStatic
+    def endpoint(self, method, path):
+        """
+        :return: Name of the endpoint a call is counted under
+        """
+        if _MESSAGE.match(path):
+            return method + " /messages/{id}"
+        if _WEBHOOK.match(path):
+            return method + " /webhooks/{id}"
+        return method + " " + path[3:]
+
+    def reset(self):
+        """
+        Forget the calls counted so far.
+        :return:
+        """
+        with self._lock:
+            self.calls.clear()
+            self.throttled = 0
+            self.errors = 0
+            self.sent = 0
+
+    def api_calls(self):
+        """
+        :return: Calls made, including those answered 429 or 500
+        """
+        with self._lock:
+            return sum(self.calls.values())
+
+    def answer(self, method, path, endpoint, body):
+        """
+        Work out the answer to a call.
+        :return: Tuple of status, JSON data and headers
+        """
+        with self._lock:
+            self.calls[endpoint] += 1
+            roll = self._random.random()
+            delay = self.latency + self._random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+        if roll < self.rate_limit:
+            with self._lock:
+                self.throttled += 1
+            return 429, {"message": "Too Many Requests"}, {
+                "Retry-After": str(self.retry_after)}
+        if roll < self.rate_limit + self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 500, {"message": "Simulated error"}, None
+
+        if endpoint == "GET /people/me":
+            return 200, dict(id=BOT_ID, emails=[BOT_EMAIL],
+                             displayName="Simulated Bot"), None
+        if endpoint == "GET /messages/{id}":
+            message = self.messages.get(_MESSAGE.match(path).group(1))
+            if message is None:
+                return 404, {"message": "Not found"}, None
+            return 200, message, None
+        if endpoint == "POST /messages":
+            with self._lock:
+                self.sent += 1
+            data = dict(body) if isinstance(body, dict) else {}
+            data.update(id="reply-%d" % self.sent)
+            return 200, data, None
+        if endpoint == "GET /webhooks":
+            return 200, {"items": list(self.webhooks.values())}, None
+        if endpoint == "POST /webhooks":
+            hook = dict(body, id="webhook-%d" % (len(self.webhooks) + 1),
+                        status="active")
+            self.webhooks[hook["id"]] = hook
+            return 200, hook, None
+        if endpoint == "PUT /webhooks/{id}":
+            hook = self.webhooks.setdefault(_WEBHOOK.match(path).group(1), {})
+            hook.update(body)
+            return 200, hook, None
+        if endpoint == "DELETE /webhooks/{id}":
+            self.webhooks.pop(_WEBHOOK.match(path).group(1), None)
+            return 204, None, None
+        return 404, {"message": "Not simulated"}, None
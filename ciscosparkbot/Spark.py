@@ -8,10 +8,45 @@ Classes:
 """
 
 from flask import Flask, request
-from ciscosparkapi import CiscoSparkAPI
-from ciscosparkbot.models import Response
-import sys
+from ciscosparkapi import SparkApiError
+from ciscosparkapi.models import spark_data_factory
+from ciscosparkbot.args import ArgumentError
+from ciscosparkbot.base import BotBase, saving_session
+from ciscosparkbot.bulkhead import BulkheadFull, CommandTimeout
+from ciscosparkbot.conversations import SessionStore
+from ciscosparkbot.dedup import DedupCache
+from ciscosparkbot.dispatch import Dispatcher
+from ciscosparkbot.files import FileUploader
+from ciscosparkbot.logs import correlation, enable_debug
+from ciscosparkbot.metrics import CONTENT_TYPE, Metrics
+from ciscosparkbot.middleware import CommandContext, build_chain
+from ciscosparkbot.models import (IncomingMessage, MultiResponse, Response,
+                                  message_target)
+from ciscosparkbot.scheduler import SendQueueFull, SendScheduler
+from ciscosparkbot.security import SIGNATURE_HEADER, WebhookVerifier
+from ciscosparkbot.session import PooledHTTPAdapter, build_spark_api
+from ciscosparkbot.startup import SetupLock
+from ciscosparkbot.webhooks import WebhookReconciler, WebhookSpec
+import atexit
+import functools
+import hashlib
+import logging
 import json
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ("eager", "background", "lazy", "external")
+
+# Metric labels of the stages of handling a webhook
+PARSE = (("stage", "parse"),)
+MESSAGES_GET = (("stage", "messages_get"),)
+SELF_CHECK = (("stage", "self_check"),)
+LOOKUP = (("stage", "lookup"),)
+MESSAGES_CREATE = (("stage", "messages_create"),)
+WEBHOOK = (("kind", "webhook"),)
+CALLBACK = (("kind", "callback"),)
 
 __author__ = "imapex"
 __author_email__ = "CiscoSparkBot@imapex.io"
@@ -19,13 +54,19 @@ __copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
 __license__ = "Apache 2.0"
 
 
-class SparkBot(Flask):
+class SparkBot(Flask, BotBase):
     """An instance of a Cisco Spark Bot"""
 
     def __init__(self, spark_bot_name, spark_bot_token=None,
                  spark_api_url=None,
                  spark_bot_email=None, spark_bot_url=None,
-                 default_action="/help", debug=False):
+                 default_action="/help", debug=False, identity_ttl=3600,
+                 dispatch_workers=0, dispatch_queue_size=100,
+                 anchored_commands=False, http_adapter=None,
+                 send_scheduler=None, dedup_cache=True, webhook_secret=None,
+                 startup="eager", setup_lock_file=None, metrics=None,
+                 broadcast_workers=8, file_uploader=None, dispatcher=None,
+                 session_store=True):
         """
         Initialize a new SparkBot
 
@@ -37,10 +78,58 @@ class SparkBot(Flask):
         :param default_action: What action to take if no command found.
                                Defaults to /help
         :param debug: boolean value for debut messages
+        :param identity_ttl: Seconds to cache the bot's own person ID before
+                             looking it up again.  None caches it forever.
+        :param dispatch_workers: When greater than 0, incoming webhooks are
+                                 queued and handled by this many background
+                                 workers, and the webhook returns right away.
+        :param dispatch_queue_size: Maximum number of queued webhooks before
+                                    the endpoint answers 503.
+        :param anchored_commands: Only recognize a command at the start of
+                                  the message text.
+        :param http_adapter: PooledHTTPAdapter carrying every Spark API call.
+                             Defaults to a new adapter with default pool
+                             sizes and timeouts.
+        :param send_scheduler: SendScheduler to queue replies on, so they
+                               are sent rate limited and retried on 429s.
+                               By default replies are sent inline.
+        :param dedup_cache: DedupCache used to ignore retried deliveries of
+                            a webhook.  True uses an in-memory cache, False
+                            turns deduplication off.
+        :param webhook_secret: Secret to register the webhook with.  When
+                               set, deliveries without a valid
+                               X-Spark-Signature are rejected.
+        :param startup: When to resolve the bot identity and set up the
+                        webhook.  "eager" does it while constructing the bot,
+                        "background" in a thread started by the constructor
+                        and "lazy" on the first request.  Until it is done
+                        /health answers 503.  "external" leaves it to
+                        another process, such as the workers of an
+                        ingress.
+        :param setup_lock_file: Lock file shared by the worker processes of
+                                a deployment, so only the first one to start
+                                reconciles the webhook.
+        :param metrics: Metrics to record into, served on /metrics.
+                        Defaults to a new Metrics.
+        :param broadcast_workers: Threads sending MultiResponse replies when
+                                  there is no send_scheduler
+        :param file_uploader: FileUploader sending replies with local files.
+                              Defaults to one streaming every upload.
+        :param dispatcher: Started queue to hand webhooks to instead of
+                           creating a Dispatcher, such as a BotHost's
+                           shared worker pool.  It needs the submit(),
+                           shutdown() and stats() of a Dispatcher.
+        :param session_store: SessionStore providing message.session to
+                              commands.  True uses an in-memory store,
+                              False turns sessions off.
         """
 
         super(SparkBot, self).__init__(spark_bot_name)
 
+        if startup not in STARTUP_MODES:
+            raise ValueError("startup must be one of " +
+                             ", ".join(STARTUP_MODES))
+
         # Verify required parameters provided
         if None in (spark_bot_name, spark_bot_token,
                     spark_bot_email, spark_bot_token):
@@ -49,38 +138,94 @@ class SparkBot(Flask):
                              )
 
         self.DEBUG = debug
+        if debug:
+            enable_debug()
         self.spark_bot_name = spark_bot_name
         self.spark_bot_token = spark_bot_token
         self.spark_bot_email = spark_bot_email
         self.spark_bot_url = spark_bot_url
-        self.default_action = default_action
+        self.spark_api_url = spark_api_url
+        self.webhook_secret = webhook_secret
+        # ReconcileResult of the last webhook setup
+        self.webhook_result = None
+        self.webhook_verifier = None
+        if webhook_secret:
+            self.webhook_verifier = WebhookVerifier(webhook_secret)
+
+        # Cached identity of the bot account, resolved in spark_setup()
+        self._init_identity(identity_ttl)
 
         # Create Spark API Object for interacting with Spark
-        if (spark_api_url):
-            self.spark = CiscoSparkAPI(access_token=spark_bot_token,
-                                       base_url=spark_api_url)
-        else:
-            self.spark = CiscoSparkAPI(access_token=spark_bot_token)
-
-        # A dictionary of commands this bot listens to
-        # Each key in the dictionary is a command, with associated help
-        # text and callback function
-        # By default supports 2 command, /echo and /help
-        self.commands = {"/echo": {
-                            "help": "Reply back with the same message sent.",
-                            "callback": self.send_echo
-                            },
-                         "/help": {
-                            "help": "Get help.",
-                            "callback": self.send_help
-                            }
-                         }
+        # All calls share the keep-alive connection pool of http_adapter
+        self.http_adapter = http_adapter or PooledHTTPAdapter()
+        self.spark = build_spark_api(spark_bot_token,
+                                     base_url=spark_api_url,
+                                     adapter=self.http_adapter)
+
+        # Streams file uploads, and may send repeated files as URLs
+        self.file_uploader = file_uploader or FileUploader()
+
+        # Default commands and the index used to find them in messages
+        self._init_commands(default_action, anchored_commands)
+
+        # Stage latencies and counters, served on /metrics
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.describe("webhooks_total", "counter",
+                              "Webhooks received, by outcome")
+        self.metrics.describe("commands_shed_total", "counter",
+                              "Commands answered busy or timed out, by "
+                              "command and reason")
+        self.metrics.describe("commands_rejected_total", "counter",
+                              "Commands answered with their usage, by "
+                              "command")
+        self.metrics.describe("reply_cache_total", "counter",
+                              "Lookups of cached replies, by command and "
+                              "outcome")
+        self.metrics.add_collector(self.collect_stats)
+
+        # Functions wrapping every command, see add_middleware
+        self.middleware = []
+        self._middleware_chain = None
+
+        # Message IDs already handled, so retried webhooks are ignored
+        if dedup_cache is True:
+            dedup_cache = DedupCache()
+        self.dedup_cache = dedup_cache or None
+
+        # Conversation state kept across messages, see message.session
+        if session_store is True:
+            session_store = SessionStore()
+        self.session_store = session_store or None
+
+        # Optional background dispatch of incoming webhooks
+        self.dispatcher = dispatcher
+        if dispatcher is None and dispatch_workers:
+            self.dispatcher = Dispatcher(self.handle_webhook,
+                                         workers=dispatch_workers,
+                                         max_queue=dispatch_queue_size)
+            self.dispatcher.start()
+
+        # Optional rate limited delivery of replies
+        self.send_scheduler = send_scheduler
+        if send_scheduler is not None:
+            self._start_scheduler(send_scheduler)
+
+        # Delivery of MultiResponse replies, created on first use unless
+        # they can go through send_scheduler
+        self.broadcast_workers = broadcast_workers
+        self._broadcast_scheduler = None
+        self._broadcast_lock = threading.Lock()
+
+        if self.dispatcher is not None or self.send_scheduler is not None:
+            atexit.register(self.shutdown)
 
         # Flask Application URLs
         # Basic Health Check for Flask Application
         self.add_url_rule('/health', 'health', self.health)
         # Endpoint to enable dynamically configuring account
         self.add_url_rule('/config', 'config', self.config_bot)
+        # Prometheus metrics
+        self.add_url_rule('/metrics', 'metrics', self.metrics_endpoint)
         # Spark WebHook Target
         self.add_url_rule('/',
                           'index',
@@ -88,7 +233,24 @@ class SparkBot(Flask):
                           methods=['POST'])
 
         # Setup the Spark WebHook and connections.
-        self.spark_setup()
+        self.startup = startup
+        self.ready = threading.Event()
+        self.setup_error = None
+        self.setup_lock = None
+        if setup_lock_file:
+            self.setup_lock = SetupLock(setup_lock_file)
+        self._setup_mutex = threading.RLock()
+        if startup == "eager":
+            self.spark_setup()
+        elif startup == "background":
+            t = threading.Thread(target=self._background_setup,
+                                 name="spark-setup")
+            t.daemon = True
+            t.start()
+        elif startup == "external":
+            self.ready.set()
+        else:
+            self.before_request(self._lazy_setup)
 
     # *** Bot Setup and Core Processing Functions
 
@@ -101,15 +263,89 @@ class SparkBot(Flask):
         globals()["spark_token"] = self.spark_bot_token
         globals()["bot_email"] = self.spark_bot_email
 
-        sys.stderr.write("Spark Bot Email: " + self.spark_bot_email + "\n")
-        sys.stderr.write("Spark Token: REDACTED\n")
+        logger.info("Spark Bot Email: %s", self.spark_bot_email)
+        logger.info("Spark Token: REDACTED")
+
+        with self._setup_mutex:
+            # Resolve the bot identity once so messages don't need
+            # people.me()
+            self.refresh_identity()
+
+            # Setup the Spark WebHook
+            self.webhook = self.reconcile_webhook()
+            globals()["webhook"] = self.webhook
+            logger.info("Configured Webhook ID: %s", self.webhook.id)
+
+            self.setup_error = None
+            self.ready.set()
+
+    def reconcile_webhook(self):
+        """
+        Set up the webhook, once per deployment when a setup lock file is
+        configured.
+        :return: WebHook
+        """
+        if self.setup_lock is None:
+            return self.setup_webhook(self.spark_bot_name, self.spark_bot_url)
+        # A different token, name, URL or secret sets the webhook up again
+        key = hashlib.sha256("|".join([
+            self.spark_bot_token, self.spark_bot_name,
+            self.spark_bot_url or "", self.webhook_secret or ""
+        ]).encode("utf-8")).hexdigest()
+        data = self.setup_lock.run(
+            key, lambda: self.setup_webhook(self.spark_bot_name,
+                                            self.spark_bot_url).to_dict())
+        return spark_data_factory("webhook", data)
+
+    def _background_setup(self, max_delay=60):
+        """
+        Run spark_setup, retrying with backoff until it succeeds.
+        :return:
+        """
+        delay = 1
+        while not self.ready.is_set():
+            try:
+                self.spark_setup()
+            except Exception as e:
+                self.setup_error = e
+                logger.warning("Spark setup failed, retrying in %ds", delay,
+                               exc_info=True)
+                time.sleep(delay)
+                delay = min(max_delay, delay * 2)
+
+    def _lazy_setup(self):
+        """
+        Flask before_request hook running spark_setup on the first request.
+        :return: A 503 response if setup failed
+        """
+        if self.ready.is_set():
+            return None
+        try:
+            with self._setup_mutex:
+                if not self.ready.is_set():
+                    self.spark_setup()
+        except Exception as e:
+            self.setup_error = e
+            logger.exception("Spark setup failed")
+            return "Spark Bot not ready", 503
+        return None
+
+    def refresh_identity(self):
+        """
+        Look up the bot's own person ID and cache it for identity_ttl seconds.
+        :return: The bot's person ID
+        """
+        return self._store_identity(self.spark.people.me().id)
 
-        # Setup the Spark Connection
-        globals()["spark"] = CiscoSparkAPI(access_token=self.spark_bot_token)
-        globals()["webhook"] = self.setup_webhook(self.spark_bot_name,
-                                                  self.spark_bot_url)
-        sys.stderr.write("Configuring Webhook. \n")
-        sys.stderr.write("Webhook ID: " + globals()["webhook"].id + "\n")
+    @property
+    def bot_person_id(self):
+        """
+        The bot's own person ID, refreshed once the cached value is stale.
+        :return: The bot's person ID
+        """
+        if self._identity_stale():
+            self.refresh_identity()
+        return self._bot_person_id
 
     # noinspection PyMethodMayBeStatic
     def setup_webhook(self, name, targeturl):
@@ -119,38 +355,17 @@ class SparkBot(Flask):
         :param targeturl: Target URL for WebHook
         :return: WebHook
         """
-        # Get a list of current webhooks
-        webhooks = self.spark.webhooks.list()
-
-        # Look for an Existing Webhook with this name, if found update it
-        wh = None
-        # webhooks is a generator
-        for h in webhooks:
-            if h.name == name:
-                sys.stderr.write("Found existing webhook.  Updating it.\n")
-                wh = h
-
-        # No existing webhook found, create new one
-        # we reached the end of the generator w/o finding a matching webhook
+        # Reconcile the bot's webhook, replacing the walk over every
+        # webhook and removing duplicates that cause repeated deliveries
+        spec = WebhookSpec(name, targeturl, secret=self.webhook_secret)
+        result = WebhookReconciler(self.spark).reconcile([spec])
+        self.webhook_result = result
+        logger.info("Reconciled webhooks: %s", result.as_dict())
+
+        wh = result.webhooks.get(name)
         if wh is None:
-            sys.stderr.write("Creating new webhook.\n")
-            wh = self.spark.webhooks.create(name=name,
-                                            targetUrl=targeturl,
-                                            resource="messages",
-                                            event="created")
-
-        # if we have an existing webhook update it
-        else:
-            # Need try block because if there are NO webhooks it throws error
-            try:
-                wh = self.spark.webhooks.update(webhookId=wh.id,
-                                                name=name,
-                                                targetUrl=targeturl)
-            # https://github.com/CiscoDevNet/ciscosparkapi/blob/master/ciscosparkapi/api/webhooks.py#L237
-            except Exception as e:
-                msg = "Encountered an error updating webhook: {}"
-                sys.stderr.write(msg.format(e))
-
+            # Creating the webhook failed
+            raise result.errors[0][2]
         return wh
 
     def config_bot(self):
@@ -203,129 +418,440 @@ class SparkBot(Flask):
     #                          'GET,PUT,POST,DELETE,OPTIONS')
     #     return response
 
-    # noinspection PyMethodMayBeStatic
     def health(self):
         """
         Flask App Health Check to verify Web App is up.
+        :return: Health status and statistics of the bot's subsystems
+        """
+        if not self.ready.is_set():
+            status = dict(status="starting")
+            if self.setup_error is not None:
+                status["error"] = str(self.setup_error)
+            return json.dumps(status), 503
+
+        status = dict(status="I'm Alive",
+                      http_pool=self.http_adapter.stats.as_dict())
+        if self.dispatcher is not None:
+            status["dispatch"] = self.dispatcher.stats()
+        if self.send_scheduler is not None:
+            status["send_scheduler"] = self.send_scheduler.stats()
+        if self._broadcast_scheduler is not None:
+            status["broadcast"] = self._broadcast_scheduler.stats()
+        if self.dedup_cache is not None:
+            status["dedup"] = self.dedup_cache.stats()
+        if self.session_store is not None:
+            status["sessions"] = self.session_store.stats()
+        status["reply_cache"] = self.reply_cache.stats()
+        bulkheads = self.bulkheads()
+        if bulkheads:
+            status["bulkheads"] = dict((b.name, b.stats())
+                                       for b in bulkheads)
+        return json.dumps(status)
+
+    def metrics_endpoint(self):
+        """
+        Flask App Prometheus metrics.
+        :return: The metrics in the Prometheus text format
+        """
+        return self.metrics.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+    def collect_stats(self):
+        """
+        Metrics collector reporting the statistics of the bot's subsystems.
+        :return: list of (name, labels, value) samples
+        """
+        stats = [("http_pool", self.http_adapter.stats.as_dict())]
+        if self.dispatcher is not None:
+            stats.append(("dispatch", self.dispatcher.stats()))
+        if self.send_scheduler is not None:
+            stats.append(("send_scheduler", self.send_scheduler.stats()))
+        if self._broadcast_scheduler is not None:
+            stats.append(("broadcast", self._broadcast_scheduler.stats()))
+        if self.dedup_cache is not None:
+            stats.append(("dedup", self.dedup_cache.stats()))
+        if self.session_store is not None:
+            stats.append(("sessions", self.session_store.stats()))
+        stats.append(("reply_cache", self.reply_cache.stats()))
+        stats.append(("files", self.file_uploader.stats()))
+        samples = [(prefix + "_" + name, (), value)
+                   for prefix, values in stats
+                   for name, value in sorted(values.items())]
+        for bulkhead in self.bulkheads():
+            labels = (("bulkhead", bulkhead.name),)
+            samples.extend(("bulkhead_" + name, labels, value)
+                           for name, value
+                           in sorted(bulkhead.stats().items()))
+        return samples
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting webhooks and finish any queued work and replies.
+        :param timeout: Seconds to wait for each queue to drain
+        :return: True if all queued work was handled
+        """
+        drained = True
+        if self.dispatcher is not None:
+            drained = self.dispatcher.shutdown(timeout) and drained
+        if self.send_scheduler is not None:
+            drained = self.send_scheduler.shutdown(timeout) and drained
+        if self._broadcast_scheduler is not None:
+            drained = self._broadcast_scheduler.shutdown(timeout) and drained
+        for bulkhead in self.bulkheads():
+            bulkhead.shutdown()
+        return drained
+
+    def send_message(self, payload):
+        """
+        Send a message, through the send scheduler when there is one.
+        :param payload: dict of arguments for messages.create
+        :return: False if the send scheduler's queue is full
+        """
+        if self.send_scheduler is None:
+            with self.metrics.time("stage_seconds", MESSAGES_CREATE):
+                self.file_uploader.create_message(self.spark, payload)
+            return True
+        target = message_target(payload)
+        if not self.send_scheduler.submit(target, payload):
+            logger.warning("Send queue full, dropping reply to %s", target)
+            return False
+        return True
+
+    def send_multi(self, room_id, multi):
+        """
+        Send the replies of a MultiResponse concurrently, rate limited
+        together with every other broadcast.  Unless the MultiResponse asks
+        to wait, returns once the messages are queued.
+        :param room_id: Room the command came from
+        :param multi: The MultiResponse
         :return:
         """
-        return "I'm Alive"
+        payloads = []
+        for response in multi.responses:
+            payload = response.as_dict()
+            if message_target(payload) is None:
+                payload["roomId"] = room_id
+            payloads.append(payload)
+        scheduler = self.broadcast_scheduler()
+        multi.delivery_started(len(payloads))
+        for payload in payloads:
+            target = message_target(payload)
+            if not scheduler.submit(target, payload,
+                                    functools.partial(multi.record, target)):
+                multi.record(target, None, SendQueueFull(target))
+        if multi.wait_for_delivery:
+            multi.wait()
+
+    def broadcast_scheduler(self):
+        """
+        The SendScheduler delivering MultiResponse replies: send_scheduler
+        if the bot has one, otherwise one created on first use.
+        :return: SendScheduler
+        """
+        if self.send_scheduler is not None:
+            return self.send_scheduler
+        with self._broadcast_lock:
+            if self._broadcast_scheduler is None:
+                scheduler = SendScheduler(workers=self.broadcast_workers)
+                self._start_scheduler(scheduler)
+                if self.dispatcher is None:
+                    atexit.register(self.shutdown)
+                self._broadcast_scheduler = scheduler
+        return self._broadcast_scheduler
+
+    def _start_scheduler(self, scheduler):
+        """
+        Give a SendScheduler a send function, if it has none, and start it.
+        :param scheduler: The SendScheduler
+        :return:
+        """
+        if scheduler.send is None:
+            # The scheduler must see 429s to follow Retry-After, so it
+            # sends with a client that does not sleep on them itself.
+            # It still shares this bot's connection pool.
+            sender = build_spark_api(self.spark_bot_token,
+                                     base_url=self.spark_api_url,
+                                     adapter=self.http_adapter,
+                                     wait_on_rate_limit=False)
+            scheduler.send = self._timed_create(sender)
+        scheduler.start()
+
+    def _timed_create(self, api):
+        """
+        Send messages with a Spark API client, recording their latency.
+        :param api: The CiscoSparkAPI
+        :return: Function sending a message
+        """
+        def create(**payload):
+            with self.metrics.time("stage_seconds", MESSAGES_CREATE):
+                return self.file_uploader.create_message(api, payload)
+        return create
 
     def process_incoming_message(self):
         """
-        Process an incoming message, determine the command and action,
-        and determine reply.
+        Spark WebHook target.  Handle the webhook inline, or queue it for the
+        dispatch workers when background dispatch is enabled.
         :return:
         """
 
+        # Check the signature on the raw body before parsing anything
+        if self.webhook_verifier is not None:
+            if not self.webhook_verifier.verify(
+                    request.get_data(cache=True),
+                    request.headers.get(SIGNATURE_HEADER)):
+                self.metrics.inc("webhooks_total",
+                                 (("outcome", "bad_signature"),))
+                return "Invalid signature", 403
+
         # Get the webhook data
-        post_data = request.json
+        with self.metrics.time("stage_seconds", PARSE):
+            post_data = request.get_json(force=True, silent=True)
+            valid = self.valid_payload(post_data)
+        if not valid:
+            self.metrics.inc("webhooks_total", (("outcome", "invalid"),))
+            return "Invalid webhook payload", 400
+
+        # Spark retries slow deliveries; only handle each message once
+        if (self.dedup_cache is not None and
+                self.dedup_cache.seen(post_data["data"]["id"])):
+            self.metrics.inc("webhooks_total", (("outcome", "duplicate"),))
+            logger.debug("Ignoring repeated webhook",
+                         extra={"correlation_id": post_data["data"]["id"]})
+            return ""
+
+        if self.dispatcher is not None:
+            if not self.dispatcher.submit(post_data):
+                self.forget_webhook(post_data)
+                self.metrics.inc("webhooks_total", (("outcome", "busy"),))
+                return "Bot busy, try again later", 503
+            self.metrics.inc("webhooks_total", (("outcome", "queued"),))
+            return ""
 
-        # Determine the Spark Room to send reply to
-        room_id = post_data["data"]["roomId"]
+        self.metrics.inc("webhooks_total", (("outcome", "handled"),))
+        return self.handle_webhook(post_data)
+
+    def handle_webhook(self, post_data):
+        """
+        Handle a webhook accepted by process_incoming_message.  If handling
+        fails, the message is forgotten by the dedup cache so a retried
+        delivery is processed again.
+        :param post_data: The webhook payload
+        :return: The reply sent, if any
+        """
+        self.metrics.inc("in_flight", WEBHOOK)
+        try:
+            # Records logged while handling the message carry its ID
+            with correlation(post_data["data"]["id"]):
+                return self.handle_message(post_data)
+        except Exception as e:
+            self.forget_webhook(post_data)
+            self.metrics.error(type(e), (("stage", "webhook"),))
+            raise
+        finally:
+            self.metrics.inc("in_flight", WEBHOOK, -1)
+
+    def forget_webhook(self, post_data):
+        """
+        Remove a webhook's message from the dedup cache.
+        :param post_data: The webhook payload
+        :return:
+        """
+        if self.dedup_cache is not None:
+            self.dedup_cache.forget(post_data["data"]["id"])
 
-        # Get the details about the message that was sent.
-        message_id = post_data["data"]["id"]
-        message = self.spark.messages.get(message_id)
-        if self.DEBUG:
-            sys.stderr.write("Message content:" + "\n")
-            sys.stderr.write(str(message) + "\n")
+    def handle_message(self, post_data):
+        """
+        Process an incoming message, determine the command and action,
+        and determine reply.
+        :param post_data: The webhook payload
+        :return: The reply sent, if any
+        """
 
         # First make sure not processing a message from the bots
         # Needed to avoid the bot talking to itself
         # We check using IDs instead of emails since the email
         # of the bot could change while the bot is running
         # for example from bot@sparkbot.io to bot@webex.bot
-        if message.personId in self.spark.people.me().id:
-            if self.DEBUG:
-                sys.stderr.write("Ignoring message from our self" + "\n")
+        # The webhook payload carries the sender, so this happens before
+        # spending an API call on fetching the message.
+        with self.metrics.time("stage_seconds", SELF_CHECK):
+            self_event = self.is_self_event(post_data)
+        if self_event:
+            logger.debug("Ignoring message from our self")
+            return ""
+
+        # The message details are only fetched once something needs them,
+        # so messages dropped by the filters cost no API calls
+        message = IncomingMessage(post_data["data"], self.fetch_message,
+                                  self.session_store)
+        if not self.accepts(message):
+            logger.debug("Message filtered out")
+            return ""
+
+        if message.personId == self.bot_person_id:
+            logger.debug("Ignoring message from our self")
             return ""
 
         # Log details on message
-        sys.stderr.write("Message from: " + message.personEmail + "\n")
+        logger.info("Message from: %s", message.personEmail)
 
-        # Find the command that was sent, if any
-        command = ""
-        for c in self.commands.items():
-            if message.text.find(c[0]) != -1:
-                command = c[0]
-                sys.stderr.write("Found command: " + command + "\n")
-                # If a command was found, stop looking for others
-                break
+        # Timings are only taken when a middleware will see them
+        chain = self._middleware_chain
+        context = None
+        if chain is not None:
+            context = CommandContext(self, message, post_data)
 
+        # Find the command that was sent, if any
+        text = message.text
+        if context is not None:
+            context.mark("fetch")
+        with self.metrics.time("stage_seconds", LOOKUP):
+            command, callback, message.command_end = \
+                self.find_callback(text)
+        logger.debug("Message content: %s", message)
+        if command:
+            logger.info("Found command: %s", command)
+
+        if context is None:
+            return self.run_command(message, command, callback)
+        context.mark("lookup")
+        context.command = command
+        context.callback = callback
+        return chain(context)
+
+    def run_command(self, message, command, callback, context=None):
+        """
+        Run a command callback and send its reply.
+        :param message: The IncomingMessage
+        :param command: The command found in the message, or ""
+        :param callback: The callback to run, or None
+        :param context: The CommandContext, when middleware is registered
+        :return: The reply sent, if any
+        """
         # Build the reply to the user
         reply = ""
 
         # Take action based on command
-        # If no command found, send the default_action
-        if command in [""] and self.default_action:
-            # noinspection PyCallingNonCallable
-            reply = self.commands[self.default_action]["callback"](message)
-        elif command in self.commands.keys():
-            # noinspection PyCallingNonCallable
-            reply = self.commands[command]["callback"](message)
-        else:
-            pass
-
-        # allow command handlers to craft their own Spark message
-        if reply and isinstance(reply, Response):
-            reply.roomId = room_id
-            reply = reply.as_dict()
-            self.spark.messages.create(**reply)
+        if callback is not None:
+            labels = (("command", command or "default"),)
+            self.metrics.inc("in_flight", CALLBACK)
+            try:
+                with self.metrics.time("callback_seconds", labels):
+                    reply = self.call_command(command, callback, message)
+                message.save_session()
+            finally:
+                self.metrics.inc("in_flight", CALLBACK, -1)
+        if context is not None:
+            context.mark("callback")
+
+        # allow command handlers to craft their own Spark message,
+        # sent to the room the message came from
+        if isinstance(reply, MultiResponse):
+            self.send_multi(message.roomId, reply)
             reply = "ok"
-        elif reply:
-            self.spark.messages.create(roomId=room_id, markdown=reply)
+        else:
+            payload = self.build_reply(message.roomId, reply)
+            if payload is not None:
+                self.send_message(payload)
+                if isinstance(reply, Response):
+                    reply = "ok"
+        if context is not None:
+            context.mark("reply")
+            context.reply = reply
         return reply
 
-    def add_command(self, command, help_message, callback):
+    def call_command(self, command, callback, message):
         """
-        Add a new command to the bot
-        :param command: The command string, example "/status"
-        :param help_message: A Help string for this command
-        :param callback: The function to run when this command is given
-        :return:
+        Parse the arguments of a command, then run its callback within the
+        command's concurrency limit and timeout, or answer from the reply
+        cache, if the command has them.
+        :param command: The command found in the message, or ""
+        :param callback: The callback to run
+        :param message: The IncomingMessage
+        :return: The callback's reply, or the usage, busy or timeout reply
         """
-        self.commands[command] = {"help": help_message, "callback": callback}
-
-    def remove_command(self, command):
+        entry = self.command_entry(command) or {}
+        name = command or "default"
+        try:
+            self.parse_args(command, entry, message)
+        except ArgumentError as e:
+            logger.info("Rejected arguments of %s: %s", name, e)
+            self.metrics.inc("commands_rejected_total", (("command", name),))
+            return entry["parser"].error_reply(e)
+        bulkhead = entry.get("bulkhead")
+        cache_ttl = entry.get("cache_ttl")
+        if bulkhead is None and not cache_ttl:
+            return callback(message)
+
+        def run():
+            if bulkhead is None:
+                return callback(message)
+            return bulkhead.run(saving_session(callback, message), message,
+                                entry.get("timeout"))
+
+        try:
+            if not cache_ttl:
+                return run()
+            reply, outcome = self.reply_cache.get_or_run(
+                self.reply_cache_key(command, entry, message), cache_ttl, run)
+            self.metrics.inc("reply_cache_total",
+                             (("command", name), ("outcome", outcome)))
+            return reply
+        except BulkheadFull:
+            logger.warning("Command %s is busy, shedding it", name)
+            self.metrics.inc("commands_shed_total",
+                             (("command", name), ("reason", "busy")))
+            return entry.get("busy_reply") or self.busy_reply
+        except CommandTimeout:
+            logger.warning("Command %s timed out after %ss", name,
+                           entry.get("timeout"))
+            self.metrics.inc("commands_shed_total",
+                             (("command", name), ("reason", "timeout")))
+            return self.timeout_reply
+
+    def _run_context(self, context):
         """
-        Remove a command from the bot
-        :param command: The command string, example "/status"
-        :return:
+        The innermost link of the middleware chain.
+        :param context: The CommandContext
+        :return: The reply sent, if any
         """
-        del self.commands[command]
+        return self.run_command(context.message, context.command,
+                                context.callback, context)
 
-    def extract_message(self, command, text):
+    def add_middleware(self, middleware):
         """
-        Return message contents following a given command.
-        :param command: Command to search for.  Example "/echo"
-        :param text: text to search within.
+        Add a command middleware.  The first added runs outermost.
+        See ciscosparkbot.middleware
+        :param middleware: Function taking a CommandContext and the next
+                           function of the chain
         :return:
         """
-        cmd_loc = text.find(command)
-        message = text[cmd_loc + len(command):]
-        return message
+        self.middleware.append(middleware)
+        self._middleware_chain = build_chain(self.middleware,
+                                             self._run_context)
 
-    # *** Default Commands included in Bot
-    def send_help(self, post_data):
+    def remove_middleware(self, middleware):
         """
-        Construct a help message for users.
-        :param post_data:
+        Remove a command middleware
+        :param middleware: A middleware given to add_middleware
         :return:
         """
-        message = "Hello!  "
-        message += "I understand the following commands:  \n"
-        for c in self.commands.items():
-            if c[1]["help"][0] != "*":
-                message += "* **%s**: %s \n" % (c[0], c[1]["help"])
-        return message
+        self.middleware.remove(middleware)
+        self._middleware_chain = None
+        if self.middleware:
+            self._middleware_chain = build_chain(self.middleware,
+                                                 self._run_context)
 
-    def send_echo(self, post_data):
+    def fetch_message(self, message_id):
         """
-        Sample command function that just echos back the sent message
-        :param post_data:
-        :return:
+        Get the details about a message that was sent.
+        :param message_id: The message ID
+        :return: Message
         """
-        # Get sent message
-        message = self.extract_message("/echo", post_data.text)
-        return message
+        try:
+            with self.metrics.time("stage_seconds", MESSAGES_GET):
+                return self.spark.messages.get(message_id)
+        except SparkApiError as e:
+            # A rejected token may mean the bot account changed
+            if e.response.status_code == 401:
+                self.invalidate_identity()
+            raise
@@ -0,0 +1,713 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio Cisco Spark Bot
+
+Classes:
+    AsyncSparkAPI: A small asyncio client for the Spark API calls a bot
+    makes, sharing one pooled keep-alive connector.
+    AsyncSparkBot: A Spark Bot served by aiohttp.  Same command surface as
+    SparkBot, but each in-flight message is a task instead of a thread.
+
+Requires aiohttp, installed with:  pip install ciscosparkbot[aio]
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from aiohttp import web
+from ciscosparkapi import DEFAULT_BASE_URL
+from ciscosparkapi.models import spark_data_factory
+
+from ciscosparkbot.args import ArgumentError
+from ciscosparkbot.base import BotBase
+from ciscosparkbot.bulkhead import BulkheadFull, CommandTimeout
+from ciscosparkbot.conversations import SessionStore
+from ciscosparkbot.files import Attachment, is_web_url
+from ciscosparkbot.logs import correlation, enable_debug
+from ciscosparkbot.models import (IncomingMessage, MultiResponse, Response,
+                                  message_target)
+from ciscosparkbot.replycache import COALESCED, HIT, MISS
+from ciscosparkbot.security import SIGNATURE_HEADER, WebhookVerifier
+from ciscosparkbot.webhooks import WebhookSpec, plan
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait after a 429 without a usable Retry-After header
+DEFAULT_RETRY_AFTER = 15
+
+
+def _retry_after(headers):
+    """
+    :param headers: Headers of a 429 response
+    :return: Whole seconds to wait, at least 1
+    """
+    try:
+        seconds = int(headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        # An HTTP date, or garbage
+        seconds = DEFAULT_RETRY_AFTER
+    return max(1, seconds)
+
+
+class AsyncSparkApiError(Exception):
+    """Error returned by the Spark API to an AsyncSparkAPI request"""
+
+    def __init__(self, status, body, retry_after=None):
+        super(AsyncSparkApiError, self).__init__(
+            "Response Code [{}] - {}".format(status, body))
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+class AsyncSparkAPI(object):
+    """asyncio client for the Spark messages, people and webhooks APIs"""
+
+    def __init__(self, access_token, base_url=DEFAULT_BASE_URL,
+                 max_connections=100, max_per_host=0, keepalive_timeout=15,
+                 timeout=60, wait_on_rate_limit=True):
+        """
+        Initialize a new AsyncSparkAPI.  The HTTP session is created on first
+        use, inside the running event loop.
+
+        :param access_token: Spark Auth Token
+        :param base_url: URL to the Spark/Webex API endpoint
+        :param max_connections: Total connections kept in the pool
+        :param max_per_host: Connections per host, 0 for no extra limit
+        :param keepalive_timeout: Seconds an idle connection is kept open
+        :param timeout: Seconds allowed for each API request
+        :param wait_on_rate_limit: Sleep for Retry-After and retry when the
+                                   API answers 429
+        """
+        self.access_token = access_token
+        self.base_url = base_url if base_url.endswith("/") else base_url + "/"
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.wait_on_rate_limit = wait_on_rate_limit
+        self._session = None
+
+    async def open(self):
+        """
+        Create the pooled HTTP session.
+        :return:
+        """
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_per_host,
+            keepalive_timeout=self.keepalive_timeout)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Authorization": "Bearer " + self.access_token})
+
+    async def close(self):
+        """
+        Close the HTTP session and its connections.
+        :return:
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method, url, erc=200, build_data=None, **kwargs):
+        """
+        Make an API request, following Retry-After on 429 responses.
+        :param method: HTTP method
+        :param url: Endpoint relative to base_url, or an absolute URL
+        :param erc: Expected response code
+        :param build_data: Function returning the request body, called for
+                           every attempt.  A multipart form is consumed
+                           when sent, so a retry needs a new one.
+        :param kwargs: Passed on to aiohttp
+        :return: Tuple of the decoded JSON body (None when empty) and the
+                 URL of the next page, if any
+        """
+        if self._session is None:
+            await self.open()
+        if not url.startswith("http"):
+            url = self.base_url + url
+        while True:
+            if build_data is not None:
+                kwargs["data"] = build_data()
+            async with self._session.request(method, url, **kwargs) as resp:
+                if resp.status == erc:
+                    body = None
+                    if resp.status != 204:
+                        body = await resp.json(content_type=None)
+                    next_link = resp.links.get("next")
+                    next_url = str(next_link["url"]) if next_link else None
+                    return body, next_url
+                retry_after = None
+                if resp.status == 429:
+                    retry_after = _retry_after(resp.headers)
+                    if self.wait_on_rate_limit:
+                        await asyncio.sleep(retry_after)
+                        continue
+                raise AsyncSparkApiError(resp.status, await resp.text(),
+                                         retry_after)
+
+    async def people_me(self):
+        """
+        Get the details of the person accessing the API.
+        :return: Person
+        """
+        data, _ = await self.request("GET", "people/me")
+        return spark_data_factory("person", data)
+
+    async def get_message(self, message_id):
+        """
+        Get the details of a message, by ID.
+        :param message_id: The message ID
+        :return: Message
+        """
+        data, _ = await self.request("GET", "messages/" + message_id)
+        return spark_data_factory("message", data)
+
+    async def create_message(self, files=None, **message):
+        """
+        Post a message to a room or person.
+        :param files: Optional list with one URL, local file path or
+                      Attachment
+        :param message: Message fields (roomId, text, markdown, ...)
+        :return: Message
+        """
+        if files and not is_web_url(files[0]):
+            attachment = Attachment.coerce(files[0])
+            opened = []
+
+            def build_form():
+                form = aiohttp.FormData()
+                for k, v in message.items():
+                    if v is not None:
+                        form.add_field(k, v)
+                # aiohttp reads the file in chunks as it sends it
+                f = attachment.open()
+                opened.append(f)
+                form.add_field("files", f, filename=attachment.filename,
+                               content_type=attachment.content_type)
+                return form
+
+            try:
+                data, _ = await self.request("POST", "messages",
+                                             build_data=build_form)
+            finally:
+                for f in opened:
+                    f.close()
+        else:
+            if files:
+                message["files"] = files
+            data, _ = await self.request("POST", "messages", json=message)
+        return spark_data_factory("message", data)
+
+    async def list_webhooks(self, max=100):
+        """
+        List every webhook, following pagination.
+        :param max: Page size to request
+        :return: list of Webhook
+        """
+        webhooks = []
+        data, url = await self.request("GET", "webhooks",
+                                       params={"max": max})
+        while True:
+            for item in data.get("items", []):
+                webhooks.append(spark_data_factory("webhook", item))
+            if not url:
+                return webhooks
+            data, url = await self.request("GET", url)
+
+    async def create_webhook(self, name, targetUrl, resource, event,
+                             filter=None, secret=None):
+        """
+        Create a webhook.
+        :return: Webhook
+        """
+        body = dict(name=name, targetUrl=targetUrl, resource=resource,
+                    event=event)
+        if filter:
+            body["filter"] = filter
+        if secret:
+            body["secret"] = secret
+        data, _ = await self.request("POST", "webhooks", json=body)
+        return spark_data_factory("webhook", data)
+
+    async def update_webhook(self, webhookId, name, targetUrl, secret=None,
+                             status=None):
+        """
+        Update a webhook's name, target URL, secret and status.
+        :return: Webhook
+        """
+        body = dict(name=name, targetUrl=targetUrl)
+        if secret:
+            body["secret"] = secret
+        if status:
+            body["status"] = status
+        data, _ = await self.request("PUT", "webhooks/" + webhookId,
+                                     json=body)
+        return spark_data_factory("webhook", data)
+
+    async def delete_webhook(self, webhookId):
+        """
+        Delete a webhook.
+        :return:
+        """
+        await self.request("DELETE", "webhooks/" + webhookId, erc=204)
+
+
+class AsyncSparkBot(BotBase):
+    """An instance of a Cisco Spark Bot served with aiohttp"""
+
+    def __init__(self, spark_bot_name, spark_bot_token=None,
+                 spark_api_url=None,
+                 spark_bot_email=None, spark_bot_url=None,
+                 default_action="/help", debug=False, identity_ttl=3600,
+                 anchored_commands=False, max_connections=100,
+                 max_per_host=0, executor_workers=None, webhook_secret=None,
+                 session_store=True):
+        """
+        Initialize a new AsyncSparkBot
+
+        :param spark_bot_name: Friendly name for this Bot (webhook name)
+        :param spark_bot_token: Spark Auth Token for Bot Account
+        :param spark_api_url: URL to the Spark/Webex API endpoint
+        :param spark_bot_email: Spark Bot Email Address
+        :param spark_bot_url: WebHook URL for this Bot
+        :param default_action: What action to take if no command found.
+                               Defaults to /help
+        :param debug: boolean value for debug messages
+        :param identity_ttl: Seconds to cache the bot's own person ID before
+                             looking it up again.  None caches it forever.
+        :param anchored_commands: Only recognize a command at the start of
+                                  the message text.
+        :param max_connections: Size of the Spark API connection pool
+        :param max_per_host: Connections per host, 0 for no extra limit
+        :param executor_workers: Threads used to run callbacks that are not
+                                 coroutine functions
+        :param webhook_secret: Secret to register the webhook with.  When
+                               set, deliveries without a valid
+                               X-Spark-Signature are rejected.
+        :param session_store: SessionStore providing message.session to
+                              commands.  True uses an in-memory store,
+                              False turns sessions off.  It is used from
+                              the event loop, so should not block.
+        """
+        # Verify required parameters provided
+        if None in (spark_bot_name, spark_bot_token, spark_bot_email):
+            raise ValueError("AsyncSparkBot requires spark_bot_name, "
+                             "spark_bot_token, spark_bot_email, "
+                             "spark_bot_url")
+
+        self.DEBUG = debug
+        if debug:
+            enable_debug()
+        self.spark_bot_name = spark_bot_name
+        self.spark_bot_token = spark_bot_token
+        self.spark_bot_email = spark_bot_email
+        self.spark_bot_url = spark_bot_url
+        self.webhook = None
+        self.webhook_secret = webhook_secret
+        self.webhook_verifier = None
+        if webhook_secret:
+            self.webhook_verifier = WebhookVerifier(webhook_secret)
+
+        self.spark = AsyncSparkAPI(spark_bot_token,
+                                   base_url=spark_api_url or DEFAULT_BASE_URL,
+                                   max_connections=max_connections,
+                                   max_per_host=max_per_host)
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers)
+
+        # Cached identity of the bot account, resolved in spark_setup()
+        self._init_identity(identity_ttl)
+        # Default commands and the index used to find them in messages
+        self._init_commands(default_action, anchored_commands)
+        # Reply cache key -> task working the reply out, so identical
+        # requests await one callback
+        self._reply_tasks = {}
+        # Sends of MultiResponses not waited for, awaited before closing
+        self._deliveries = set()
+
+        # Conversation state kept across messages, see message.session
+        if session_store is True:
+            session_store = SessionStore()
+        self.session_store = session_store or None
+
+        # aiohttp Application URLs
+        self.app = web.Application()
+        self.app.router.add_get("/health", self.health)
+        self.app.router.add_get("/config", self.config_bot)
+        self.app.router.add_post("/", self.process_incoming_message)
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+
+    def run(self, host="0.0.0.0", port=5000, **kwargs):
+        """
+        Serve the bot until interrupted.
+        :param host: Address to listen on
+        :param port: Port to listen on
+        :param kwargs: Passed on to aiohttp.web.run_app
+        :return:
+        """
+        web.run_app(self.app, host=host, port=port, **kwargs)
+
+    async def _on_startup(self, app):
+        await self.spark_setup()
+
+    async def _on_cleanup(self, app):
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+        await self.spark.close()
+        self.executor.shutdown(wait=True)
+
+    # *** Bot Setup and Core Processing Functions
+
+    async def spark_setup(self):
+        """
+        Setup the Spark Connection and WebHook
+        :return:
+        """
+        logger.info("Spark Bot Email: %s", self.spark_bot_email)
+        logger.info("Spark Token: REDACTED")
+
+        await self.refresh_identity()
+        self.webhook = await self.setup_webhook(self.spark_bot_name,
+                                                self.spark_bot_url)
+        logger.info("Configured Webhook ID: %s", self.webhook.id)
+
+    async def setup_webhook(self, name, targeturl):
+        """
+        Setup Spark WebHook to send incoming messages to this bot.
+        :param name: Name of the WebHook
+        :param targeturl: Target URL for WebHook
+        :return: WebHook
+        """
+        spec = WebhookSpec(name, targeturl, secret=self.webhook_secret)
+        hooks = [h.to_dict() for h in await self.spark.list_webhooks()]
+        creates, updates, deletes, unchanged = plan([spec], hooks)
+
+        calls = [self.spark.create_webhook(**spec.create_args())
+                 for spec in creates]
+        calls += [self.spark.update_webhook(**spec.update_args(hook["id"]))
+                  for spec, hook in updates]
+        calls += [self.spark.delete_webhook(hook["id"]) for hook in deletes]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        logger.info("Reconciled webhooks: created %d, updated %d, deleted %d",
+                    len(creates), len(updates), len(deletes))
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Encountered an error reconciling webhook: %s",
+                               result)
+        if creates:
+            if isinstance(results[0], Exception):
+                raise results[0]
+            return results[0]
+        if updates and not isinstance(results[0], Exception):
+            return results[0]
+        return spark_data_factory("webhook", (updates or unchanged)[0][1])
+
+    async def refresh_identity(self):
+        """
+        Look up the bot's own person ID and cache it for identity_ttl seconds.
+        :return: The bot's person ID
+        """
+        me = await self.spark.people_me()
+        return self._store_identity(me.id)
+
+    async def ensure_identity(self):
+        """
+        Refresh the cached person ID if it is stale.
+        :return: The bot's person ID
+        """
+        if self._identity_stale():
+            await self.refresh_identity()
+        return self._bot_person_id
+
+    @property
+    def bot_person_id(self):
+        """
+        The bot's own cached person ID.  Use ensure_identity() to refresh it.
+        :return: The bot's person ID
+        """
+        return self._bot_person_id
+
+    async def health(self, request):
+        """
+        Health Check to verify Web App is up.
+        :return:
+        """
+        return web.Response(text=json.dumps(dict(status="I'm Alive")))
+
+    async def config_bot(self, request):
+        """
+        Report the configuration of the Bot.
+        :return: Configuration Data for Bot
+        """
+        config_data = dict(SPARK_BOT_EMAIL=self.spark_bot_email,
+                           SPARK_BOT_TOKEN="--Redacted--",
+                           SPARK_BOT_URL=self.spark_bot_url,
+                           SPARK_BOT_NAME=self.spark_bot_name)
+        return web.Response(text=json.dumps(config_data))
+
+    async def process_incoming_message(self, request):
+        """
+        Spark WebHook target.
+        :param request: The aiohttp request
+        :return:
+        """
+        body = await request.read()
+        # Check the signature on the raw body before parsing anything
+        if self.webhook_verifier is not None:
+            if not self.webhook_verifier.verify(
+                    body, request.headers.get(SIGNATURE_HEADER)):
+                return web.Response(status=403, text="Invalid signature")
+        try:
+            post_data = json.loads(body.decode("utf-8"))
+        except ValueError:
+            post_data = None
+        if not self.valid_payload(post_data):
+            return web.Response(status=400, text="Invalid webhook payload")
+
+        # Records logged while handling the message carry its ID
+        with correlation(post_data["data"]["id"]):
+            reply = await self.handle_message(post_data)
+        return web.Response(text=reply or "")
+
+    async def handle_message(self, post_data):
+        """
+        Process an incoming message, determine the command and action,
+        and determine reply.
+        :param post_data: The webhook payload
+        :return: The reply sent, if any
+        """
+        room_id = post_data["data"]["roomId"]
+
+        await self.ensure_identity()
+        if self.is_self_event(post_data):
+            logger.debug("Ignoring message from our self")
+            return ""
+
+        # Filters only see the webhook payload, so dropped messages cost no
+        # API calls
+        message = IncomingMessage(post_data["data"],
+                                  sessions=self.session_store)
+        if not self.accepts(message):
+            return ""
+        if message.personId == self.bot_person_id:
+            return ""
+
+        try:
+            message.load(await self.spark.get_message(message.id))
+        except AsyncSparkApiError as e:
+            # A rejected token may mean the bot account changed
+            if e.status == 401:
+                self.invalidate_identity()
+            raise
+        logger.debug("Message content: %s", message)
+        logger.info("Message from: %s", message.personEmail)
+
+        command, callback, message.command_end = \
+            self.find_callback(message.text)
+        if command:
+            logger.info("Found command: %s", command)
+
+        reply = ""
+        if callback is not None:
+            reply = await self.call_command(command, callback, message)
+            await self.save_session(message)
+
+        if isinstance(reply, MultiResponse):
+            await self.send_multi(room_id, reply)
+            return "ok"
+
+        payload = self.build_reply(room_id, reply)
+        if payload is not None:
+            await self.spark.create_message(**payload)
+            if isinstance(reply, Response):
+                reply = "ok"
+        return reply
+
+    async def save_session(self, message, detached=False):
+        """
+        Save the session of a message on the executor, as the session store
+        may write to a file or a server.
+        :param message: The incoming message
+        :param detached: Saving once a limited callback returned, see
+                         run_limited
+        :return: True if the session store was written to
+        """
+        if not message.session_used:
+            return False
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, message.save_session,
+                                          detached)
+
+    async def send_multi(self, room_id, multi):
+        """
+        Send the replies of a MultiResponse concurrently.  Unless the
+        MultiResponse asks to wait, returns once the sends are started;
+        the app's cleanup waits for them.
+        :param room_id: Room the command came from
+        :param multi: The MultiResponse
+        :return:
+        """
+        payloads = []
+        for response in multi.responses:
+            payload = response.as_dict()
+            if message_target(payload) is None:
+                payload["roomId"] = room_id
+            payloads.append(payload)
+        multi.delivery_started(len(payloads))
+
+        async def send(payload):
+            target = message_target(payload)
+            try:
+                result = await self.spark.create_message(**payload)
+            except Exception as e:
+                multi.record(target, None, e)
+            else:
+                multi.record(target, result, None)
+
+        sends = asyncio.gather(*[send(payload) for payload in payloads])
+        if multi.wait_for_delivery:
+            await sends
+            return
+        # The event loop only keeps weak references to tasks
+        self._deliveries.add(sends)
+        sends.add_done_callback(self._deliveries.discard)
+
+    async def call_command(self, command, callback, message):
+        """
+        Parse the arguments of a command, then run its callback within the
+        command's concurrency limit and timeout, or answer from the reply
+        cache, if the command has them.
+        :param command: The command found in the message, or ""
+        :param callback: The command callback
+        :param message: The incoming message
+        :return: The callback's reply, or the usage, busy or timeout reply
+        """
+        entry = self.command_entry(command) or {}
+        name = command or "default"
+        try:
+            self.parse_args(command, entry, message)
+        except ArgumentError as e:
+            logger.info("Rejected arguments of %s: %s", name, e)
+            return entry["parser"].error_reply(e)
+        bulkhead = entry.get("bulkhead")
+        cache_ttl = entry.get("cache_ttl")
+        if bulkhead is None and not cache_ttl:
+            return await self.run_callback(callback, message)
+
+        def run():
+            if bulkhead is None:
+                return self.run_callback(callback, message)
+            return self.run_limited(bulkhead, entry.get("timeout"),
+                                    callback, message)
+
+        try:
+            if not cache_ttl:
+                return await run()
+            reply, _ = await self.cached_reply(
+                self.reply_cache_key(command, entry, message), cache_ttl, run)
+            return reply
+        except BulkheadFull:
+            logger.warning("Command %s is busy, shedding it", name)
+            return entry.get("busy_reply") or self.busy_reply
+        except CommandTimeout:
+            logger.warning("Command %s timed out after %ss", name,
+                           entry.get("timeout"))
+            return self.timeout_reply
+
+    async def cached_reply(self, key, ttl, compute):
+        """
+        ReplyCache.get_or_run for coroutines: answer from the reply cache,
+        or work the reply out once for every identical request.
+        :param key: Reply cache key
+        :param ttl: Seconds to keep the reply
+        :param compute: Function returning an awaitable of the reply
+        :return: Tuple of the reply and the outcome: "hit", "miss" or
+                 "coalesced"
+        """
+        cache = self.reply_cache
+        found, reply = cache.lookup(key)
+        if found:
+            return reply, HIT
+        task = self._reply_tasks.get(key)
+        outcome = COALESCED
+        if task is None:
+            outcome = MISS
+
+            async def work():
+                try:
+                    reply = await compute()
+                    cache.store(key, reply, ttl)
+                    return reply
+                finally:
+                    del self._reply_tasks[key]
+
+            task = self._reply_tasks[key] = asyncio.ensure_future(work())
+        cache.record(outcome)
+        # Waiting requests must not cancel the shared task
+        return await asyncio.shield(task), outcome
+
+    async def run_limited(self, bulkhead, timeout, callback, message):
+        """
+        Run a command callback within a bulkhead.  A callback that times
+        out keeps its slot until it returns, and the session is saved once it
+        does rather than when the bot replies.
+        :param bulkhead: The command's Bulkhead
+        :param timeout: Seconds to wait for the callback, or None
+        :param callback: The command callback
+        :param message: The incoming message
+        :return: The callback's reply
+        :raises BulkheadFull: when the callback was shed
+        :raises CommandTimeout: when it ran past the timeout
+        """
+        if not bulkhead.acquire():
+            raise BulkheadFull(bulkhead.name)
+
+        executor = None
+        if bulkhead.workers is not None:
+            executor = bulkhead.executor()
+
+        message.detach_session()
+
+        async def limited():
+            try:
+                reply = await self.run_callback(callback, message, executor)
+                await self.save_session(message, detached=True)
+                return reply
+            finally:
+                bulkhead.release()
+
+        task = asyncio.ensure_future(limited())
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            bulkhead.timed_out()
+            raise CommandTimeout(timeout)
+
+    async def run_callback(self, callback, message, executor=None):
+        """
+        Run a command callback.  Coroutine functions are awaited, anything
+        else runs on the executor so it cannot block the event loop.
+        :param callback: The command callback
+        :param message: The incoming message
+        :param executor: Executor to use instead of the bot's
+        :return: The callback's reply
+        """
+        if asyncio.iscoroutinefunction(callback):
+            return await callback(message)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor or self.executor,
+                                          callback, message)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Command arguments
+
+A command may declare its arguments when it is added.  The declaration is
+compiled into a parser once, the text after the command is parsed before
+the callback runs, and the callback reads the typed values from
+message.args.  Malformed text is answered with the error and the command's
+usage instead, and /help lists the usage of every command.
+
+    bot.add_command("/deploy", "Deploy a service", deploy, args=[
+        Arg("service"),
+        Arg("replicas", type=int, default=1),
+        Option("env", choices=("staging", "prod"), default="staging"),
+        Flag("dry-run"),
+    ])
+
+    def deploy(message):
+        args = message.args
+        return "Deploying %s x%d to %s" % (args.service, args.replicas,
+                                           args.env)
+
+"/deploy web 3 --env prod" gives service "web", replicas 3 and env "prod".
+Values may be quoted, "like this", to include spaces.  Option and flag
+names with dashes are read with underscores, args.dry_run.
+
+Classes:
+    Arg: A positional argument.
+    Option: A --name value option.
+    Flag: A --name switch, True when given.
+    Args: The parsed values, read as attributes or keys.
+    ArgParser: A command's compiled argument declaration.
+    ArgumentError: Raised for text that doesn't match it.
+"""
+
+import re
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+# Double quoted, single quoted, or a bare word
+_TOKEN = re.compile(r'"([^"]*)"|\'([^\']*)\'|(\S+)')
+
+_REQUIRED = object()
+
+
+class ArgumentError(ValueError):
+    """The text after a command doesn't match its arguments"""
+
+
+class Arg(object):
+    """A positional argument"""
+
+    def __init__(self, name, type=str, choices=None, default=_REQUIRED,
+                 help=None, rest=False):
+        """
+        :param name: Name the value is read by
+        :param type: Function converting the text, such as int or float
+        :param choices: Values allowed, after conversion
+        :param default: Value when not given.  Without one the argument is
+                        required.
+        :param help: Description, for the usage text
+        :param rest: Take the rest of the text as it is, spaces included.
+                     Only the last argument may.
+        """
+        self.name = name
+        self.type = type
+        self.choices = tuple(choices) if choices is not None else None
+        self.default = default
+        self.help = help
+        self.rest = rest
+
+    @property
+    def required(self):
+        return self.default is _REQUIRED
+
+    def usage(self):
+        text = "|".join(str(c) for c in self.choices) if self.choices \
+            else self.name
+        if self.rest:
+            text += "..."
+        return ("<%s>" if self.required else "[%s]") % text
+
+
+class Option(object):
+    """An option given as --name value or --name=value"""
+
+    def __init__(self, name, type=str, choices=None, default=None,
+                 help=None):
+        """
+        :param name: Option name, without the dashes
+        :param type: Function converting the text, such as int or float
+        :param choices: Values allowed, after conversion
+        :param default: Value when not given
+        :param help: Description, for the usage text
+        """
+        self.name = name
+        self.type = type
+        self.choices = tuple(choices) if choices is not None else None
+        self.default = default
+        self.help = help
+
+    def usage(self):
+        value = "|".join(str(c) for c in self.choices) if self.choices \
+            else "<%s>" % self.name
+        return "[--%s %s]" % (self.name, value)
+
+
+class Flag(object):
+    """A switch given as --name, False unless given"""
+
+    def __init__(self, name, help=None):
+        """
+        :param name: Flag name, without the dashes
+        :param help: Description, for the usage text
+        """
+        self.name = name
+        self.help = help
+        self.default = False
+
+    def usage(self):
+        return "[--%s]" % self.name
+
+
+class Args(dict):
+    """Parsed argument values, by name and as attributes"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def _key(name):
+    return name.replace("-", "_")
+
+
+def _convert(spec, text):
+    try:
+        value = spec.type(text)
+    except (TypeError, ValueError):
+        raise ArgumentError("%s must be %s, not %s"
+                            % (spec.name, _type_name(spec.type), text))
+    if spec.choices is not None and value not in spec.choices:
+        raise ArgumentError("%s must be one of %s"
+                            % (spec.name,
+                               ", ".join(str(c) for c in spec.choices)))
+    return value
+
+
+def _type_name(converter):
+    names = {int: "a whole number", float: "a number"}
+    return names.get(converter, getattr(converter, "__name__", "valid"))
+
+
+class ArgParser(object):
+    """A command's argument declaration, compiled once"""
+
+    def __init__(self, command, spec):
+        """
+        :param command: The command string, for the usage text
+        :param spec: Sequence of Arg, Option and Flag
+        :raises ValueError: for a declaration that can't be parsed
+        """
+        self.command = command
+        self.spec = tuple(spec)
+        self.positionals = []
+        # "--name" -> Option or Flag
+        self.options = {}
+        self.defaults = Args()
+        names = set()
+        optional_seen = False
+        for item in self.spec:
+            if item.name in names:
+                raise ValueError("Argument %s declared twice" % item.name)
+            names.add(item.name)
+            if isinstance(item, Arg):
+                if self.positionals and self.positionals[-1].rest:
+                    raise ValueError("Only the last argument may take the "
+                                     "rest of the text")
+                if item.required and optional_seen:
+                    raise ValueError("Required argument %s follows an "
+                                     "optional one" % item.name)
+                optional_seen = optional_seen or not item.required
+                self.positionals.append(item)
+                if not item.required:
+                    self.defaults[_key(item.name)] = item.default
+            else:
+                self.options["--" + item.name] = item
+                self.defaults[_key(item.name)] = item.default
+        self.required = sum(1 for arg in self.positionals if arg.required)
+        self.usage = " ".join(item.usage() for item in
+                              self.positionals + [
+                                  i for i in self.spec
+                                  if not isinstance(i, Arg)])
+
+    def parse(self, text):
+        """
+        Parse the text following the command.
+        :param text: The message text after the command
+        :return: Args of every declared name
+        :raises ArgumentError: for text that doesn't match the declaration
+        """
+        args = Args(self.defaults)
+        positionals = self.positionals
+        given = 0
+        tokens = _TOKEN.finditer(text or "")
+        for match in tokens:
+            word = match.group(3)
+            if word is not None and word.startswith("--"):
+                name, equals, value = word.partition("=")
+                option = self.options.get(name)
+                if option is None:
+                    raise ArgumentError("Unknown option %s" % name)
+                if isinstance(option, Flag):
+                    if equals:
+                        raise ArgumentError("%s takes no value" % name)
+                    args[_key(option.name)] = True
+                    continue
+                if not equals:
+                    following = next(tokens, None)
+                    if following is None:
+                        raise ArgumentError("%s needs a value" % name)
+                    value = _value(following)
+                args[_key(option.name)] = _convert(option, value)
+                continue
+
+            if given >= len(positionals):
+                raise ArgumentError("Unexpected %s" % _value(match))
+            arg = positionals[given]
+            if arg.rest:
+                args[_key(arg.name)] = _convert(
+                    arg, text[match.start():].strip())
+                given += 1
+                break
+            args[_key(arg.name)] = _convert(arg, _value(match))
+            given += 1
+
+        if given < self.required:
+            raise ArgumentError("Missing %s" % positionals[given].name)
+        return args
+
+    def help_text(self):
+        """
+        :return: The usage, with the described arguments one per line
+        """
+        lines = ["Usage: %s %s" % (self.command, self.usage)]
+        for item in self.spec:
+            if item.help:
+                label = item.name if isinstance(item, Arg) \
+                    else "--" + item.name
+                lines.append("%s: %s" % (label, item.help))
+        return "  \n".join(lines)
+
+    def error_reply(self, error):
+        """
+        :param error: The ArgumentError
+        :return: Markdown reply explaining it
+        """
+        return "%s  \n%s" % (error, self.help_text())
+
+
+def _value(match):
+    for group in match.groups():
+        if group is not None:
+            return group
+    return ""
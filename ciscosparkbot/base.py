@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Cisco Spark Bot shared behaviour
+
+Classes:
+    BotBase: Command registration, lookup, reply building and the default
+    commands shared by SparkBot and AsyncSparkBot.
+
+Functions:
+    saving_session: Wraps a callback to save its session when it returns.
+"""
+
+import time
+
+from ciscosparkbot.args import ArgParser
+from ciscosparkbot.bulkhead import Bulkhead
+from ciscosparkbot.help import HelpText
+from ciscosparkbot.models import Response
+from ciscosparkbot.replycache import ReplyCache
+from ciscosparkbot.router import CommandIndex
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+BUSY_REPLY = "Sorry, I'm busy with other requests.  Please try again shortly."
+TIMEOUT_REPLY = "Sorry, that took too long."
+
+
+def saving_session(callback, message):
+    """
+    Wrap a callback run by a bulkhead so it saves the message's session
+    itself once it returns.  A callback that timed out is still running when
+    the bot replies; saved then, its session would be written half changed
+    and its later changes lost.
+    :param callback: The command callback
+    :param message: The IncomingMessage it is run with
+    :return: Function taking the message
+    """
+    message.detach_session()
+
+    def call(message):
+        reply = callback(message)
+        message.save_session(detached=True)
+        return reply
+    return call
+
+
+class BotBase(object):
+    """Command handling common to every Spark Bot flavour"""
+
+    def _init_commands(self, default_action="/help", anchored_commands=False):
+        """
+        Set up the default commands and the command index.
+        :param default_action: What action to take if no command found.
+        :param anchored_commands: Only recognize a command at the start of
+                                  the message text.
+        :return:
+        """
+        self.default_action = default_action
+
+        # A dictionary of commands this bot listens to
+        # Each key in the dictionary is a command, with associated help
+        # text and callback function
+        # By default supports 2 command, /echo and /help
+        self.commands = {"/echo": {
+                            "help": "Reply back with the same message sent.",
+                            "callback": self.send_echo
+                            },
+                         "/help": {
+                            "help": "Get help.",
+                            "callback": self.send_help
+                            }
+                         }
+        # Index of the command strings used to find commands in messages,
+        # kept in step with self.commands by add_command and remove_command
+        self.command_index = CommandIndex(self.commands,
+                                          anchored=anchored_commands)
+
+        # The rendered /help reply, kept until a command is added or removed
+        self.help = HelpText(self.commands)
+        # "markdown", or "card" to answer /help with an adaptive card
+        self.help_format = "markdown"
+
+        # Replies sent when a command with limits is shed or times out,
+        # unless the command sets its own
+        self.busy_reply = BUSY_REPLY
+        self.timeout_reply = TIMEOUT_REPLY
+
+        # Replies of the commands added with a cache_ttl
+        self.reply_cache = ReplyCache()
+
+        # Functions deciding, before the message is fetched, whether a
+        # message is handled at all.  See ciscosparkbot.filters
+        self.filters = []
+
+    def _init_identity(self, identity_ttl=3600):
+        """
+        Set up the cache of the bot's own person ID.
+        :param identity_ttl: Seconds to cache the person ID.  None caches it
+                             forever.
+        :return:
+        """
+        self.identity_ttl = identity_ttl
+        self._bot_person_id = None
+        self._identity_expires = 0
+
+    def _store_identity(self, person_id):
+        """
+        Cache the bot's person ID for identity_ttl seconds.
+        :param person_id: The bot's person ID
+        :return: The bot's person ID
+        """
+        self._bot_person_id = person_id
+        if self.identity_ttl is None:
+            self._identity_expires = None
+        else:
+            self._identity_expires = time.time() + self.identity_ttl
+        return person_id
+
+    def _identity_stale(self):
+        """
+        Check whether the cached person ID must be looked up again.
+        :return: True if the identity needs refreshing
+        """
+        return (self._bot_person_id is None or
+                (self._identity_expires is not None and
+                 self._identity_expires <= time.time()))
+
+    def invalidate_identity(self):
+        """
+        Force the cached bot identity to be looked up on next use.
+        :return:
+        """
+        self._identity_expires = 0
+
+    def is_self_event(self, post_data):
+        """
+        Check the webhook payload for events caused by the bot itself.
+        This lets the bot ignore its own messages without fetching them.
+        :param post_data: The webhook payload
+        :return: True if the event was triggered by the bot account
+        """
+        bot_id = self.bot_person_id
+        if post_data.get("actorId") == bot_id:
+            return True
+        return post_data.get("data", {}).get("personId") == bot_id
+
+    # noinspection PyMethodMayBeStatic
+    def valid_payload(self, post_data):
+        """
+        Check that a webhook payload describes a message we can act on.
+        :param post_data: The webhook payload
+        :return: True if the payload is usable
+        """
+        if not isinstance(post_data, dict):
+            return False
+        data = post_data.get("data")
+        if not isinstance(data, dict):
+            return False
+        return "id" in data and "roomId" in data
+
+    def add_filter(self, message_filter):
+        """
+        Add a pre-fetch filter.  Messages are only handled when every filter
+        returns True for them.
+        :param message_filter: Function taking an IncomingMessage
+        :return:
+        """
+        self.filters.append(message_filter)
+
+    def remove_filter(self, message_filter):
+        """
+        Remove a pre-fetch filter
+        :param message_filter: A function given to add_filter
+        :return:
+        """
+        self.filters.remove(message_filter)
+
+    def accepts(self, message):
+        """
+        Run the pre-fetch filters over a message.
+        :param message: The IncomingMessage
+        :return: True if the bot should handle the message
+        """
+        for message_filter in self.filters:
+            if not message_filter(message):
+                return False
+        return True
+
+    def find_callback(self, text):
+        """
+        Determine the command in a message and the function handling it.
+        :param text: The message text
+        :return: Tuple of the command found ("" if none), its callback, or
+                 the default_action callback, and the offset in the text
+                 just past the command (0 if none).  The callback is None
+                 when there is nothing to run.
+        """
+        command, end = self.command_index.search(text)
+        if command in self.commands:
+            return command, self.commands[command]["callback"], end
+        # If no command found, send the default_action
+        if self.default_action:
+            return "", self.commands[self.default_action]["callback"], 0
+        return "", None, 0
+
+    # noinspection PyMethodMayBeStatic
+    def build_reply(self, room_id, reply):
+        """
+        Turn a callback result into arguments for messages.create.
+        :param room_id: The room to send the reply to
+        :param reply: A Response object or a markdown string
+        :return: dict of message arguments, or None if there is no reply
+        """
+        # allow command handlers to craft their own Spark message
+        if reply and isinstance(reply, Response):
+            payload = reply.as_dict()
+            # A reply addressed to a person goes to them instead
+            if not (reply.toPersonId or reply.toPersonEmail):
+                payload["roomId"] = room_id
+            return payload
+        elif reply:
+            return dict(roomId=room_id, markdown=reply)
+        return None
+
+    def add_command(self, command, help_message, callback, group=None,
+                    max_concurrency=None, timeout=None, bulkhead=None,
+                    busy_reply=None, cache_ttl=None, cache_key=None,
+                    args=None):
+        """
+        Add a new command to the bot
+        :param command: The command string, example "/status"
+        :param help_message: A Help string for this command
+        :param callback: The function to run when this command is given
+        :param group: Optional group the command is listed under in /help
+        :param max_concurrency: Callbacks of this command allowed to run at
+                                once.  Messages beyond it get busy_reply.
+        :param timeout: Seconds to wait for the callback before replying
+                        with the bot's timeout_reply.  The callback runs on
+                        a thread pool of its own.
+        :param bulkhead: Bulkhead shared with other commands, limiting them
+                         together instead of max_concurrency
+        :param busy_reply: Reply when the command is shed, instead of the
+                           bot's busy_reply
+        :param cache_ttl: Seconds to reuse a reply for the same text after
+                          the command, for commands that only look things
+                          up.  Identical requests waiting on a reply share it.
+        :param cache_key: What else a cached reply depends on: "room",
+                          "person", or a function of the IncomingMessage
+                          returning a key used instead of the text
+        :param args: Sequence of ciscosparkbot.args Arg, Option and Flag.
+                     The callback reads the parsed values from
+                     message.args, and text that doesn't match them is
+                     answered with the command's usage.
+        :return:
+        """
+        if bulkhead is not None and max_concurrency is not None:
+            raise ValueError("Set max_concurrency on the shared bulkhead")
+        if bulkhead is None and (max_concurrency or timeout):
+            bulkhead = Bulkhead(command, max_concurrency=max_concurrency)
+        parser = ArgParser(command, args) if args is not None else None
+        self.commands[command] = {"help": help_message, "callback": callback,
+                                  "group": group, "bulkhead": bulkhead,
+                                  "timeout": timeout,
+                                  "busy_reply": busy_reply,
+                                  "cache_ttl": cache_ttl,
+                                  "cache_key": cache_key,
+                                  "parser": parser}
+        self.command_index.add(command)
+        self.help.invalidate()
+        self.reply_cache.invalidate(command)
+
+    def command_entry(self, command):
+        """
+        The registration of a command found by find_callback.
+        :param command: The command found, or "" for the default_action
+        :return: dict of the command's help, callback and limits, or None
+        """
+        return self.commands.get(command or self.default_action)
+
+    def parse_args(self, command, entry, message):
+        """
+        Parse the arguments of a command declaring them into message.args.
+        :param command: The command found in the message
+        :param entry: The command's registration
+        :param message: The IncomingMessage
+        :return:
+        :raises ArgumentError: when the text doesn't match the declaration
+        """
+        parser = entry.get("parser")
+        if parser is not None:
+            message.args = parser.parse(self.command_text(command, message))
+
+    def reply_cache_key(self, command, entry, message):
+        """
+        The key of a message's cached reply: the command, the parsed
+        arguments or the text after it with its whitespace collapsed, and
+        the room or person if the command's cache_key asks for them.
+        :param command: The command found, or "" for the default_action
+        :param entry: The command's registration
+        :param message: The IncomingMessage
+        :return: A hashable key
+        """
+        name = command or self.default_action
+        scope = entry.get("cache_key")
+        if callable(scope):
+            return name, scope(message)
+        if message.args is not None:
+            key = (name, tuple(sorted(message.args.items())))
+        else:
+            text = self.command_text(command, message)
+            key = (name, " ".join(text.split()))
+        if scope == "room":
+            key += (message.roomId,)
+        elif scope == "person":
+            key += (message.personId,)
+        return key
+
+    def bulkheads(self):
+        """
+        :return: list of the distinct Bulkheads of the commands
+        """
+        found = []
+        for entry in self.commands.values():
+            bulkhead = entry.get("bulkhead")
+            if bulkhead is not None and bulkhead not in found:
+                found.append(bulkhead)
+        return found
+
+    def remove_command(self, command):
+        """
+        Remove a command from the bot
+        :param command: The command string, example "/status"
+        :return:
+        """
+        del self.commands[command]
+        self.command_index.remove(command)
+        self.help.invalidate()
+        self.reply_cache.invalidate(command)
+
+    def command_text(self, command, message):
+        """
+        The text following the command found in a message, sliced where
+        find_callback found it, so "/echoall /echo x" gives " x" for /echo.
+        :param command: The command found, or "" for the default_action
+        :param message: The IncomingMessage
+        :return: The text after the command
+        """
+        text = message.text or ""
+        end = getattr(message, "command_end", None)
+        if end is None:
+            # Not looked up by find_callback, such as a message built by hand
+            return self.extract_message(command, text) if command else text
+        return text[end:]
+
+    def extract_message(self, command, text):
+        """
+        Return message contents following a given command.
+        :param command: Command to search for.  Example "/echo"
+        :param text: text to search within.
+        :return:
+        """
+        cmd_loc = text.find(command)
+        message = text[cmd_loc + len(command):]
+        return message
+
+    # *** Default Commands included in Bot
+    def send_help(self, post_data):
+        """
+        Construct a help message for users.  The text following /help may
+        name a group and a page.
+        :param post_data:
+        :return: The cached help, in markdown or as a card Response
+        """
+        group, page = None, 1
+        text = getattr(post_data, "text", None) or ""
+        if self.help.command in text:
+            group, page = self.help.parse(
+                self.extract_message(self.help.command, text))
+        if self.help_format == "card":
+            return self.help.card(group, page)
+        return self.help.markdown(group, page)
+
+    def send_echo(self, post_data):
+        """
+        Sample command function that just echos back the sent message
+        :param post_data:
+        :return:
+        """
+        # Get sent message
+        return self.command_text("/echo", post_data)
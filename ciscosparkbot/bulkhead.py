@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrency limits and timeouts of command callbacks
+
+A Bulkhead caps how many callbacks of a command, or of a group of commands
+sharing it, run at once.  Callbacks beyond the limit are shed rather than
+queued, so one slow command can't take every webhook thread.  Given a
+timeout or its own workers, a bulkhead runs its callbacks on a separate
+thread pool and gives up waiting for those running too long; the callback
+keeps its slot until it returns.
+
+    reports = Bulkhead("reports", max_concurrency=2, workers=2)
+    bot.add_command("/report", "Build a report", report, bulkhead=reports,
+                    timeout=30)
+    bot.add_command("/status", "Slow status", status, max_concurrency=5)
+
+Classes:
+    Bulkhead: The limit, thread pool and statistics of commands.
+    BulkheadFull: Raised when a callback is shed.
+    CommandTimeout: Raised when a callback runs past its timeout.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from ciscosparkbot.logs import correlation, get_correlation_id
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+# Threads of a bulkhead with a timeout but no limit or workers given
+DEFAULT_WORKERS = 10
+
+
+class BulkheadFull(Exception):
+    """The bulkhead is running as many callbacks as it may"""
+
+
+class CommandTimeout(Exception):
+    """A callback ran longer than its timeout"""
+
+
+class Bulkhead(object):
+    """Limits the callbacks of one or more commands running at once"""
+
+    def __init__(self, name, max_concurrency=None, workers=None):
+        """
+        :param name: Name reported in the statistics and metrics
+        :param max_concurrency: Callbacks allowed to run at once; further
+                                ones are shed.  None for no limit.
+        :param workers: Threads of the bulkhead's own pool.  Without them
+                        callbacks run on the calling thread, unless given a
+                        timeout.  Defaults to max_concurrency.
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # Saturation counters, reported by stats()
+        self._active = 0
+        self._peak = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def acquire(self):
+        """
+        Take a slot for a callback.
+        :return: False if the bulkhead is full
+        """
+        with self._lock:
+            if (self.max_concurrency is not None and
+                    self._active >= self.max_concurrency):
+                self._rejected += 1
+                return False
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+            return True
+
+    def release(self):
+        """
+        Give back the slot of a callback that has returned.
+        :return:
+        """
+        with self._lock:
+            self._active -= 1
+            self._completed += 1
+
+    def timed_out(self):
+        """
+        Count a callback given up on.
+        :return:
+        """
+        with self._lock:
+            self._timeouts += 1
+
+    def executor(self):
+        """
+        The bulkhead's thread pool, created on first use.
+        :return: ThreadPoolExecutor
+        """
+        with self._lock:
+            if self._executor is None:
+                workers = (self.workers or self.max_concurrency or
+                           DEFAULT_WORKERS)
+                self._executor = ThreadPoolExecutor(workers)
+            return self._executor
+
+    def run(self, callback, message, timeout=None):
+        """
+        Run a callback within the bulkhead.
+        :param callback: The command callback
+        :param message: The IncomingMessage passed to it
+        :param timeout: Seconds to wait for the callback, or None
+        :return: The callback's reply
+        :raises BulkheadFull: when the callback was shed
+        :raises CommandTimeout: when it ran past the timeout
+        """
+        if not self.acquire():
+            raise BulkheadFull(self.name)
+        if timeout is None and self.workers is None:
+            try:
+                return callback(message)
+            finally:
+                self.release()
+
+        correlation_id = get_correlation_id()
+
+        def call():
+            try:
+                # Records the callback logs still carry the message ID
+                with correlation(correlation_id):
+                    return callback(message)
+            finally:
+                self.release()
+
+        try:
+            future = self.executor().submit(call)
+        except RuntimeError:
+            # The pool was shut down meanwhile
+            self.release()
+            raise BulkheadFull(self.name)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self.timed_out()
+            raise CommandTimeout(timeout)
+
+    def shutdown(self, wait=False):
+        """
+        Stop the bulkhead's thread pool, if it has one.
+        :param wait: Wait for running callbacks to return
+        :return:
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self):
+        """
+        Saturation statistics of the bulkhead.
+        :return: dict of counters
+        """
+        with self._lock:
+            stats = dict(active=self._active, peak=self._peak,
+                         completed=self._completed, rejected=self._rejected,
+                         timeouts=self._timeouts)
+        if self.max_concurrency is not None:
+            stats["limit"] = self.max_concurrency
+            stats["saturation"] = (stats["active"] /
+                                   float(self.max_concurrency))
+        return stats
@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+"""
+Conversation state kept across messages
+
+A session is a dict belonging to a room, a person, or a person within a
+room.  Commands read and change it through message.session, and the bot
+saves it once the command returns, so a multi-step command or a paging
+cursor doesn't need a global dict of its own.
+
+    def next_page(message):
+        cursor = message.session.get("cursor", 0)
+        message.session["cursor"] = cursor + 10
+        return render(cursor)
+
+Sessions are stored as compact JSON, compressed when large, so values must
+be JSON types.  A session is only loaded when a command reads it, and only
+written back when it changed.  Two messages in the same room handled at
+once each save their own copy; the last to finish wins.
+
+Functions:
+    dumps: Serializes a session.
+    loads: Reverses dumps.
+
+Classes:
+    Session: The dict of one conversation.
+    SessionBackend: Interface of a store of serialized sessions.
+    MemorySessionBackend: In process, bounded by count, bytes and age.
+    SQLiteSessionBackend: In a local SQLite file, bounded by count and age.
+    RedisSessionBackend: In Redis, shared by every replica of a bot.
+    SessionStore: Loads and saves the sessions of messages.
+"""
+
+import collections
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("room", "person", "room_person")
+
+# Serialized sessions larger than this are compressed
+COMPRESS_OVER = 512
+
+# Bytes of bookkeeping per session held in memory, besides its key and data
+_ENTRY_OVERHEAD = 120
+
+
+def dumps(data):
+    """
+    Serialize a session: compact JSON, zlib compressed when that is smaller.
+    :param data: dict of JSON types
+    :return: bytes
+    """
+    raw = json.dumps(data, separators=(",", ":"),
+                     sort_keys=True).encode("utf-8")
+    if len(raw) > COMPRESS_OVER:
+        packed = zlib.compress(raw)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"j" + raw
+
+
+def loads(blob):
+    """
+    :param blob: bytes from dumps
+    :return: The session dict
+    """
+    raw = blob[1:]
+    if blob[:1] == b"z":
+        raw = zlib.decompress(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+class Session(dict):
+    """The state of one conversation, saved after the command returns"""
+
+    def __init__(self, key, data=None, blob=None):
+        """
+        :param key: The session key
+        :param data: The stored state
+        :param blob: The stored state serialized, to tell if it changed
+        """
+        super(Session, self).__init__(data or {})
+        self.key = key
+        self.blob = blob
+
+
+class SessionBackend(object):
+    """A store of serialized sessions"""
+
+    def get(self, key):
+        """
+        Read a session, and keep it alive for another TTL.
+        :param key: The session key
+        :return: The serialized session, or None
+        """
+        raise NotImplementedError
+
+    def set(self, key, blob):
+        """
+        Write a session.
+        :param key: The session key
+        :param blob: The serialized session
+        :return:
+        :raises ValueError: for a session larger than the backend can keep
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Remove a session.
+        :param key: The session key
+        :return:
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        :return: dict of statistics
+        """
+        return {}
+
+    def __len__(self):
+        return 0
+
+
+class MemorySessionBackend(SessionBackend):
+    """Sessions kept in process, bounded in count, bytes and idle time"""
+
+    def __init__(self, max_size=10000, max_bytes=64 * 1024 * 1024,
+                 ttl=3600, clock=time.time):
+        """
+        :param max_size: Most sessions kept; the least recently used go
+                         first
+        :param max_bytes: Memory budget of the sessions, keys and
+                          bookkeeping, approximately
+        :param ttl: Seconds a session is kept after it was last used
+        :param clock: Function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expires, blob), least recently used first
+        self._items = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    # noinspection PyMethodMayBeStatic
+    def _cost(self, key, blob):
+        return sys.getsizeof(key) + sys.getsizeof(blob) + _ENTRY_OVERHEAD
+
+    def _remove(self, key):
+        expires, blob = self._items.pop(key)
+        self._bytes -= self._cost(key, blob)
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= now:
+                self._remove(key)
+                self.expirations += 1
+                return None
+            # Reinserted at the end, the most recently used
+            del self._items[key]
+            self._items[key] = (now + self.ttl, item[1])
+            return item[1]
+
+    def set(self, key, blob):
+        cost = self._cost(key, blob)
+        if cost > self.max_bytes:
+            # Storing it would only evict every session, itself included
+            raise ValueError("Session of %d bytes exceeds max_bytes %d"
+                             % (cost, self.max_bytes))
+        now = self.clock()
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (now + self.ttl, blob)
+            self._bytes += cost
+            self._evict(now)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+
+    def _evict(self, now):
+        items = self._items
+        while items and (len(items) > self.max_size or
+                         self._bytes > self.max_bytes):
+            self._remove(next(iter(items)))
+            self.evictions += 1
+        # Every use moves a session to the end with a fresh TTL, so the
+        # expired ones are at the front
+        while items:
+            key, (expires, _) = next(iter(items.items()))
+            if expires > now:
+                break
+            self._remove(key)
+            self.expirations += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(size=len(self._items), bytes=self._bytes,
+                        evictions=self.evictions,
+                        expirations=self.expirations)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions kept in a local SQLite file, bounded in count and idle time"""
+
+    # Writes between removals of expired and excess sessions
+    purge_every = 100
+
+    def __init__(self, path, max_size=100000, ttl=3600, clock=time.time):
+        """
+        :param path: Database file, or ":memory:"
+        :param max_size: Most sessions kept; the least recently used go
+                         first
+        :param ttl: Seconds a session is kept after it was last used
+        :param clock: Function returning the current time in seconds
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "key TEXT PRIMARY KEY, data BLOB NOT NULL, "
+                         "expires REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_expires "
+                         "ON sessions (expires)")
+
+    def get(self, key):
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, expires FROM sessions WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM sessions WHERE key = ?",
+                                 (key,))
+                self.expirations += 1
+                return None
+            self._db.execute("UPDATE sessions SET expires = ? WHERE key = ?",
+                             (now + self.ttl, key))
+            return bytes(row[0])
+
+    def set(self, key, blob):
+        now = self.clock()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions "
+                             "(key, data, expires) VALUES (?, ?, ?)",
+                             (key, sqlite3.Binary(blob), now + self.ttl))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge(now)
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def purge(self):
+        """
+        Remove expired sessions, then the least recently used beyond
+        max_size.
+        :return:
+        """
+        with self._lock:
+            self._purge(self.clock())
+
+    def _purge(self, now):
+        db = self._db
+        self.expirations += db.execute(
+            "DELETE FROM sessions WHERE expires <= ?", (now,)).rowcount
+        excess = self._count() - self.max_size
+        if excess > 0:
+            # Sessions expire a TTL after their last use, so the oldest
+            # expiry is the least recently used
+            self.evictions += db.execute(
+                "DELETE FROM sessions WHERE key IN (SELECT key FROM "
+                "sessions ORDER BY expires LIMIT ?)", (excess,)).rowcount
+
+    def _count(self):
+        return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        """
+        Close the database.
+        :return:
+        """
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(size=self._count(), evictions=self.evictions,
+                        expirations=self.expirations)
+
+    def __len__(self):
+        with self._lock:
+            return self._count()
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Sessions kept in Redis, shared by every replica of a bot.  Bound the
+    memory they use with Redis' maxmemory and an LRU eviction policy.
+    """
+
+    def __init__(self, client, prefix="ciscosparkbot:session:", ttl=3600):
+        """
+        :param client: A client with execute_command(), such as a
+                       RespClient or redis.Redis
+        :param prefix: Prefix of the Redis keys
+        :param ttl: Seconds a session is kept after it was last used
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        key = self.prefix + key
+        blob = self.client.execute_command("GET", key)
+        if blob is not None:
+            self.client.execute_command("PEXPIRE", key, int(self.ttl * 1000))
+        return blob
+
+    def set(self, key, blob):
+        self.client.execute_command("SET", self.prefix + key, blob, "PX",
+                                    int(self.ttl * 1000))
+
+    def delete(self, key):
+        self.client.execute_command("DEL", self.prefix + key)
+
+
+class SessionStore(object):
+    """Loads the session of a message and saves it when it changed"""
+
+    def __init__(self, backend=None, scope="room"):
+        """
+        :param backend: SessionBackend to keep sessions in.  Defaults to a
+                        MemorySessionBackend.
+        :param scope: "room" for a session per room, "person" per person
+                      wherever they write, or "room_person" per person
+                      within each room
+        """
+        if scope not in SCOPES:
+            raise ValueError("scope must be one of " + ", ".join(SCOPES))
+        self.backend = backend if backend is not None else \
+            MemorySessionBackend()
+        self.scope = scope
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.saves = 0
+        self.unchanged = 0
+        self.rejected = 0
+
+    def key(self, message):
+        """
+        :param message: The IncomingMessage
+        :return: The key of the message's session
+        """
+        if self.scope == "room":
+            return "room:" + message.roomId
+        if self.scope == "person":
+            return "person:" + message.personId
+        return "room:%s:person:%s" % (message.roomId, message.personId)
+
+    def load(self, message):
+        """
+        :param message: The IncomingMessage
+        :return: The message's Session, empty if there is none
+        """
+        return self.get(self.key(message))
+
+    def get(self, key):
+        """
+        :param key: A session key
+        :return: The Session, empty if there is none
+        """
+        blob = self.backend.get(key)
+        with self._lock:
+            self.loads += 1
+            if blob is not None:
+                self.hits += 1
+        if blob is None:
+            return Session(key)
+        return Session(key, loads(blob), blob)
+
+    def save(self, session):
+        """
+        Write a session back, if it changed.  An emptied session is
+        removed.  A session the backend refuses is logged and not saved;
+        the stored one is kept.
+        :param session: The Session
+        :return: True if the backend was written to
+        """
+        if not session:
+            if session.blob is None:
+                return False
+            self.backend.delete(session.key)
+            blob = None
+        else:
+            blob = dumps(session)
+            if blob == session.blob:
+                with self._lock:
+                    self.unchanged += 1
+                return False
+            try:
+                self.backend.set(session.key, blob)
+            except ValueError as e:
+                logger.warning("Session %s not saved: %s", session.key, e)
+                with self._lock:
+                    self.rejected += 1
+                return False
+        session.blob = blob
+        with self._lock:
+            self.saves += 1
+        return True
+
+    def stats(self):
+        """
+        Load and save counters, and those of the backend.
+        :return: dict of statistics
+        """
+        with self._lock:
+            stats = dict(loads=self.loads, hits=self.hits, saves=self.saves,
+                         unchanged=self.unchanged, rejected=self.rejected)
+        stats.update(self.backend.stats())
+        return stats
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Webhook deduplication
+
+Spark retries a webhook when the bot answers slowly or not at all.  The
+dedup cache remembers the message IDs already handled so a retried delivery
+does not run a command twice.
+
+Classes:
+    DedupBackend: Interface of a store of seen keys.
+    MemoryDedupBackend: A bounded in-process store with LRU and TTL eviction.
+    RedisDedupBackend: A store shared by several bot replicas, kept in Redis.
+    DedupCache: Checks keys against a backend and counts hits and misses.
+"""
+
+import collections
+import threading
+import time
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+class DedupBackend(object):
+    """A store of recently seen keys"""
+
+    def add(self, key):
+        """
+        Record a key, atomically.
+        :param key: The key to record
+        :return: True if the key was new, False if it had already been seen
+        """
+        raise NotImplementedError
+
+    def discard(self, key):
+        """
+        Forget a key so it is treated as new again.
+        :param key: The key to forget
+        :return:
+        """
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        """
+        Check for a key without recording it.
+        :param key: The key
+        :return: True if the key has been seen
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0
+
+
+class MemoryDedupBackend(DedupBackend):
+    """Seen keys kept in process, bounded in count and age"""
+
+    def __init__(self, max_size=10000, ttl=600, clock=time.time):
+        """
+        :param max_size: Most keys kept; the least recently seen go first
+        :param ttl: Seconds a key is remembered
+        :param clock: Function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        now = self.clock()
+        with self._lock:
+            # Popping and reinserting moves a key to the end; OrderedDict
+            # has no move_to_end on Python 2
+            expires = self._keys.pop(key, None)
+            if expires is not None and expires > now:
+                self._keys[key] = expires
+                return False
+            self._keys[key] = now + self.ttl
+            self._evict(now)
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            expires = self._keys.get(key)
+            return expires is not None and expires > self.clock()
+
+    def _evict(self, now):
+        keys = self._keys
+        while len(keys) > self.max_size:
+            keys.popitem(last=False)
+        # Expired keys collect at the front unless refreshed by a hit
+        while keys:
+            key, expires = next(iter(keys.items()))
+            if expires > now:
+                break
+            del keys[key]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class RedisDedupBackend(DedupBackend):
+    """Seen keys kept in Redis, shared by every replica of a bot"""
+
+    def __init__(self, client, prefix="ciscosparkbot:dedup:", ttl=600):
+        """
+        :param client: A Redis client with redis-py's set(), delete() and
+                       exists()
+        :param prefix: Prefix of the Redis keys
+        :param ttl: Seconds a key is remembered
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def add(self, key):
+        # SET NX succeeds for exactly one replica
+        return bool(self.client.set(self.prefix + key, "1",
+                                    nx=True, ex=self.ttl))
+
+    def discard(self, key):
+        self.client.delete(self.prefix + key)
+
+    def __contains__(self, key):
+        return bool(self.client.exists(self.prefix + key))
+
+
+class DedupCache(object):
+    """Detects repeated keys, counting hits and misses"""
+
+    def __init__(self, backend=None):
+        """
+        :param backend: DedupBackend to store keys in.  Defaults to a
+                        MemoryDedupBackend.
+        """
+        self.backend = backend if backend is not None else \
+            MemoryDedupBackend()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, key):
+        """
+        Check and record a key.
+        :param key: The key, such as a message ID
+        :return: True if the key was seen before
+        """
+        new = self.backend.add(key)
+        with self._lock:
+            if new:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return not new
+
+    def __contains__(self, key):
+        """
+        Check a key without recording it, for example to skip work that
+        is only recorded once done.
+        :param key: The key
+        :return: True if the key was seen before
+        """
+        return key in self.backend
+
+    def forget(self, key):
+        """
+        Forget a key, for example when handling it failed and a retry should
+        be processed.
+        :param key: The key
+        :return:
+        """
+        self.backend.discard(key)
+
+    def stats(self):
+        """
+        Hit and miss counters.
+        :return: dict of statistics
+        """
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        size=len(self.backend))
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Background dispatch of incoming webhooks
+
+Classes:
+    Dispatcher: A bounded in-process work queue drained by a pool of worker
+    threads.  Lets the webhook endpoint return as soon as a payload has been
+    accepted, while message fetches, callbacks and replies happen later.
+"""
+
+import logging
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # pragma: no cover - Python 2
+    import Queue as queue
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher(object):
+    """A pool of worker threads fed from a bounded queue"""
+
+    def __init__(self, handler, workers=4, max_queue=100, name="dispatch"):
+        """
+        Initialize a new Dispatcher
+
+        :param handler: Function called with each submitted item
+        :param workers: Number of worker threads
+        :param max_queue: Maximum number of items waiting to be handled.
+                          Submissions beyond this are rejected.
+        :param name: Prefix used for the worker thread names
+        """
+        if workers < 1:
+            raise ValueError("Dispatcher requires at least one worker")
+
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._accepting = False
+        # Set on shutdown; workers exit rather than take more items
+        self._stopping = threading.Event()
+
+        # Backpressure counters, reported by stats()
+        self._submitted = 0
+        self._rejected = 0
+        self._processed = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._high_water = 0
+
+    def start(self):
+        """
+        Start the worker threads.  Calling start() more than once is a no-op.
+        :return:
+        """
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work,
+                                     name="%s-%d" % (self.name, i))
+                t.daemon = True
+                t.start()
+                self._threads.append(t)
+            self._accepting = True
+
+    def submit(self, item):
+        """
+        Queue an item for the workers without blocking.
+        :param item: Item passed to the handler
+        :return: True if queued, False if the queue is full or shut down
+        """
+        if not self._accepting:
+            with self._lock:
+                self._rejected += 1
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+            depth = self._queue.qsize()
+            if depth > self._high_water:
+                self._high_water = depth
+        return True
+
+    def drain(self, timeout=None):
+        """
+        Wait for every queued item to be handled.
+        :param timeout: Seconds to wait, or None to wait forever
+        :return: True if the queue drained, False if the timeout expired
+        """
+        q = self._queue
+        deadline = None if timeout is None else time.time() + timeout
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                if deadline is None:
+                    q.all_tasks_done.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    q.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting work, drain the queue and stop the workers.
+        :param timeout: Seconds to wait for the queue to drain
+        :return: True if everything queued was handled
+        """
+        self._accepting = False
+        drained = self.drain(timeout)
+        self._stopping.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            # One sentinel per worker wakes it if idle.  A full queue means
+            # every worker is busy and sees _stopping once its item returns.
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for t in threads:
+            t.join(timeout)
+        return drained
+
+    def stats(self):
+        """
+        Current queue and worker counters.
+        :return: dict of statistics
+        """
+        with self._lock:
+            return dict(workers=len(self._threads),
+                        queue_depth=self._queue.qsize(),
+                        queue_max=self.max_queue,
+                        high_water=self._high_water,
+                        in_flight=self._in_flight,
+                        submitted=self._submitted,
+                        rejected=self._rejected,
+                        processed=self._processed,
+                        errors=self._errors)
+
+    def _work(self):
+        """
+        Worker thread loop.
+        :return:
+        """
+        while True:
+            item = self._queue.get()
+            if item is None or self._stopping.is_set():
+                # Items left after a timed out drain are abandoned
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self.handler(item)
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+                logger.exception("Error in %s worker", self.name)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._processed += 1
+                self._queue.task_done()
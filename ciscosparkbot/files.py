@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+File attachments
+
+A reply's file is uploaded as a multipart request streamed in chunks, from
+the file on disk, a memory map of it or a buffer already in memory, so a
+large attachment is never held in memory as a whole.
+
+The uploader can remember the content hash of what it sent and, the next
+time the same content is attached, send a URL instead of uploading it
+again: either the URL of the earlier upload or one returned by a publish
+function, for example after copying the file to shared storage.
+
+    uploader = FileUploader(publish=lambda attachment, digest:
+                            "https://files.example.com/" + digest)
+    bot = SparkBot(..., file_uploader=uploader)
+
+Classes:
+    Attachment: A file to upload: a path or a buffer, with a name.
+    FileUploader: Sends messages with files, streaming and caching uploads.
+"""
+
+import collections
+import hashlib
+import io
+import logging
+import mimetypes
+import mmap
+import os
+import threading
+
+from ciscosparkapi import spark_data_factory
+from requests_toolbelt import MultipartEncoder
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at a time when hashing
+CHUNK_SIZE = 64 * 1024
+
+try:
+    string_types = (str, unicode)  # noqa: F821
+except NameError:  # Python 3
+    string_types = (str,)
+
+
+def is_web_url(value):
+    """
+    :param value: An entry of a reply's files
+    :return: True if it is a URL Spark fetches itself
+    """
+    return (isinstance(value, string_types) and
+            value.split(":", 1)[0].lower() in ("http", "https"))
+
+
+def _byte_view(buffer):
+    """
+    :param buffer: Object supporting the buffer protocol
+    :return: A view of its bytes, sliced without copying.  A Python 2
+             memory map has no such view and is sliced itself.
+    """
+    try:
+        view = memoryview(buffer)
+    except TypeError:  # pragma: no cover - Python 2
+        return buffer
+    try:
+        return view.cast("B")
+    except AttributeError:  # pragma: no cover - Python 2
+        return view
+
+
+class _BufferReader(io.RawIOBase):
+    """
+    Reads a buffer, such as a memory map, without copying more than the
+    chunk asked for.
+    """
+
+    def __init__(self, buffer, close=None):
+        """
+        :param buffer: Object supporting the buffer protocol
+        :param close: Optional function releasing the buffer once read
+        """
+        io.RawIOBase.__init__(self)
+        self._view = _byte_view(buffer)
+        self._size = len(self._view)
+        self._position = 0
+        self._release = close
+
+    def __len__(self):
+        # The multipart encoder reads the size of a part as its length
+        # less the position
+        return self._size
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        start = self._position
+        if size is None or size < 0:
+            end = self._size
+        else:
+            end = min(start + size, self._size)
+        self._position = end
+        chunk = self._view[start:end]
+        if isinstance(chunk, memoryview):
+            return chunk.tobytes()
+        return chunk
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            # Python 2 views have nothing to release
+            release = getattr(self._view, "release", None)
+            if release is not None:
+                release()
+            if self._release is not None:
+                self._release()
+        io.RawIOBase.close(self)
+
+
+class Attachment(object):
+    """A file to upload with a reply"""
+
+    def __init__(self, source, filename=None, content_type=None,
+                 use_mmap=False):
+        """
+        :param source: Path of a local file, or a bytes-like buffer
+        :param filename: Name the file is shown with.  Defaults to the base
+                         name of the path.
+        :param content_type: MIME type, guessed from the name by default
+        :param use_mmap: Read a local file through a memory map rather than
+                         with reads
+        """
+        if isinstance(source, string_types):
+            self.path = source
+            self.buffer = None
+        else:
+            self.path = None
+            self.buffer = source
+            if filename is None:
+                raise ValueError("An Attachment of a buffer needs a filename")
+        self.filename = filename or os.path.basename(source)
+        self.content_type = (content_type or
+                             mimetypes.guess_type(self.filename)[0] or
+                             "application/octet-stream")
+        self.use_mmap = use_mmap
+
+    @classmethod
+    def coerce(cls, value):
+        """
+        :param value: An Attachment or a local file path
+        :return: An Attachment
+        """
+        if isinstance(value, cls):
+            return value
+        return cls(value)
+
+    @property
+    def size(self):
+        """
+        :return: Size of the content in bytes
+        """
+        if self.path is not None:
+            return os.path.getsize(self.path)
+        return len(_byte_view(self.buffer))
+
+    def open(self):
+        """
+        Open the content for reading.  A file is read as it is sent, and a
+        buffer without copying it.
+        :return: A binary file-like object; close it when done
+        """
+        if self.path is None:
+            return _BufferReader(self.buffer)
+        f = open(self.path, "rb")
+        if not self.use_mmap:
+            return f
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                # An empty file can't be mapped
+                return f
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return f
+        f.close()
+        return _BufferReader(mapped, close=mapped.close)
+
+    def cache_key(self):
+        """
+        Key identifying a local file's content without reading it, or None
+        for a buffer.
+        :return: Tuple of the path, size and modification time
+        """
+        if self.path is None:
+            return None
+        stat = os.stat(self.path)
+        return (os.path.realpath(self.path), stat.st_size, stat.st_mtime)
+
+    def digest(self):
+        """
+        Hash the content, a chunk at a time.
+        :return: Hex SHA-256 of the content
+        """
+        sha = hashlib.sha256()
+        if self.path is None:
+            sha.update(_byte_view(self.buffer))
+            return sha.hexdigest()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def __repr__(self):
+        return "Attachment(%r)" % (self.path or self.filename)
+
+
+class FileUploader(object):
+    """
+    Sends messages, uploading their file streamed, or replacing it with the
+    URL of the same content sent before.
+    """
+
+    def __init__(self, reuse_uploads=False, publish=None, cache_size=1024,
+                 use_mmap=False):
+        """
+        :param reuse_uploads: Send the content URL of an earlier upload of
+                              the same content instead of uploading it
+                              again.  Only for APIs that accept their own
+                              content URLs as files.
+        :param publish: Optional function called with an Attachment and its
+                        hash, returning a URL Spark can fetch it from.  When
+                        given, files are published once rather than
+                        uploaded.
+        :param cache_size: Most content hashes and URLs remembered; the least
+                           recently used go first
+        :param use_mmap: Read local files through a memory map
+        """
+        self.reuse_uploads = reuse_uploads
+        self.publish = publish
+        self.cache_size = cache_size
+        self.use_mmap = use_mmap
+        # File cache key -> hash, so unchanged files are not hashed again
+        self._digests = collections.OrderedDict()
+        # Hash -> URL of the content
+        self._urls = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def caching(self):
+        """
+        :return: True if repeated content is sent as a URL
+        """
+        return self.reuse_uploads or self.publish is not None
+
+    def create_message(self, api, payload):
+        """
+        Send a message, uploading its file if it has a local one.
+        :param api: CiscoSparkAPI to send with
+        :param payload: dict of arguments for messages.create.  files may
+                        hold a URL, a local path or an Attachment.
+        :return: The Message created
+        """
+        files = payload.get("files")
+        if not files or is_web_url(files[0]):
+            return api.messages.create(**payload)
+        if len(files) != 1:
+            raise ValueError("Only one file may be sent with a message")
+
+        attachment = files[0]
+        if not isinstance(attachment, Attachment):
+            attachment = Attachment(attachment, use_mmap=self.use_mmap)
+        if not self.caching:
+            return self.upload(api, payload, attachment)
+
+        digest = self._digest(attachment)
+        url = self._cached_url(digest)
+        if url is None and self.publish is not None:
+            url = self.publish(attachment, digest)
+            self._remember_url(digest, url)
+        if url is not None:
+            return api.messages.create(**dict(payload, files=[url]))
+
+        message = self.upload(api, payload, attachment)
+        uploaded = getattr(message, "files", None)
+        if uploaded:
+            self._remember_url(digest, uploaded[0])
+        return message
+
+    def upload(self, api, payload, attachment):
+        """
+        Post a message with its file as a streamed multipart request.
+        :param api: CiscoSparkAPI to send with
+        :param payload: dict of arguments for messages.create
+        :param attachment: The Attachment to upload
+        :return: The Message created
+        """
+        fields = [(key, value) for key, value in payload.items()
+                  if key != "files" and value is not None]
+        stream = attachment.open()
+        try:
+            body = MultipartEncoder(fields + [
+                ("files", (attachment.filename, stream,
+                           attachment.content_type))])
+            json_data = api._session.post(
+                "messages", data=body,
+                headers={"Content-type": body.content_type})
+        finally:
+            stream.close()
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += attachment.size
+        logger.debug("Uploaded %s (%d bytes)", attachment.filename,
+                     attachment.size)
+        return spark_data_factory("message", json_data)
+
+    def _digest(self, attachment):
+        key = attachment.cache_key()
+        if key is not None:
+            with self._lock:
+                digest = self._digests.pop(key, None)
+                if digest is not None:
+                    # Reinserted at the end, the most recently used
+                    self._digests[key] = digest
+                    return digest
+        digest = attachment.digest()
+        if key is not None:
+            with self._lock:
+                self._digests[key] = digest
+                self._trim(self._digests)
+        return digest
+
+    def _cached_url(self, digest):
+        with self._lock:
+            url = self._urls.pop(digest, None)
+            if url is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._urls[digest] = url
+            return url
+
+    def _remember_url(self, digest, url):
+        if not url:
+            return
+        with self._lock:
+            self._urls[digest] = url
+            self._trim(self._urls)
+
+    def _trim(self, cache):
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def forget(self, digest=None):
+        """
+        Forget the URL of some content, or of all of it, for example when a
+        published URL has expired.
+        :param digest: Hash of the content, None for every URL
+        :return:
+        """
+        with self._lock:
+            if digest is None:
+                self._urls.clear()
+            else:
+                self._urls.pop(digest, None)
+
+    def stats(self):
+        """
+        Upload and cache counters.
+        :return: dict of statistics
+        """
+        with self._lock:
+            return dict(uploads=self.uploads,
+                        uploaded_bytes=self.uploaded_bytes,
+                        hits=self.hits, misses=self.misses,
+                        cached=len(self._urls))
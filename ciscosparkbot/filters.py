@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-fetch message filters
+
+Filters decide whether a bot handles a message using only the fields the
+webhook payload carries, so messages they drop cost no Spark API calls.
+A filter is any function taking an IncomingMessage and returning True to
+keep it.  Register them with SparkBot.add_filter().
+
+Functions:
+    room_allowlist: Keep messages from the given rooms.
+    direct_only: Keep messages from 1:1 rooms.
+    mention_only: Keep messages that mention the bot, and direct messages.
+"""
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+def room_allowlist(room_ids):
+    """
+    Keep only messages posted in the given rooms.
+    :param room_ids: Iterable of room IDs
+    :return: filter function
+    """
+    allowed = frozenset(room_ids)
+
+    def in_allowed_room(message):
+        return message.roomId in allowed
+    return in_allowed_room
+
+
+def direct_only():
+    """
+    Keep only messages posted in 1:1 rooms.
+    :return: filter function
+    """
+    def is_direct(message):
+        return message.roomType == "direct"
+    return is_direct
+
+
+def mention_only(bot, allow_direct=True):
+    """
+    Keep only messages that mention the bot.
+    :param bot: The bot, used for its bot_person_id
+    :param allow_direct: Also keep every message in 1:1 rooms, where users
+                         do not mention the bot
+    :return: filter function
+    """
+    def mentions_bot(message):
+        if allow_direct and message.roomType == "direct":
+            return True
+        return bot.bot_person_id in message.mentionedPeople
+    return mentions_bot
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Help text
+
+/help is also the default action, so its reply is built for every message
+that matches no command.  HelpText renders it once and keeps it until a
+command is added or removed.
+
+Commands may be put in groups, and a bot with more commands than fit on a
+page answers /help a page at a time:
+
+    /help               first page, commands under their group headings
+    /help 2             second page
+    /help admin         the commands of the admin group
+    /help admin 2       its second page
+
+Classes:
+    HelpText: Renders and caches the help reply, as markdown or as a card.
+"""
+
+from ciscosparkbot.models import Response
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+GREETING = "Hello!  I understand the following commands:  \n"
+
+
+class HelpText(object):
+    """The rendered help of a bot's commands, cached until they change"""
+
+    def __init__(self, commands, page_size=25, command="/help"):
+        """
+        :param commands: The bot's dict of commands.  Help strings starting
+                         with "*" are hidden.
+        :param page_size: Most commands listed in one reply
+        :param command: The help command, named in the page footer
+        """
+        self.commands = commands
+        self.page_size = page_size
+        self.command = command
+        # (form, group, page) -> rendered reply.  Replaced, not cleared, by
+        # invalidate(), so a render racing with it caches into the old dict
+        self._cache = {}
+        # The entries, group names and page counts the replies are rendered
+        # from, forgotten with them
+        self._layout = None
+
+    def invalidate(self):
+        """
+        Forget the rendered help.  Called whenever a command is added or
+        removed.
+        :return:
+        """
+        self._cache = {}
+        self._layout = None
+
+    def layout(self):
+        """
+        The visible commands, worked out once until they change.
+        :return: Tuple of the entries, the group names and a dict of the
+                 page count of each group, None for the whole help
+        """
+        layout = self._layout
+        if layout is None:
+            groups = {None: []}
+            for command, details in list(self.commands.items()):
+                help_message = details.get("help") or ""
+                if help_message.startswith("*"):
+                    continue
+                parser = details.get("parser")
+                usage = parser.usage if parser is not None else ""
+                groups.setdefault(details.get("group"), []).append(
+                    (details.get("group"), command, help_message, usage))
+            entries = [entry for group in groups.values() for entry in group]
+            counts = dict((name, len(group)) for name, group in groups.items())
+            counts[None] = len(entries)
+            pages = dict((name, self._pages(count))
+                         for name, count in counts.items())
+            names = [name for name in groups if name is not None]
+            layout = self._layout = (entries, names, pages)
+        return layout
+
+    def entries(self):
+        """
+        The visible commands in order: ungrouped commands first, then each
+        group in the order its first command was added.
+        :return: list of (group, command, help, usage) tuples; usage is
+                 "" unless the command declares its arguments
+        """
+        return self.layout()[0]
+
+    def groups(self):
+        """
+        :return: Names of the groups with visible commands
+        """
+        return list(self.layout()[1])
+
+    def parse(self, text):
+        """
+        Read the group and page asked for after the help command.
+        :param text: Message text following the help command
+        :return: Tuple of group name or None, and page number
+        """
+        group, page = None, 1
+        for word in (text or "").split():
+            if word.isdigit():
+                page = max(int(word), 1)
+            else:
+                for name in self.groups():
+                    if name.lower() == word.lower():
+                        group = name
+        return group, page
+
+    def markdown(self, group=None, page=1):
+        """
+        :param group: Only list the commands of this group
+        :param page: Page number, from 1
+        :return: The help reply in markdown
+        """
+        cache = self._cache
+        text = cache.get(("markdown", group, page))
+        if text is None:
+            group, page = self._clamp(group, page)
+            key = ("markdown", group, page)
+            text = cache.get(key)
+            if text is None:
+                text = cache[key] = self._render_markdown(group, page)
+        return text
+
+    def card(self, group=None, page=1):
+        """
+        :param group: Only list the commands of this group
+        :param page: Page number, from 1
+        :return: A Response with the help as an adaptive card, and as
+                 markdown for clients that can't show cards
+        """
+        cache = self._cache
+        card = cache.get(("card", group, page))
+        if card is None:
+            group, page = self._clamp(group, page)
+            key = ("card", group, page)
+            card = cache.get(key)
+            if card is None:
+                card = cache[key] = self._render_card(group, page)
+        reply = Response(markdown=self.markdown(group, page))
+        reply.add_card(card)
+        return reply
+
+    def _clamp(self, group, page):
+        """
+        Bound what a reply is cached under, so arbitrary page numbers and
+        group names sent to /help can't grow the cache.  Only called when
+        the reply asked for isn't cached.
+        :return: Tuple of the group, None unless it has visible commands,
+                 and the page number within the page count
+        """
+        pages = self.layout()[2]
+        if group not in pages:
+            group = None
+        return group, max(min(page, pages[group]), 1)
+
+    def _pages(self, count):
+        """
+        :param count: Number of commands listed
+        :return: Number of pages they take, at least one
+        """
+        return max((count + self.page_size - 1) // self.page_size, 1)
+
+    def page(self, group=None, page=1):
+        """
+        The commands on one page of help.
+        :param group: Only list the commands of this group
+        :param page: Page number, from 1; past the end gives the last page
+        :return: Tuple of the entries, the page number and the page count
+        """
+        entries = self.entries()
+        if group is not None:
+            entries = [e for e in entries if e[0] == group]
+        pages = self._pages(len(entries))
+        page = max(min(page, pages), 1)
+        start = (page - 1) * self.page_size
+        return entries[start:start + self.page_size], page, pages
+
+    def footer(self, group, page, pages):
+        """
+        :return: Lines telling how to see the other pages and groups
+        """
+        lines = []
+        if pages > 1:
+            prefix = self.command + (" " + group if group else "")
+            if page < pages:
+                lines.append("Page %d of %d.  Send **%s %d** for more."
+                             % (page, pages, prefix, page + 1))
+            else:
+                lines.append("Page %d of %d." % (page, pages))
+        groups = self.groups()
+        if groups and group is None and pages > 1:
+            lines.append("Send **%s <group>** for one of: %s"
+                         % (self.command, ", ".join(groups)))
+        return lines
+
+    def _render_markdown(self, group, page):
+        entries, page, pages = self.page(group, page)
+        parts = [GREETING]
+        current = None
+        for entry_group, command, help_message, usage in entries:
+            if entry_group != current:
+                parts.append("\n**%s**  \n" % entry_group)
+                current = entry_group
+            label = "**%s**" % command
+            if usage:
+                label += " `%s`" % usage
+            parts.append("* %s: %s \n" % (label, help_message))
+        footer = self.footer(group, page, pages)
+        if footer:
+            parts.append("\n" + "  \n".join(footer))
+        return "".join(parts)
+
+    def _render_card(self, group, page):
+        entries, page, pages = self.page(group, page)
+        body = [{"type": "TextBlock", "weight": "Bolder", "wrap": True,
+                 "text": "I understand the following commands"}]
+        facts = None
+        current = False
+        for entry_group, command, help_message, usage in entries:
+            if entry_group != current:
+                if entry_group is not None:
+                    body.append({"type": "TextBlock", "weight": "Bolder",
+                                 "spacing": "Medium", "text": entry_group})
+                facts = []
+                body.append({"type": "FactSet", "facts": facts})
+                current = entry_group
+            if usage:
+                help_message = "%s\nUsage: %s %s" % (help_message, command,
+                                                     usage)
+            facts.append({"title": command, "value": help_message})
+        for line in self.footer(group, page, pages):
+            body.append({"type": "TextBlock", "isSubtle": True, "wrap": True,
+                         "text": line})
+        return {"type": "AdaptiveCard", "version": "1.2", "body": body}
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-tenant bot host
+
+Serves many bots, each with its own token, commands and webhook, from one
+Flask application and process.  The bots share one Spark API connection pool
+and one pool of worker threads; each bot's webhook is delivered to
+/bots/<name>, or to / with the webhook ID in a header or the payload.
+
+    host = BotHost("https://bots.example.com", workers=16)
+    support = host.add_bot("support", support_token, "support@webex.bot")
+    support.add_command("/ticket", "Open a ticket", open_ticket)
+    host.run(host="0.0.0.0", port=5000)
+
+A bot's failures stay its own: an exception handling one bot's webhook is
+answered with a 500 for that webhook only, a bot whose setup fails keeps
+retrying without holding up the others, and no bot may take more than its
+share of the worker queue.  Every bot's metrics carry a tenant label.
+
+Classes:
+    BotHost: A Flask application serving many SparkBots.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+
+from flask import Flask, request
+
+from ciscosparkbot.Spark import SparkBot
+from ciscosparkbot.dispatch import Dispatcher
+from ciscosparkbot.metrics import CONTENT_TYPE, Metrics, render_all
+from ciscosparkbot.session import PooledHTTPAdapter
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+# Header a proxy in front of the host may set to the ID of the webhook
+WEBHOOK_ID_HEADER = "X-Webhook-Id"
+
+
+class _TenantQueue(object):
+    """
+    One bot's view of the host's shared worker pool.  It looks like the
+    bot's own Dispatcher, but counts the bot's queued webhooks against its
+    share of the pool.
+    """
+
+    def __init__(self, pool, limit):
+        """
+        :param pool: The host's Dispatcher
+        :param limit: Most webhooks of this bot queued or being handled
+        """
+        self.pool = pool
+        self.limit = limit
+        self.bot = None
+        self._pending = 0
+        self._done = threading.Condition()
+        self.submitted = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def submit(self, post_data):
+        with self._done:
+            if self._pending >= self.limit:
+                self.rejected += 1
+                return False
+            self._pending += 1
+        if not self.pool.submit((self, post_data)):
+            with self._done:
+                self._pending -= 1
+                self.rejected += 1
+            return False
+        with self._done:
+            self.submitted += 1
+        return True
+
+    def run(self, post_data):
+        """
+        Handle one webhook on a worker thread.
+        :param post_data: The webhook payload
+        :return:
+        """
+        try:
+            self.bot.handle_webhook(post_data)
+        except Exception:
+            with self._done:
+                self.errors += 1
+            logger.exception("Error handling a webhook of %s",
+                             self.bot.spark_bot_name)
+        finally:
+            with self._done:
+                self._pending -= 1
+                self._done.notify_all()
+
+    def shutdown(self, timeout=None):
+        """
+        Wait for this bot's queued webhooks.  The pool itself is the host's.
+        :param timeout: Seconds to wait
+        :return: True if every queued webhook was handled
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._done:
+            while self._pending:
+                if deadline is None:
+                    self._done.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._done.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._done:
+            return dict(pending=self._pending, limit=self.limit,
+                        submitted=self.submitted, rejected=self.rejected,
+                        errors=self.errors)
+
+
+class BotHost(Flask):
+    """A Flask application hosting many bots"""
+
+    def __init__(self, base_url, workers=8, max_queue=500, tenant_share=0.25,
+                 http_adapter=None, webhook_header=WEBHOOK_ID_HEADER,
+                 metrics=None, import_name="ciscosparkbot.host"):
+        """
+        :param base_url: Public URL of the host; each bot's webhook targets
+                         base_url/bots/<name>
+        :param workers: Threads handling the webhooks of every bot
+        :param max_queue: Most webhooks waiting for a worker, over all bots
+        :param tenant_share: Fraction of max_queue one bot may take up, so
+                             a flooded bot can't starve the others
+        :param http_adapter: PooledHTTPAdapter shared by every bot.
+                             Defaults to one with a connection per worker.
+        :param webhook_header: Header naming the webhook of a delivery to /
+        :param metrics: Metrics of the host itself
+        :param import_name: Flask import name
+        """
+        super(BotHost, self).__init__(import_name)
+        self.base_url = base_url.rstrip("/")
+        self.tenant_share = tenant_share
+        self.webhook_header = webhook_header
+        self.http_adapter = http_adapter or PooledHTTPAdapter(
+            pool_maxsize=max(workers, 10))
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.describe("host_webhooks_total", "counter",
+                              "Webhooks received by the host, by tenant and "
+                              "outcome")
+        self.metrics.add_collector(self.collect_stats)
+
+        # Bots by name, and by the ID of their webhook once set up
+        self.tenants = {}
+        self._by_webhook = {}
+        self._lock = threading.Lock()
+
+        self.pool = Dispatcher(self._run, workers=workers,
+                               max_queue=max_queue, name="host")
+        self.pool.start()
+
+        self.add_url_rule("/health", "health", self.health)
+        self.add_url_rule("/metrics", "metrics", self.metrics_endpoint)
+        self.add_url_rule("/bots/<name>", "bot", self.route_by_path,
+                          methods=["POST"])
+        self.add_url_rule("/", "index", self.route_by_webhook,
+                          methods=["POST"])
+
+    def add_bot(self, name, spark_bot_token, spark_bot_email, **options):
+        """
+        Create a bot served by this host.
+        :param name: Name of the bot and its webhook; letters, digits, "-",
+                     "_" and "." only, as it is part of the webhook URL
+        :param spark_bot_token: The bot's access token
+        :param spark_bot_email: The bot's email address
+        :param options: Further SparkBot arguments.  startup defaults to
+                        "background", so a bot failing to start doesn't
+                        stop the host.
+        :return: The SparkBot
+        """
+        if not re.match(r"^[A-Za-z0-9_.-]+$", name):
+            raise ValueError("Bot names may only contain letters, digits, "
+                             "'-', '_' and '.'")
+        if name in self.tenants:
+            raise ValueError("A bot named %s is already hosted" % name)
+        limit = max(int(self.pool.max_queue * self.tenant_share), 1)
+        queue = _TenantQueue(self.pool, limit)
+        options.setdefault("startup", "background")
+        options.setdefault("metrics", Metrics(labels=(("tenant", name),)))
+        bot = SparkBot(name, spark_bot_token=spark_bot_token,
+                       spark_bot_email=spark_bot_email,
+                       spark_bot_url="%s/bots/%s" % (self.base_url, name),
+                       http_adapter=self.http_adapter, dispatcher=queue,
+                       **options)
+        queue.bot = bot
+        with self._lock:
+            self.tenants[name] = bot
+        return bot
+
+    def remove_bot(self, name, timeout=None):
+        """
+        Stop serving a bot, after handling its queued webhooks.  Its webhook
+        is left registered.
+        :param name: Name of the bot
+        :param timeout: Seconds to wait for its queued webhooks
+        :return: The SparkBot removed
+        """
+        with self._lock:
+            bot = self.tenants.pop(name)
+            for webhook_id, tenant in list(self._by_webhook.items()):
+                if tenant is bot:
+                    del self._by_webhook[webhook_id]
+        bot.shutdown(timeout)
+        return bot
+
+    def find_bot(self, webhook_id):
+        """
+        :param webhook_id: ID of a bot's webhook
+        :return: The SparkBot, or None
+        """
+        bot = self._by_webhook.get(webhook_id)
+        if bot is None:
+            with self._lock:
+                for tenant in self.tenants.values():
+                    webhook = getattr(tenant, "webhook", None)
+                    if webhook is not None:
+                        self._by_webhook[webhook.id] = tenant
+                bot = self._by_webhook.get(webhook_id)
+        return bot
+
+    def route_by_path(self, name):
+        """
+        Webhook target of one bot.
+        :param name: Name of the bot
+        :return: The bot's answer
+        """
+        return self.deliver(self.tenants.get(name))
+
+    def route_by_webhook(self):
+        """
+        Webhook target of every bot, finding the bot by the webhook ID in
+        webhook_header or else in the payload.
+        :return: The bot's answer
+        """
+        webhook_id = request.headers.get(self.webhook_header)
+        if not webhook_id:
+            post_data = request.get_json(force=True, silent=True)
+            if isinstance(post_data, dict):
+                webhook_id = post_data.get("id")
+        return self.deliver(self.find_bot(webhook_id) if webhook_id
+                            else None)
+
+    def deliver(self, bot):
+        """
+        Hand the current request to a bot.
+        :param bot: The SparkBot, or None if no bot matched
+        :return: The bot's answer
+        """
+        if bot is None:
+            self.metrics.inc("host_webhooks_total", (("tenant", ""),
+                                                     ("outcome", "unknown")))
+            return "Unknown bot", 404
+        labels = (("tenant", bot.spark_bot_name),)
+        if not bot.ready.is_set():
+            if bot.startup != "lazy" or bot._lazy_setup() is not None:
+                self.metrics.inc("host_webhooks_total",
+                                 labels + (("outcome", "not_ready"),))
+                return "Spark Bot not ready", 503
+        try:
+            answer = bot.process_incoming_message()
+        except Exception as e:
+            # One bot's bug answers its own webhook with an error and
+            # nothing else
+            self.metrics.inc("host_webhooks_total",
+                             labels + (("outcome", "error"),))
+            self.metrics.error(type(e), labels)
+            logger.exception("Error handling a webhook of %s",
+                             bot.spark_bot_name)
+            return "Error", 500
+        self.metrics.inc("host_webhooks_total",
+                         labels + (("outcome", "delivered"),))
+        return answer
+
+    # noinspection PyMethodMayBeStatic
+    def _run(self, item):
+        queue, post_data = item
+        queue.run(post_data)
+
+    def collect_stats(self):
+        """
+        Metrics collector reporting the shared pools and each bot's share.
+        :return: list of (name, labels, value) samples
+        """
+        samples = [("host_pool_" + name, (), value)
+                   for name, value in sorted(self.pool.stats().items())]
+        samples.extend(("host_http_pool_" + name, (), value) for name, value
+                       in sorted(self.http_adapter.stats.as_dict().items()))
+        for name, bot in list(self.tenants.items()):
+            for stat, value in sorted(bot.dispatcher.stats().items()):
+                samples.append(("host_tenant_" + stat,
+                                (("tenant", name),), value))
+        return samples
+
+    def health(self):
+        """
+        Health of the host and the state of each bot.  A bot failing to
+        start doesn't make the host unhealthy.
+        :return: JSON status
+        """
+        tenants = {}
+        for name, bot in list(self.tenants.items()):
+            if bot.ready.is_set():
+                tenants[name] = dict(status="ready")
+            else:
+                tenants[name] = dict(status="starting")
+                if bot.setup_error is not None:
+                    tenants[name]["error"] = str(bot.setup_error)
+        return json.dumps(dict(status="I'm Alive",
+                               pool=self.pool.stats(),
+                               tenants=tenants))
+
+    def metrics_endpoint(self):
+        """
+        The metrics of the host and every bot, labelled by tenant.
+        :return: Prometheus text exposition
+        """
+        registries = [self.metrics]
+        registries.extend(bot.metrics for bot in list(self.tenants.values())
+                          if bot.metrics is not self.metrics)
+        return render_all(registries), 200, {"Content-Type": CONTENT_TYPE}
+
+    def shutdown(self, timeout=None):
+        """
+        Handle the queued webhooks of every bot and stop the workers.
+        :param timeout: Seconds to wait for the queue to drain
+        :return: True if everything queued was handled
+        """
+        drained = True
+        for bot in list(self.tenants.values()):
+            drained = bot.shutdown(timeout) and drained
+        return self.pool.shutdown(timeout) and drained
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Logging
+
+The bot logs through the standard logging module, under the "ciscosparkbot"
+logger, with messages formatted only when a record is actually written.
+Records logged while handling a message carry its correlation ID.
+
+configure_logging() sets up a handler that is cheap on the request thread:
+records are put on a queue and formatted and written by a background
+thread, optionally as JSON, and info level records of most messages can be
+sampled away.
+
+Functions:
+    correlation: Context manager setting the correlation ID.
+    get_correlation_id: The correlation ID of the message being handled.
+    configure_logging: Set up queued, optionally JSON, logging.
+    enable_debug: Log debug records, as the bots' debug option does.
+
+Classes:
+    CorrelationFilter: Adds the correlation ID to records.
+    SamplingFilter: Keeps the low level records of a sample of messages.
+    JSONFormatter: Formats records as single line JSON objects.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import queue
+except ImportError:  # pragma: no cover - Python 2
+    import Queue as queue
+
+try:
+    import contextvars
+except ImportError:  # pragma: no cover - Python 2
+    contextvars = None
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+LOGGER_NAME = "ciscosparkbot"
+
+# Context variables follow asyncio tasks as well as threads
+if contextvars is not None:
+    _correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+    def get_correlation_id():
+        """
+        :return: The correlation ID of the message being handled, or None
+        """
+        return _correlation_id.get()
+
+    @contextlib.contextmanager
+    def correlation(correlation_id):
+        """
+        Set the correlation ID of records logged within the block.
+        :param correlation_id: ID to log, such as the message ID
+        :return: A context manager
+        """
+        token = _correlation_id.set(correlation_id)
+        try:
+            yield correlation_id
+        finally:
+            _correlation_id.reset(token)
+else:  # pragma: no cover
+    _local = threading.local()
+
+    def get_correlation_id():
+        return getattr(_local, "correlation_id", None)
+
+    @contextlib.contextmanager
+    def correlation(correlation_id):
+        previous = get_correlation_id()
+        _local.correlation_id = correlation_id
+        try:
+            yield correlation_id
+        finally:
+            _local.correlation_id = previous
+
+
+class CorrelationFilter(logging.Filter):
+    """Adds the current correlation ID to records as correlation_id"""
+
+    def filter(self, record):
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = get_correlation_id()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps every record of a sample of messages, and drops the low level
+    records of the rest.  Whether a message is sampled depends only on its
+    correlation ID, so its records are kept or dropped together.
+    """
+
+    def __init__(self, rate=1.0, level=logging.INFO):
+        """
+        :param rate: Fraction of messages whose records are kept
+        :param level: Records at or below this level are sampled; higher
+                      levels are always kept
+        """
+        super(SamplingFilter, self).__init__()
+        self.rate = rate
+        self.level = level
+        self._threshold = int(rate * 0xffffffff)
+
+    def filter(self, record):
+        if record.levelno > self.level or self.rate >= 1:
+            return True
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id is None:
+            correlation_id = get_correlation_id()
+        if correlation_id is None:
+            # Not about a message, such as startup logs
+            return True
+        digest = zlib.crc32(correlation_id.encode("utf-8")) & 0xffffffff
+        return digest <= self._threshold
+
+
+# Attributes every LogRecord has; anything else was passed in extra
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord(
+    "", logging.INFO, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as a JSON object on one line"""
+
+    def format(self, record):
+        data = dict(
+            time=time.strftime("%Y-%m-%dT%H:%M:%S",
+                               time.gmtime(record.created)) +
+            ".%03dZ" % record.msecs,
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage())
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id is not None:
+            data["correlation_id"] = correlation_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key != "correlation_id":
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class _QueueHandler(logging.Handler):
+    """
+    Puts records on the queue as they are, leaving formatting to the
+    listener thread.  logging.handlers.QueueHandler formats records on the
+    request thread, and doesn't exist on Python 2.
+    """
+
+    def __init__(self, records):
+        logging.Handler.__init__(self)
+        self.queue = records
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block the request thread on log output
+            self.dropped += 1
+
+
+class _QueueListener(object):
+    """
+    Writes queued records with a handler on a background thread.  May be
+    stopped more than once.
+    """
+
+    def __init__(self, records, handler):
+        """
+        :param records: The queue the _QueueHandler puts records on
+        :param handler: Handler writing the records
+        """
+        self.queue = records
+        self.handler = handler
+        self._thread = None
+
+    def start(self):
+        """
+        Start the thread writing the records.
+        :return:
+        """
+        thread = threading.Thread(target=self._write, name="ciscosparkbot-log")
+        thread.daemon = True
+        thread.start()
+        self._thread = thread
+
+    def _write(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            self.handler.handle(record)
+
+    def stop(self):
+        """
+        Write the records still queued, then stop the thread.
+        :return:
+        """
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        # Blocks only until the thread makes room on a full queue
+        self.queue.put(None)
+        thread.join()
+
+
+def configure_logging(level=logging.INFO, json_format=False, sample_rate=1.0,
+                      stream=None, queue_size=10000, logger_name=LOGGER_NAME):
+    """
+    Log the bot's records through a queue to a stream.
+    :param level: Lowest level logged
+    :param json_format: Write JSON objects rather than text lines
+    :param sample_rate: Fraction of messages whose info and debug
+                        records are written
+    :param stream: Stream written to, defaults to stderr
+    :param queue_size: Most records waiting to be written; further
+                       records are dropped rather than blocking
+    :param logger_name: Logger to configure
+    :return: The QueueListener writing the records.  It is stopped,
+             flushing the queue, when the interpreter exits.
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s "
+            "[%(correlation_id)s] %(message)s"))
+
+    records = queue.Queue(queue_size)
+    handler = _QueueHandler(records)
+    # Filters run on the thread logging the record, so they see its
+    # correlation ID
+    handler.addFilter(CorrelationFilter())
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(level)
+    logger.addHandler(handler)
+
+    listener = _QueueListener(records, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def enable_debug(logger_name=LOGGER_NAME):
+    """
+    Log the bot's debug records.  The bots' debug option used to write every
+    message to stderr; unless the application configured logging itself,
+    they still are.
+    :param logger_name: Logger to configure
+    :return:
+    """
+    logger = logging.getLogger(logger_name)
+    if not logger.handlers:
+        configure_logging(logging.DEBUG, logger_name=logger_name)
+    logger.setLevel(logging.DEBUG)
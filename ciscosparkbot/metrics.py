@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Bot metrics in the Prometheus text format
+
+Every thread records into its own shard without taking a lock; a scrape adds
+the shards together.  Recording a sample therefore never waits on a scrape
+or on another thread handling a webhook.
+
+Functions:
+    render_all: Renders several registries as one page, such as the bots of
+    a BotHost.
+
+Classes:
+    Metrics: Counters, gauges and latency histograms, rendered for /metrics.
+"""
+
+import threading
+import time
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency histogram bucket bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+_clock = getattr(time, "perf_counter", time.time)
+
+# Shards registered before those of exited threads are first folded together
+MIN_SHARDS = 64
+
+
+class _Shard(object):
+    """The samples recorded by one thread"""
+
+    __slots__ = ("thread", "values", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        # (name, labels) -> counter or gauge value
+        self.values = {}
+        # (name, labels) -> [count per bucket..., count, sum]
+        self.histograms = {}
+
+
+class _Timer(object):
+    """Context manager timing a block into a histogram"""
+
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, _clock() - self.start, self.labels)
+        if exc_type is not None:
+            self.metrics.error(exc_type, self.labels)
+        return False
+
+
+class Metrics(object):
+    """A lock-light registry of counters, gauges and histograms"""
+
+    def __init__(self, prefix="sparkbot_", buckets=DEFAULT_BUCKETS,
+                 labels=()):
+        """
+        :param prefix: Prefix of every metric name
+        :param buckets: Upper bounds of the histogram buckets, in seconds
+        :param labels: Tuple of (label, value) pairs added to every sample,
+                       for example the tenant of a BotHost
+        """
+        self.prefix = prefix
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        # Shard count at which registering another retires the exited ones
+        self._retire_at = MIN_SHARDS
+        # Samples of threads that have exited
+        self._retired = _Shard(None)
+        self._types = {}
+        self._help = {}
+        self._collectors = []
+
+        self.describe("stage_seconds", "histogram",
+                      "Time spent in each stage of handling a webhook")
+        self.describe("callback_seconds", "histogram",
+                      "Time spent in command callbacks")
+        self.describe("in_flight", "gauge",
+                      "Webhooks and callbacks being handled")
+        self.describe("errors_total", "counter",
+                      "Errors by stage or command, and exception type")
+
+    def describe(self, name, metric_type, help_text):
+        """
+        Declare the type and help text of a metric.
+        :param name: Metric name, without the prefix
+        :param metric_type: "counter", "gauge" or "histogram"
+        :param help_text: Description of the metric
+        :return:
+        """
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    def add_collector(self, collector):
+        """
+        Add a function called on every scrape, for values owned elsewhere
+        such as queue depths.
+        :param collector: Function returning an iterable of
+                          (name, labels, value) gauge samples
+        :return:
+        """
+        self._collectors.append(collector)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                # A threaded server starts a thread per request, so the
+                # shards of exited ones must not wait for a scrape
+                if len(self._shards) >= self._retire_at:
+                    self._retire()
+                self._shards.append(shard)
+            return shard
+
+    def inc(self, name, labels=(), value=1):
+        """
+        Add to a counter or gauge.
+        :param name: Metric name, without the prefix
+        :param labels: Tuple of (label, value) pairs
+        :param value: Amount to add; negative to lower a gauge
+        :return:
+        """
+        values = self._shard().values
+        key = (name, labels)
+        values[key] = values.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        """
+        Record a sample in a histogram.
+        :param name: Metric name, without the prefix
+        :param seconds: The sample
+        :param labels: Tuple of (label, value) pairs
+        :return:
+        """
+        histograms = self._shard().histograms
+        key = (name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        counts[-2] += 1
+        counts[-1] += seconds
+
+    def time(self, name, labels=()):
+        """
+        Time a block into a histogram, counting any exception it raises in
+        errors_total.
+        :param name: Histogram name, without the prefix
+        :param labels: Tuple of (label, value) pairs
+        :return: A context manager
+        """
+        return _Timer(self, name, labels)
+
+    def error(self, exc_type, labels=()):
+        """
+        Count an error by exception type.
+        :param exc_type: The exception class
+        :param labels: Tuple of (label, value) pairs, such as the stage
+        :return:
+        """
+        self.inc("errors_total", labels + (("type", exc_type.__name__),))
+
+    def _retire(self):
+        """
+        Fold the shards of exited threads into one.  Must hold the lock.
+        :return:
+        """
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+        # Doubling the bound keeps retiring amortized when most are alive
+        self._retire_at = max(MIN_SHARDS, 2 * len(live))
+
+    # noinspection PyMethodMayBeStatic
+    def _merge(self, total, shard):
+        # dict.copy() is atomic, so a thread recording a new series while
+        # the scrape runs can't break the iteration
+        for key, value in shard.values.copy().items():
+            total.values[key] = total.values.get(key, 0) + value
+        for key, counts in shard.histograms.copy().items():
+            into = total.histograms.get(key)
+            if into is None:
+                total.histograms[key] = list(counts)
+            else:
+                for i, count in enumerate(counts):
+                    into[i] += count
+
+    def snapshot(self):
+        """
+        Add up the samples of every thread.
+        :return: Tuple of dicts: counter and gauge values, and histogram
+                 counts, keyed by (name, labels)
+        """
+        total = _Shard(None)
+        with self._lock:
+            self._retire()
+            self._merge(total, self._retired)
+            shards = list(self._shards)
+        for shard in shards:
+            self._merge(total, shard)
+        return total.values, total.histograms
+
+    def samples(self):
+        """
+        Every sample, with the registry's labels added.
+        :return: dict of metric name to a list of (sample name, labels,
+                 value), names without the prefix
+        """
+        values, histograms = self.snapshot()
+        common = self.labels
+        samples = {}
+        for (name, labels), value in values.items():
+            samples.setdefault(name, []).append(
+                (name, common + labels, value))
+        for (name, labels), counts in histograms.items():
+            series = samples.setdefault(name, [])
+            labels = common + labels
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                series.append((name + "_bucket",
+                               labels + (("le", repr(bound)),), cumulative))
+            series.append((name + "_bucket", labels + (("le", "+Inf"),),
+                           counts[-2]))
+            series.append((name + "_count", labels, counts[-2]))
+            series.append((name + "_sum", labels, counts[-1]))
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                samples.setdefault(name, []).append(
+                    (name, common + labels, value))
+        return samples
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+        :return: The metrics text
+        """
+        return render_all([self])
+
+
+def render_all(registries):
+    """
+    Render the metrics of several registries as one exposition, each metric
+    described once.  The registries should tell their samples apart by
+    their labels.
+    :param registries: Metrics to render
+    :return: The metrics text
+    """
+    samples = {}
+    types = {}
+    helps = {}
+    for registry in registries:
+        prefix = registry.prefix
+        for name, series in registry.samples().items():
+            full = prefix + name
+            samples.setdefault(full, []).extend(
+                (prefix + sample, labels, value)
+                for sample, labels, value in series)
+            types.setdefault(full, registry._types.get(name, "gauge"))
+            if name in registry._help:
+                helps.setdefault(full, registry._help[name])
+
+    lines = []
+    for full in sorted(samples):
+        if full in helps:
+            lines.append("# HELP %s %s" % (full, helps[full]))
+        lines.append("# TYPE %s %s" % (full, types[full]))
+        for sample, labels, value in samples[full]:
+            lines.append("%s%s %s" % (sample, _format_labels(labels),
+                                      _format_value(value)))
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')
+                     .replace("\n", "\\n"))
+        for k, v in labels)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
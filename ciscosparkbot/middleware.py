@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Command middleware
+
+A middleware wraps the running of a command: the callback and sending its
+reply.  It is called with a CommandContext, describing the message, the
+command found and the time taken by each stage so far, and a function
+continuing the chain.  A middleware may change the context, for example
+replace the callback, before continuing.
+
+    def log_slow(context, call_next):
+        reply = call_next(context)
+        if context.elapsed() > 1:
+            print("%s took %.2fs" % (context.command, context.elapsed()))
+        return reply
+
+    bot.add_middleware(log_slow)
+
+When no middleware is registered commands run without any of this.
+
+Functions:
+    build_chain: Composes middleware around the function running a command.
+
+Classes:
+    CommandContext: A message being handled by a command.
+    Middleware: Base class with before() and after() hooks.
+    ProfileMiddleware: Profiles a sample of commands, reporting slow ones.
+    TracingMiddleware: Emits a span per command.
+    TimeoutMiddleware: Gives up on callbacks running too long.
+"""
+
+import binascii
+import cProfile
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+
+try:
+    # pstats writes native str, which io.StringIO refuses on Python 2
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from ciscosparkbot.base import TIMEOUT_REPLY, saving_session
+from ciscosparkbot.bulkhead import Bulkhead, CommandTimeout
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+_clock = getattr(time, "perf_counter", time.time)
+
+
+class CommandContext(object):
+    """A message on its way through the command middleware"""
+
+    def __init__(self, bot, message, post_data=None):
+        """
+        :param bot: The bot handling the message
+        :param message: The IncomingMessage
+        :param post_data: The webhook payload
+        """
+        self.bot = bot
+        self.message = message
+        self.post_data = post_data
+        # Set once the command is found
+        self.command = None
+        self.callback = None
+        self.reply = None
+        # Seconds spent in each stage: "fetch", "lookup", "callback" and
+        # "reply", in the order they ran
+        self.timings = {}
+        self.started = self._last = _clock()
+
+    def mark(self, stage):
+        """
+        Record the time spent in a stage, since the previous mark.
+        :param stage: Name of the stage just finished
+        :return:
+        """
+        now = _clock()
+        self.timings[stage] = now - self._last
+        self._last = now
+
+    def elapsed(self):
+        """
+        :return: Seconds since the message started through the bot
+        """
+        return _clock() - self.started
+
+
+class Middleware(object):
+    """A middleware calling before() and after() around the command"""
+
+    def __call__(self, context, call_next):
+        self.before(context)
+        try:
+            context.reply = call_next(context)
+        finally:
+            self.after(context)
+        return context.reply
+
+    def before(self, context):
+        """
+        Called before the command runs.
+        :param context: The CommandContext
+        :return:
+        """
+        pass
+
+    def after(self, context):
+        """
+        Called after the command ran and its reply was sent, or failed.
+        :param context: The CommandContext
+        :return:
+        """
+        pass
+
+
+class ProfileMiddleware(object):
+    """Profiles a sample of commands and reports those that ran slowly"""
+
+    def __init__(self, threshold=1.0, sample_rate=0.1, report=None,
+                 sort="cumulative", limit=25):
+        """
+        :param threshold: Seconds a command must take to be reported
+        :param sample_rate: Fraction of commands profiled
+        :param report: Function called with the CommandContext and the
+                       profile statistics text.  Defaults to logging them.
+        :param sort: pstats sort order
+        :param limit: Lines of statistics reported
+        """
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.report = report or self._write
+        self.sort = sort
+        self.limit = limit
+        # The profiler hooks are per interpreter, so profile one command at
+        # a time
+        self._lock = threading.Lock()
+
+    def __call__(self, context, call_next):
+        if random.random() >= self.sample_rate:
+            return call_next(context)
+        if not self._lock.acquire(False):
+            return call_next(context)
+        try:
+            profiler = cProfile.Profile()
+            started = _clock()
+            profiler.enable()
+            try:
+                return call_next(context)
+            finally:
+                profiler.disable()
+                if _clock() - started >= self.threshold:
+                    out = StringIO()
+                    stats = pstats.Stats(profiler, stream=out)
+                    stats.sort_stats(self.sort).print_stats(self.limit)
+                    self.report(context, out.getvalue())
+        finally:
+            self._lock.release()
+
+    # noinspection PyMethodMayBeStatic
+    def _write(self, context, text):
+        logger.warning("Slow command %s (%.3fs):\n%s",
+                       context.command, context.elapsed(), text)
+
+
+class TracingMiddleware(object):
+    """Emits an OpenTelemetry style span for every command"""
+
+    def __init__(self, tracer=None, exporter=None, name="sparkbot.command"):
+        """
+        :param tracer: Optional OpenTelemetry Tracer to start spans with
+        :param exporter: Without a tracer, function called with each span as
+                         a dict.  Defaults to logging them.
+        :param name: Span name
+        """
+        self.tracer = tracer
+        self.exporter = exporter or self._write
+        self.name = name
+
+    # noinspection PyMethodMayBeStatic
+    def attributes(self, context):
+        """
+        The span attributes of a command.
+        :param context: The CommandContext
+        :return: dict of attributes
+        """
+        attributes = {"sparkbot.command": context.command or "",
+                      "sparkbot.room_id": context.message.roomId,
+                      "sparkbot.message_id": context.message.id}
+        for stage, seconds in context.timings.items():
+            attributes["sparkbot.timing." + stage] = seconds
+        return attributes
+
+    def __call__(self, context, call_next):
+        if self.tracer is not None:
+            with self.tracer.start_as_current_span(self.name) as span:
+                try:
+                    return call_next(context)
+                finally:
+                    span.set_attributes(self.attributes(context))
+
+        start = time.time()
+        status = "OK"
+        try:
+            return call_next(context)
+        except Exception:
+            status = "ERROR"
+            raise
+        finally:
+            self.exporter(dict(
+                name=self.name,
+                trace_id=binascii.hexlify(os.urandom(16)).decode("ascii"),
+                span_id=binascii.hexlify(os.urandom(8)).decode("ascii"),
+                start_time=start,
+                end_time=time.time(),
+                status=status,
+                attributes=self.attributes(context)))
+
+    # noinspection PyMethodMayBeStatic
+    def _write(self, span):
+        logger.info("Span %s", span["name"], extra=dict(span=span))
+
+
+class TimeoutMiddleware(object):
+    """
+    Replies with a fallback message when a callback runs too long.  The
+    callbacks run through a Bulkhead without a concurrency limit, as those
+    of commands added with a timeout do, and a command added with its own
+    timeout is left to it.
+    """
+
+    def __init__(self, timeout=10.0, timeouts=None, workers=10,
+                 timeout_reply=None):
+        """
+        :param timeout: Seconds a callback may run
+        :param timeouts: dict of per command timeouts overriding timeout
+        :param workers: Threads running callbacks.  A callback that timed
+                        out keeps its thread until it returns; its reply
+                        is dropped.
+        :param timeout_reply: Reply sent instead when a callback times out.
+                              Defaults to the bot's timeout_reply.
+        """
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.timeout_reply = timeout_reply
+        self.bulkhead = Bulkhead("timeout", workers=workers)
+
+    def __call__(self, context, call_next):
+        timeout = self.timeouts.get(context.command, self.timeout)
+        callback = context.callback
+        if timeout is None or callback is None or self._limited(context):
+            return call_next(context)
+
+        def run_with_timeout(message):
+            try:
+                return self.bulkhead.run(saving_session(callback, message),
+                                         message, timeout)
+            except CommandTimeout:
+                logger.warning("Command %s timed out after %ss",
+                               context.command, timeout)
+                if self.timeout_reply is not None:
+                    return self.timeout_reply
+                return getattr(context.bot, "timeout_reply", TIMEOUT_REPLY)
+
+        context.callback = run_with_timeout
+        return call_next(context)
+
+    # noinspection PyMethodMayBeStatic
+    def _limited(self, context):
+        """
+        :return: True if the command was added with a timeout of its own
+        """
+        command_entry = getattr(context.bot, "command_entry", None)
+        if command_entry is None:
+            return False
+        entry = command_entry(context.command) or {}
+        return entry.get("timeout") is not None
+
+    def shutdown(self, wait=False):
+        """
+        Stop the threads running callbacks.
+        :param wait: Wait for running callbacks to return
+        :return:
+        """
+        self.bulkhead.shutdown(wait)
+
+
+def build_chain(middlewares, handler):
+    """
+    Compose middleware around a handler.
+    :param middlewares: Middleware in the order added; the first is outermost
+    :param handler: Function taking the CommandContext and running the
+                    command
+    :return: Function taking the CommandContext
+    """
+    chain = handler
+    for middleware in reversed(middlewares):
+        chain = _link(middleware, chain)
+    return chain
+
+
+def _link(middleware, call_next):
+    def call(context):
+        return middleware(context, call_next)
+    return call
@@ -1,64 +1,421 @@
 import json
+import threading
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover - Python 2
+    from collections import MutableMapping
+
+
+# Fields of a messages.create request, in the order they are serialized
+RESPONSE_FIELDS = ('roomId', 'toPersonId', 'toPersonEmail', 'parentId',
+                   'text', 'markdown', 'html', 'files', 'attachments')
+
+ADAPTIVE_CARD = "application/vnd.microsoft.card.adaptive"
+
+_encoder = json.JSONEncoder()
 
 
 class Response(object):
-    def __init__(self, attributes=None):
-        if attributes:
-            self.attributes = attributes
-        else:
-            self.attributes = dict()
-            self.attributes['text'] = None
-            self.attributes['roomId'] = None
-            self.attributes['markdown'] = None
-            self.attributes['html'] = None
-            self.attributes['files'] = list()
+    """
+    A reply crafted by a command, holding the fields of a messages.create
+    request.  Unset fields are left out of the request.
+    """
 
-    @property
-    def text(self):
-        return self.attributes['text']
+    __slots__ = ('roomId', 'toPersonId', 'toPersonEmail', 'parentId',
+                 'text', 'markdown', 'html', '_files', 'attachments')
 
-    @text.setter
-    def text(self, val):
-        self.attributes['text'] = val
+    def __init__(self, attributes=None, **fields):
+        """
+        :param attributes: Optional dict of fields.  It is copied, not
+                           kept.
+        :param fields: Fields as keyword arguments, for example
+                       Response(markdown="**done**")
+        """
+        self.roomId = None
+        self.toPersonId = None
+        self.toPersonEmail = None
+        self.parentId = None
+        self.text = None
+        self.markdown = None
+        self.html = None
+        self._files = None
+        self.attachments = None
+        if attributes:
+            fields = dict(attributes, **fields)
+        for name, value in fields.items():
+            if name not in RESPONSE_FIELDS:
+                raise TypeError("Response has no field %r" % name)
+            if name == 'files':
+                self._files = _as_list(value)
+            elif name == 'attachments':
+                self.attachments = _as_list(value)
+            else:
+                setattr(self, name, value)
 
     @property
     def files(self):
-        return self.attributes['files']
+        if self._files is None:
+            self._files = []
+        return self._files
 
     @files.setter
     def files(self, val):
-        self.attributes['files'].append(val)
+        # Assigning a file adds it to the files sent
+        self.files.append(val)
+
+    @property
+    def attributes(self):
+        """
+        Every field, set or not, as a mapping reading and writing the
+        Response, so resp.attributes['text'] = ... still sets the text.
+        """
+        return _Attributes(self)
+
+    @attributes.setter
+    def attributes(self, values):
+        for name in RESPONSE_FIELDS:
+            self.attributes[name] = values.get(name)
+
+    def add_card(self, content, content_type=ADAPTIVE_CARD):
+        """
+        Attach a card to the message.  Clients that can't show cards show
+        the text or markdown instead.
+        :param content: The card, for example an Adaptive Card dict
+        :param content_type: Content type of the card
+        :return:
+        """
+        if self.attachments is None:
+            self.attachments = []
+        self.attachments.append(dict(contentType=content_type,
+                                     content=content))
+
+    def as_dict(self):
+        """
+        The messages.create arguments of this reply.
+        :return: dict of the fields set
+        """
+        ret = {}
+        if self.roomId:
+            ret['roomId'] = self.roomId
+        if self.toPersonId:
+            ret['toPersonId'] = self.toPersonId
+        if self.toPersonEmail:
+            ret['toPersonEmail'] = self.toPersonEmail
+        if self.parentId:
+            ret['parentId'] = self.parentId
+        if self.text:
+            ret['text'] = self.text
+        if self.markdown:
+            ret['markdown'] = self.markdown
+        if self.html:
+            ret['html'] = self.html
+        if self._files:
+            ret['files'] = list(self._files)
+        if self.attachments:
+            ret['attachments'] = list(self.attachments)
+        return ret
+
+    def json(self):
+        """
+        :return: The messages.create request body as JSON
+        """
+        return _encoder.encode(self.as_dict())
+
+    def __repr__(self):
+        return "Response(%r)" % self.as_dict()
+
+
+class MultiResponse(object):
+    """
+    Replies to several rooms or people, sent concurrently in the background.
+    Keep a reference to follow the delivery: results fills in as messages
+    are sent, and wait() blocks until all are sent or have failed.
+    """
+
+    def __init__(self, responses=None, wait=False, on_complete=None):
+        """
+        :param responses: Response objects.  A Response with no roomId,
+                          toPersonId or toPersonEmail goes to the room the
+                          command came from.
+        :param wait: Hold the webhook until delivery is complete, instead of
+                     returning right away
+        :param on_complete: Function called with this MultiResponse once
+                            every message is sent or has failed
+        """
+        self.responses = list(responses or ())
+        self.wait_for_delivery = wait
+        self.on_complete = on_complete
+        # target -> (sent Message or None, exception or None)
+        self.results = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @classmethod
+    def broadcast(cls, room_ids, wait=False, on_complete=None, **fields):
+        """
+        The same reply to many rooms.
+        :param room_ids: IDs of the rooms
+        :param wait: See MultiResponse
+        :param on_complete: See MultiResponse
+        :param fields: Response fields, for example markdown="**Alert**"
+        :return: MultiResponse
+        """
+        return cls([Response(roomId=room_id, **fields)
+                    for room_id in room_ids], wait, on_complete)
+
+    def add(self, response):
+        """
+        Add a reply.
+        :param response: Response object
+        :return:
+        """
+        self.responses.append(response)
+
+    @property
+    def succeeded(self):
+        """Targets the message was sent to"""
+        return [t for t, (_, error) in self.results.items() if error is None]
+
+    @property
+    def failed(self):
+        """Targets the message could not be sent to"""
+        return [t for t, (_, error) in self.results.items()
+                if error is not None]
+
+    def wait(self, timeout=None):
+        """
+        Wait for the delivery to finish.
+        :param timeout: Seconds to wait, or None to wait forever
+        :return: True if every message was sent or has failed
+        """
+        return self._done.wait(timeout)
+
+    def delivery_started(self, count):
+        """
+        Called by the bot before it sends count messages.
+        :param count: Number of messages to send
+        :return:
+        """
+        with self._lock:
+            self._pending = count
+        if not count:
+            self._finish()
+
+    def record(self, target, result, error):
+        """
+        Called by the bot as each message is sent or fails.
+        :param target: The roomId, toPersonId or toPersonEmail sent to
+        :param result: The sent Message, or None
+        :param error: The exception, or None
+        :return:
+        """
+        with self._lock:
+            self.results[target] = (result, error)
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self._finish()
+
+    def _finish(self):
+        self._done.set()
+        if self.on_complete is not None:
+            self.on_complete(self)
+
+
+def message_target(payload):
+    """
+    The room or person a message is sent to.
+    :param payload: dict of arguments for messages.create
+    :return: The roomId, toPersonId or toPersonEmail
+    """
+    return (payload.get("roomId") or payload.get("toPersonId") or
+            payload.get("toPersonEmail"))
+
+
+class _Attributes(MutableMapping):
+    """The fields of a Response as a dict-like view"""
+
+    __slots__ = ('_response',)
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getitem__(self, name):
+        if name not in RESPONSE_FIELDS:
+            raise KeyError(name)
+        return getattr(self._response, name)
+
+    def __setitem__(self, name, value):
+        if name not in RESPONSE_FIELDS:
+            raise KeyError("Response has no field %r" % name)
+        if name == 'files':
+            # The files setter appends; replace the list instead
+            self._response._files = _as_list(value)
+        elif name == 'attachments':
+            self._response.attachments = _as_list(value)
+        else:
+            setattr(self._response, name, value)
+
+    def __delitem__(self, name):
+        self[name] = None
+
+    def __iter__(self):
+        return iter(RESPONSE_FIELDS)
+
+    def __len__(self):
+        return len(RESPONSE_FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def _as_list(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class IncomingMessage(object):
+    """
+    A message announced by a webhook.  Fields carried by the webhook payload
+    are read from it; the message itself is only fetched from Spark when
+    another field, such as text, is first read.
+    """
+
+    # Fields Spark includes in the webhook data block for messages
+    payload_fields = ('id', 'roomId', 'roomType', 'personId', 'personEmail',
+                      'mentionedPeople', 'mentionedGroups', 'created')
+
+    def __init__(self, data, fetch=None, sessions=None):
+        """
+        :param data: The "data" block of the webhook payload
+        :param fetch: Function returning the full message for a message ID
+        :param sessions: SessionStore providing message.session
+        """
+        self.data = data
+        self._fetch = fetch
+        self._message = None
+        self.sessions = sessions
+        self._session = None
+        # Set once the thread running the callback saves the session
+        self._session_detached = False
+        # Offset in the text just past the command found in it
+        self.command_end = None
+        # Parsed arguments, for commands declaring them
+        self.args = None
+
+    @property
+    def fetched(self):
+        return self._message is not None
+
+    def load(self, message):
+        """Provide the full message instead of fetching it."""
+        self._message = message
+
+    def fetch(self):
+        """Return the full message, fetching it on first use."""
+        if self._message is None:
+            if self._fetch is None:
+                raise ValueError("No way to fetch message %s"
+                                 % self.data.get('id'))
+            self._message = self._fetch(self.data['id'])
+        return self._message
+
+    def _field(self, name):
+        if name in self.data:
+            return self.data[name]
+        return getattr(self.fetch(), name, None)
+
+    @property
+    def id(self):
+        return self.data['id']
 
     @property
     def roomId(self):
-        return self.attributes['roomId']
+        return self.data['roomId']
 
-    @roomId.setter
-    def roomId(self, val):
-        self.attributes['roomId'] = val
+    @property
+    def roomType(self):
+        return self._field('roomType')
 
     @property
-    def markdown(self):
-        return self.attributes['markdown']
+    def personId(self):
+        return self._field('personId')
 
-    @markdown.setter
-    def markdown(self, val):
-        self.attributes['markdown'] = val
+    @property
+    def personEmail(self):
+        return self._field('personEmail')
+
+    @property
+    def mentionedPeople(self):
+        if 'mentionedPeople' in self.data:
+            return self.data['mentionedPeople']
+        # Not announced in the payload, so nobody was mentioned
+        return []
+
+    @property
+    def session(self):
+        """
+        The conversation state of the message's room or sender, loaded on
+        first use and saved by the bot after the command.
+        """
+        if self._session is None:
+            if self.sessions is None:
+                raise ValueError("The bot has no session store")
+            self._session = self.sessions.load(self)
+        return self._session
+
+    @property
+    def session_used(self):
+        """True once a command has read the session"""
+        return self._session is not None
+
+    def detach_session(self):
+        """
+        Leave saving the session to the thread running the callback, which
+        may still be changing it after the bot has replied.  Only
+        save_session(detached=True) saves it from then on.
+        :return:
+        """
+        self._session_detached = True
+
+    def save_session(self, detached=False):
+        """
+        Save the session, if a command used it.
+        :param detached: Saving from the thread the callback was detached to
+        :return: True if the session store was written to
+        """
+        if self._session is None or detached != self._session_detached:
+            return False
+        return self.sessions.save(self._session)
+
+    @property
+    def text(self):
+        return self.fetch().text
+
+    @property
+    def markdown(self):
+        return getattr(self.fetch(), 'markdown', None)
 
     @property
     def html(self):
-        return self.attributes['html']
+        return getattr(self.fetch(), 'html', None)
 
-    @html.setter
-    def html(self, val):
-        self.attributes['html'] = val
+    @property
+    def files(self):
+        return getattr(self.fetch(), 'files', None)
 
-    def as_dict(self):
-        ret = dict()
-        for k, v in self.attributes.items():
-            if v:
-                ret[k] = v
-        return ret
+    def __getattr__(self, name):
+        # Anything else is looked up on the full message
+        if name.startswith('_') or name == 'data':
+            raise AttributeError(name)
+        return getattr(self.fetch(), name)
 
-    def json(self):
-        return json.dumps(self.attributes)
+    def __str__(self):
+        if self._message is not None:
+            return str(self._message)
+        return json.dumps(self.data)
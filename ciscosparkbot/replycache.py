@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Cached replies of idempotent commands
+
+A command added with a cache_ttl has its replies remembered for that many
+seconds, keyed by the command and the text after it.  While a reply is
+being worked out, identical requests wait for it instead of running the
+callback again, so a room full of people asking for the same status makes
+one backend call.
+
+    bot.add_command("/oncall", "Who is on call", oncall, cache_ttl=60)
+    bot.add_command("/status", "Room status", status, cache_ttl=30,
+                    cache_key="room")
+
+Errors, and the busy and timeout replies of command limits, are never
+cached; the requests waiting on them get the same outcome.  A cached reply
+is shared, so commands returning a MultiResponse should not be cached.
+
+Classes:
+    ReplyCache: A bounded LRU cache of replies with single-flight.
+"""
+
+import collections
+import threading
+import time
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+
+class _Flight(object):
+    """A reply being worked out, waited on by identical requests"""
+
+    __slots__ = ("done", "reply", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.reply = None
+        self.error = None
+
+
+class ReplyCache(object):
+    """Replies by key, bounded in count, with single-flight"""
+
+    def __init__(self, max_size=1000, clock=time.time):
+        """
+        :param max_size: Most replies kept; the least recently used go first
+        :param clock: Function returning the current time in seconds
+        """
+        self.max_size = max_size
+        self.clock = clock
+        # key -> (expires, reply), least recently used first
+        self._replies = collections.OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key, now):
+        """
+        Find a fresh reply.  Must hold the lock.
+        :return: Tuple of True and the reply, or False and None
+        """
+        item = self._replies.get(key)
+        if item is None:
+            return False, None
+        # Popped and reinserted at the end, the most recently used;
+        # OrderedDict has no move_to_end on Python 2
+        del self._replies[key]
+        if item[0] <= now:
+            return False, None
+        self._replies[key] = item
+        self.hits += 1
+        return True, item[1]
+
+    def _store(self, key, reply, ttl):
+        """
+        Keep a reply.  Must hold the lock.
+        :return:
+        """
+        self._replies.pop(key, None)
+        self._replies[key] = (self.clock() + ttl, reply)
+        while len(self._replies) > self.max_size:
+            self._replies.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_run(self, key, ttl, compute):
+        """
+        Return the cached reply of a key, or work it out.  Callers asking
+        for a key that is being worked out wait for it.
+        :param key: Hashable key of the reply
+        :param ttl: Seconds to keep the reply
+        :param compute: Function returning the reply
+        :return: Tuple of the reply and the outcome: "hit", "miss" or
+                 "coalesced"
+        """
+        with self._lock:
+            found, reply = self._lookup(key, self.clock())
+            if found:
+                return reply, HIT
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.reply, COALESCED
+
+        try:
+            flight.reply = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None:
+                    self._store(key, flight.reply, ttl)
+            flight.done.set()
+        return flight.reply, MISS
+
+    def lookup(self, key):
+        """
+        Find a fresh reply, counted as a hit.  For callers doing their own
+        single-flight, such as AsyncSparkBot.
+        :param key: Hashable key of the reply
+        :return: Tuple of True and the reply, or False and None
+        """
+        with self._lock:
+            return self._lookup(key, self.clock())
+
+    def store(self, key, reply, ttl):
+        """
+        Keep a reply worked out by the caller.
+        :param key: Hashable key of the reply
+        :param reply: The reply
+        :param ttl: Seconds to keep it
+        :return:
+        """
+        with self._lock:
+            self._store(key, reply, ttl)
+
+    def record(self, outcome):
+        """
+        Count a lookup answered by the caller's single-flight.
+        :param outcome: "miss" or "coalesced"
+        :return:
+        """
+        with self._lock:
+            if outcome == MISS:
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+    def invalidate(self, command=None):
+        """
+        Drop cached replies.
+        :param command: Only those of this command, or every reply
+        :return:
+        """
+        with self._lock:
+            if command is None:
+                self._replies.clear()
+                return
+            for key in [k for k in self._replies if k[0] == command]:
+                del self._replies[key]
+
+    def stats(self):
+        """
+        Hit, miss and eviction counters.
+        :return: dict of statistics
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return dict(hits=self.hits, misses=self.misses,
+                        coalesced=self.coalesced, evictions=self.evictions,
+                        size=len(self._replies),
+                        hit_rate=((self.hits + self.coalesced) /
+                                  float(lookups) if lookups else 0.0))
+
+    def __len__(self):
+        return len(self._replies)
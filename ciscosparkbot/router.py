@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Command lookup for Spark Bots
+
+Classes:
+    CommandIndex: An Aho-Corasick automaton over the registered command
+    strings.  Finds the command in a message in a single pass over the text,
+    however many commands are registered.
+"""
+
+import threading
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+
+class _Node(object):
+    """A trie node with its Aho-Corasick failure and output links"""
+
+    __slots__ = ("children", "fail", "command", "output")
+
+    def __init__(self):
+        self.children = {}
+        self.fail = None
+        # The command ending at this node, if any
+        self.command = None
+        # Nearest node along the failure chain that ends a command
+        self.output = None
+
+
+class CommandIndex(object):
+    """Finds registered commands within message text"""
+
+    def __init__(self, commands=(), anchored=False):
+        """
+        Initialize a new CommandIndex
+
+        :param commands: Iterable of command strings to index
+        :param anchored: Only match a command at the start of the text
+                         (after leading whitespace).  Otherwise the leftmost
+                         command anywhere in the text is used.
+        """
+        self.anchored = anchored
+        self._root = _Node()
+        self._commands = set()
+        self._max_len = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        for command in commands:
+            self.add(command)
+
+    def __contains__(self, command):
+        return command in self._commands
+
+    def __len__(self):
+        return len(self._commands)
+
+    def add(self, command):
+        """
+        Add a command to the index.
+        :param command: The command string, example "/status"
+        :return:
+        """
+        if not command:
+            raise ValueError("Commands must be non-empty strings")
+        with self._lock:
+            node = self._root
+            for char in command:
+                child = node.children.get(char)
+                if child is None:
+                    child = node.children[char] = _Node()
+                node = child
+            node.command = command
+            self._commands.add(command)
+            self._max_len = max(self._max_len, len(command))
+            self._dirty = True
+
+    def remove(self, command):
+        """
+        Remove a command from the index.
+        :param command: The command string, example "/status"
+        :return:
+        """
+        with self._lock:
+            if command not in self._commands:
+                raise KeyError(command)
+            path = [self._root]
+            for char in command:
+                path.append(path[-1].children[char])
+            path[-1].command = None
+            # Prune the branch back to the last node still in use
+            for i in range(len(command), 0, -1):
+                node = path[i]
+                if node.children or node.command is not None:
+                    break
+                del path[i - 1].children[command[i - 1]]
+            self._commands.discard(command)
+            self._max_len = max([len(c) for c in self._commands] or [0])
+            self._dirty = True
+
+    def match(self, text):
+        """
+        Find the command given in a message.
+
+        Commands only match on word boundaries, so "/echo" is not found in
+        "/echoall".  When several commands match, the leftmost wins, and of
+        those starting at the same place the longest.
+        :param text: The message text
+        :return: The matching command string, or None
+        """
+        return self.search(text)[0]
+
+    def search(self, text):
+        """
+        Find the command given in a message, and where it ends.
+        :param text: The message text
+        :return: Tuple of the matching command string and the offset in the
+                 text just past it, or None and None
+        """
+        if not text:
+            return None, None
+        if self._dirty:
+            self._build()
+        if self.anchored:
+            return self._match_anchored(text)
+        return self._match_anywhere(text)
+
+    def _build(self):
+        """
+        Compute failure and output links breadth first.
+        :return:
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            root = self._root
+            root.fail = root
+            root.output = None
+            level = []
+            for child in root.children.values():
+                child.fail = root
+                child.output = None
+                level.append(child)
+            while level:
+                next_level = []
+                for node in level:
+                    for char, child in node.children.items():
+                        fail = node.fail
+                        while fail is not root and char not in fail.children:
+                            fail = fail.fail
+                        target = fail.children.get(char)
+                        child.fail = target if target is not None else root
+                        if child.fail.command is not None:
+                            child.output = child.fail
+                        else:
+                            child.output = child.fail.output
+                        next_level.append(child)
+                level = next_level
+            self._dirty = False
+
+    @staticmethod
+    def _bounded(text, start, end, command):
+        """
+        Check that a match is not part of a larger word.
+        :return: True if the match sits on word boundaries
+        """
+        if start > 0 and _is_word(command[0]) and _is_word(text[start - 1]):
+            return False
+        if (end < len(text) and _is_word(command[-1]) and
+                _is_word(text[end])):
+            return False
+        return True
+
+    def _match_anchored(self, text):
+        """
+        Walk the trie from the start of the text, keeping the longest match.
+        :return: Tuple of the matching command string and its end, or None
+                 and None
+        """
+        start = len(text) - len(text.lstrip())
+        node = self._root
+        found = found_end = None
+        for end in range(start, len(text)):
+            node = node.children.get(text[end])
+            if node is None:
+                break
+            if (node.command is not None and
+                    self._bounded(text, start, end + 1, node.command)):
+                found, found_end = node.command, end + 1
+        return found, found_end
+
+    def _match_anywhere(self, text):
+        """
+        Run the automaton over the text, keeping the leftmost-longest match.
+        :return: Tuple of the matching command string and its end, or None
+                 and None
+        """
+        root = self._root
+        node = root
+        best_start = None
+        best = None
+        for i, char in enumerate(text):
+            while node is not root and char not in node.children:
+                node = node.fail
+            node = node.children.get(char, root)
+            out = node if node.command is not None else node.output
+            while out is not None:
+                command = out.command
+                start = i + 1 - len(command)
+                if (self._bounded(text, start, i + 1, command) and
+                        (best is None or start < best_start or
+                         (start == best_start and len(command) > len(best)))):
+                    best_start = start
+                    best = command
+                out = out.output
+            # No later match can start before or grow past the best one
+            if best is not None and i + 1 - best_start >= self._max_len:
+                break
+        if best is None:
+            return None, None
+        return best, best_start + len(best)
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+Rate limited delivery of outbound messages
+
+Classes:
+    SendQueueFull: Raised for messages the scheduler did not accept.
+    TokenBucket: A token bucket rate limiter.
+    SendScheduler: Queues outbound messages per room and sends them in round
+    robin order, within a per bot and a per room rate.  Follows Retry-After
+    when the API throttles and retries transient failures with jittered
+    exponential backoff.
+"""
+
+import collections
+import logging
+import random
+import threading
+import time
+
+from ciscosparkapi import SparkApiError
+from requests.exceptions import ConnectionError, Timeout
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+
+class SendQueueFull(Exception):
+    """A message was not queued because the queue is full or shut down"""
+    pass
+
+
+class TokenBucket(object):
+    """A token bucket refilled at a fixed rate"""
+
+    def __init__(self, rate, capacity=None, clock=time.time):
+        """
+        Initialize a new TokenBucket, initially full
+
+        :param rate: Tokens added per second
+        :param capacity: Most tokens the bucket holds.  Defaults to rate.
+        :param clock: Function returning the current time in seconds
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now):
+        if now > self._updated:
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(self.capacity, self._tokens + refill)
+            self._updated = now
+
+    def delay(self, now=None):
+        """
+        Seconds until a token is available.
+        :param now: Current time, defaults to the bucket's clock
+        :return: 0 if a token is available now
+        """
+        now = self.clock() if now is None else now
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def consume(self, now=None):
+        """
+        Take a token if one is available.
+        :param now: Current time, defaults to the bucket's clock
+        :return: True if a token was taken
+        """
+        now = self.clock() if now is None else now
+        if self.delay(now):
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds, now=None):
+        """
+        Hand out no tokens for a while, for example after a 429 response.
+        :param seconds: Length of the pause
+        :param now: Current time, defaults to the bucket's clock
+        :return:
+        """
+        now = self.clock() if now is None else now
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = self._paused_until
+
+
+class _Job(object):
+    """A message waiting to be sent"""
+
+    __slots__ = ("room_id", "payload", "callback", "attempts", "not_before")
+
+    def __init__(self, room_id, payload, callback):
+        self.room_id = room_id
+        self.payload = payload
+        self.callback = callback
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class SendScheduler(object):
+    """Fair, rate limited sender of outbound messages"""
+
+    def __init__(self, send=None, rate=10, burst=20, room_rate=2,
+                 room_burst=5, max_retries=3, backoff=1.0, max_backoff=30.0,
+                 workers=2, max_queue=1000, idle_room_ttl=300):
+        """
+        Initialize a new SendScheduler
+
+        :param send: Function called with the message payload as keyword
+                     arguments, such as spark.messages.create.  SparkBot
+                     fills this in when left as None.
+        :param rate: Messages per second sent with the bot's token
+        :param burst: Messages the bot may send at once after being idle
+        :param room_rate: Messages per second sent to any single room
+        :param room_burst: Messages one room may receive at once
+        :param max_retries: Retries of a message after transient errors
+        :param backoff: Base delay in seconds before the first retry
+        :param max_backoff: Longest delay between retries
+        :param workers: Threads sending messages.  Messages to one room are
+                        always sent one at a time, in order.
+        :param max_queue: Most messages waiting to be sent
+        :param idle_room_ttl: Seconds an idle room's rate limiter is kept
+        """
+        self.send = send
+        self.room_rate = room_rate
+        self.room_burst = room_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.workers = workers
+        self.max_queue = max_queue
+        self.idle_room_ttl = idle_room_ttl
+
+        self._bucket = TokenBucket(rate, burst)
+        self._room_buckets = {}
+        self._room_seen = {}
+        # Rooms with waiting messages, in round robin order
+        self._rooms = collections.OrderedDict()
+        self._busy = set()
+        self._depth = 0
+        self._cond = threading.Condition()
+        self._threads = []
+        self._accepting = True
+
+        self._counters = dict(submitted=0, rejected=0, sent=0, failed=0,
+                              retried=0, throttled=0)
+
+    def start(self):
+        """
+        Start the sending threads.  Calling start() more than once is a no-op.
+        :return:
+        """
+        if self.send is None:
+            raise ValueError("SendScheduler has no send function")
+        with self._cond:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work,
+                                     name="send-scheduler-%d" % i)
+                t.daemon = True
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, room_id, payload, callback=None):
+        """
+        Queue a message for delivery.
+        :param room_id: Room the message goes to; used for fairness and the
+                        per room rate limit
+        :param payload: dict of arguments for the send function
+        :param callback: Optional function called with (result, error) once
+                         the message is sent or has finally failed
+        :return: True if queued, False if the queue is full or shut down
+        """
+        with self._cond:
+            if not self._accepting or self._depth >= self.max_queue:
+                self._counters["rejected"] += 1
+                return False
+            self._rooms.setdefault(room_id, collections.deque()).append(
+                _Job(room_id, payload, callback))
+            self._depth += 1
+            self._counters["submitted"] += 1
+            self._cond.notify()
+        return True
+
+    def drain(self, timeout=None):
+        """
+        Wait until every queued message is sent or has failed.
+        :param timeout: Seconds to wait, or None to wait forever
+        :return: True if the queue drained, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._depth or self._busy:
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Stop accepting messages, send what is queued and stop the threads.
+        :param timeout: Seconds to wait for the queue to drain
+        :return: True if everything queued was delivered or failed
+        """
+        with self._cond:
+            self._accepting = False
+        drained = self.drain(timeout)
+        with self._cond:
+            threads, self._threads = self._threads, []
+            self._cond.notify_all()
+        for t in threads:
+            t.join(timeout)
+        return drained
+
+    def stats(self):
+        """
+        Current queue depth and delivery counters.
+        :return: dict of statistics
+        """
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update(queue_depth=self._depth,
+                         queue_max=self.max_queue,
+                         rooms_waiting=len(self._rooms),
+                         in_flight=len(self._busy))
+        return stats
+
+    def _room_bucket(self, room_id, now):
+        bucket = self._room_buckets.get(room_id)
+        if bucket is None:
+            bucket = TokenBucket(self.room_rate, self.room_burst)
+            self._room_buckets[room_id] = bucket
+        self._room_seen[room_id] = now
+        return bucket
+
+    def _expire_rooms(self, now):
+        """
+        Forget the rate limiters of rooms that have been idle a while.
+        :return:
+        """
+        cutoff = now - self.idle_room_ttl
+        for room_id in [r for r, seen in self._room_seen.items()
+                        if seen < cutoff and r not in self._rooms]:
+            del self._room_seen[room_id]
+            del self._room_buckets[room_id]
+
+    def _next_job(self, now):
+        """
+        Pick the next message to send, in round robin order over the rooms.
+        Must be called holding the lock.
+        :return: Tuple of the job (or None) and seconds until one may be ready
+        """
+        wait = self._bucket.delay(now)
+        if wait:
+            return None, wait
+        wait = None
+        for room_id, jobs in self._rooms.items():
+            if room_id in self._busy:
+                continue
+            ready = max(jobs[0].not_before - now,
+                        self._room_bucket(room_id, now).delay(now))
+            if ready > 0:
+                wait = ready if wait is None else min(wait, ready)
+                continue
+            self._bucket.consume(now)
+            self._room_buckets[room_id].consume(now)
+            job = jobs.popleft()
+            # Rotate the room to the back so others get a turn
+            del self._rooms[room_id]
+            if jobs:
+                self._rooms[room_id] = jobs
+            self._busy.add(room_id)
+            self._depth -= 1
+            return job, 0
+        return None, wait
+
+    def _requeue(self, job):
+        """
+        Put a job back at the head of its room.  Must hold the lock.
+        :return:
+        """
+        jobs = self._rooms.get(job.room_id)
+        if jobs is None:
+            jobs = self._rooms[job.room_id] = collections.deque()
+        jobs.appendleft(job)
+        self._depth += 1
+
+    def _retry_delay(self, attempts):
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.5)
+
+    # noinspection PyMethodMayBeStatic
+    def _is_transient(self, error):
+        if isinstance(error, (ConnectionError, Timeout)):
+            return True
+        if isinstance(error, SparkApiError):
+            return error.response.status_code >= 500
+        return False
+
+    def _work(self):
+        """
+        Sending thread loop.
+        :return:
+        """
+        while True:
+            with self._cond:
+                while True:
+                    if not self._threads and not self._depth:
+                        return
+                    now = time.time()
+                    job, wait = self._next_job(now)
+                    if job is not None:
+                        break
+                    self._expire_rooms(now)
+                    self._cond.wait(wait)
+
+            result = error = None
+            try:
+                result = self.send(**job.payload)
+            except Exception as e:
+                error = e
+
+            done = True
+            with self._cond:
+                if error is not None:
+                    retry_after = getattr(error, "retry_after", None)
+                    if retry_after is not None:
+                        # Throttled: stop sending with this token for a while
+                        self._counters["throttled"] += 1
+                        self._bucket.pause(retry_after)
+                        self._requeue(job)
+                        done = False
+                    elif (self._is_transient(error) and
+                          job.attempts < self.max_retries):
+                        job.attempts += 1
+                        job.not_before = (time.time() +
+                                          self._retry_delay(job.attempts))
+                        self._counters["retried"] += 1
+                        self._requeue(job)
+                        done = False
+                    else:
+                        self._counters["failed"] += 1
+                else:
+                    self._counters["sent"] += 1
+                if not done:
+                    self._busy.discard(job.room_id)
+                    self._cond.notify_all()
+                    continue
+
+            if error is not None:
+                logger.warning("Failed to send message to room %s: %s",
+                               job.room_id, error)
+            if job.callback is not None:
+                try:
+                    job.callback(result, error)
+                except Exception:
+                    logger.exception("Error in send callback")
+            # The room stays busy until its callback ran, keeping order
+            with self._cond:
+                self._busy.discard(job.room_id)
+                self._cond.notify_all()
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Pooled HTTP connections for the Spark API client
+
+Classes:
+    PoolStats: Thread safe counters of connection pool usage.
+    PooledHTTPAdapter: A requests transport adapter with a tunable
+    keep-alive connection pool, connect/read timeouts and pool statistics.
+
+Functions:
+    build_spark_api: Create a CiscoSparkAPI whose calls all go through one
+    PooledHTTPAdapter.
+"""
+
+import threading
+import time
+
+from ciscosparkapi import CiscoSparkAPI
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+class PoolStats(object):
+    """Counters of connection checkouts from a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += waited
+            if waited > self.max_wait_time:
+                self.max_wait_time = waited
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def as_dict(self):
+        """
+        Snapshot of the counters.
+        :return: dict of statistics
+        """
+        with self._lock:
+            checkouts = self.checkouts
+            return dict(requests=checkouts,
+                        new_connections=self.new_connections,
+                        reused_connections=max(
+                            0, checkouts - self.new_connections),
+                        wait_time=self.wait_time,
+                        max_wait_time=self.max_wait_time,
+                        avg_wait_time=(self.wait_time / checkouts
+                                       if checkouts else 0.0))
+
+
+def _counting_pool(base, stats):
+    """
+    Subclass a urllib3 connection pool to record into a PoolStats.
+    :param base: HTTPConnectionPool or HTTPSConnectionPool
+    :param stats: PoolStats to record into
+    :return: The connection pool class
+    """
+
+    class CountingPool(base):
+        def _get_conn(self, timeout=None):
+            start = time.time()
+            conn = super(CountingPool, self)._get_conn(timeout)
+            stats.record_checkout(time.time() - start)
+            return conn
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super(CountingPool, self)._new_conn()
+
+    CountingPool.__name__ = "Counting" + base.__name__
+    return CountingPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """requests adapter with a tunable, instrumented connection pool"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 pool_block=False, connect_timeout=None, read_timeout=None,
+                 max_retries=0):
+        """
+        Initialize a new PooledHTTPAdapter
+
+        :param pool_connections: Number of hosts to keep connection pools for
+        :param pool_maxsize: Keep-alive connections kept per host
+        :param pool_block: Wait for a free connection when all pool_maxsize
+                           connections are busy, instead of opening an
+                           extra one that is discarded afterwards
+        :param connect_timeout: Seconds to wait for a connection, overriding
+                                the timeout given by the caller
+        :param read_timeout: Seconds to wait for a response, overriding the
+                             timeout given by the caller
+        :param max_retries: Connection retries, passed on to requests
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.stats = PoolStats()
+        super(PooledHTTPAdapter, self).__init__(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block, max_retries=max_retries)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.stats),
+            "https": _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def request_timeout(self, timeout):
+        """
+        Combine the caller's timeout with the configured ones.
+        :param timeout: Timeout given for the request
+        :return: Timeout passed on to urllib3
+        """
+        if self.connect_timeout is None and self.read_timeout is None:
+            return timeout
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect = read = timeout
+        if self.connect_timeout is not None:
+            connect = self.connect_timeout
+        if self.read_timeout is not None:
+            read = self.read_timeout
+        return connect, read
+
+    def send(self, request, timeout=None, **kwargs):
+        return super(PooledHTTPAdapter, self).send(
+            request, timeout=self.request_timeout(timeout), **kwargs)
+
+
+def build_spark_api(access_token, base_url=None, adapter=None, **kwargs):
+    """
+    Create a CiscoSparkAPI that sends every request through one adapter.
+    :param access_token: Spark Auth Token
+    :param base_url: URL to the Spark/Webex API endpoint
+    :param adapter: PooledHTTPAdapter to use.  Sharing an adapter between
+                    clients shares its connection pool.
+    :param kwargs: Passed on to CiscoSparkAPI
+    :return: CiscoSparkAPI
+    """
+    if base_url:
+        kwargs["base_url"] = base_url
+    api = CiscoSparkAPI(access_token=access_token, **kwargs)
+    if adapter is None:
+        adapter = PooledHTTPAdapter()
+    # ciscosparkapi keeps a single requests.Session for all of its calls
+    req_session = api._session._req_session
+    req_session.mount("https://", adapter)
+    req_session.mount("http://", adapter)
+    return api
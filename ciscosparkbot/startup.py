@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Coordinated bot startup
+
+Classes:
+    SetupLock: Lets the worker processes of one deployment share a single
+    webhook reconciliation.  The first worker to take the lock does the work
+    and records the result; the others reuse it.
+"""
+
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+
+class SetupLock(object):
+    """A lock file recording the result of a setup step"""
+
+    def __init__(self, path, ttl=300):
+        """
+        :param path: Lock file shared by the processes, for example
+                     /tmp/mybot.setup
+        :param ttl: Seconds a recorded result is reused before the setup
+                    runs again, for example on the next deployment
+        """
+        self.path = path
+        self.ttl = ttl
+
+    def run(self, key, setup):
+        """
+        Run setup unless another process recently ran it for the same key.
+        :param key: Identifies the setup, so a changed configuration runs
+                    it again
+        :param setup: Function doing the setup; must return a JSON
+                      serializable result
+        :return: The result of setup, possibly recorded by another process
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            recorded = self._read(fd)
+            if (recorded.get("key") == key and
+                    recorded.get("time", 0) + self.ttl > time.time()):
+                return recorded["result"]
+            result = setup()
+            self._write(fd, dict(key=key, time=time.time(), result=result))
+            return result
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+    # noinspection PyMethodMayBeStatic
+    def _read(self, fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        chunks = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            return json.loads(b"".join(chunks).decode("utf-8"))
+        except ValueError:
+            return {}
+
+    # noinspection PyMethodMayBeStatic
+    def _write(self, fd, record):
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, json.dumps(record).encode("utf-8"))
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Webhook reconciliation
+
+Brings the webhooks registered with Spark in line with a declared set.  The
+current webhooks are listed with the largest page size and indexed in a
+single pass; creates, updates and deletes are then issued together.
+Webhooks sharing a declared name are duplicates, which make Spark deliver
+every event several times, and are deleted.
+
+Functions:
+    plan: Works out the changes needed to reconcile webhooks.
+
+Classes:
+    WebhookSpec: A webhook that should exist.
+    ReconcileResult: What a reconcile changed and how many API calls it made.
+    WebhookReconciler: Reconciles the webhooks of one access token.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from ciscosparkapi import spark_data_factory
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+# Largest page the webhooks API returns
+MAX_PAGE_SIZE = 100
+
+
+def plan(specs, hooks):
+    """
+    Work out the changes reconciling webhooks, without making any.
+    :param specs: WebhookSpecs to reconcile
+    :param hooks: Webhook dicts currently registered
+    :return: Tuple of lists: creates (specs), updates (spec, hook),
+             deletes (hooks) and unchanged (spec, hook)
+    """
+    by_name = {}
+    by_target = {}
+    for hook in hooks:
+        by_name.setdefault(hook.get("name"), []).append(hook)
+        by_target.setdefault(hook.get("targetUrl"), []).append(hook)
+
+    names = set(spec.name for spec in specs)
+    creates, updates, deletes, unchanged = [], [], [], []
+    claimed = set()
+    for spec in specs:
+        candidates = by_name.get(spec.name, [])
+        keep = None
+        # Prefer a webhook already right, then one that can be updated
+        for hook in candidates:
+            if (spec.same_subscription(hook) and
+                    not spec.needs_update(hook)):
+                keep = hook
+                break
+        if keep is None:
+            for hook in candidates:
+                if spec.same_subscription(hook):
+                    keep = hook
+                    break
+        if keep is None:
+            # A renamed bot: reuse a webhook of ours under an old name
+            for hook in by_target.get(spec.target_url, []):
+                if (hook["id"] not in claimed and
+                        hook.get("name") not in names and
+                        spec.same_subscription(hook)):
+                    keep = hook
+                    break
+
+        # Every other webhook with the name is a duplicate, or watches
+        # the wrong events
+        for hook in candidates:
+            if hook is not keep:
+                deletes.append(hook)
+        if keep is None:
+            creates.append(spec)
+            continue
+        claimed.add(keep["id"])
+        if spec.needs_update(keep):
+            updates.append((spec, keep))
+        else:
+            unchanged.append((spec, keep))
+    return creates, updates, deletes, unchanged
+
+
+class WebhookSpec(object):
+    """A webhook that should be registered"""
+
+    def __init__(self, name, target_url, resource="messages", event="created",
+                 filter=None, secret=None):
+        """
+        :param name: Name of the webhook; unique within the declared set
+        :param target_url: URL Spark delivers events to
+        :param resource: Resource watched, for example "messages"
+        :param event: Event watched, for example "created"
+        :param filter: Optional filter, for example "roomId=..."
+        :param secret: Optional secret Spark signs deliveries with
+        """
+        self.name = name
+        self.target_url = target_url
+        self.resource = resource
+        self.event = event
+        self.filter = filter
+        self.secret = secret
+
+    def same_subscription(self, hook):
+        """
+        Check whether a registered webhook watches the same events.  Spark
+        can't change the resource, event or filter of a webhook, so a
+        webhook differing in those is replaced rather than updated.
+        :param hook: dict of a registered webhook
+        :return: True if resource, event and filter match
+        """
+        return (hook.get("resource") == self.resource and
+                hook.get("event") == self.event and
+                hook.get("filter") == self.filter)
+
+    def needs_update(self, hook):
+        """
+        Check whether a registered webhook with the same subscription must be
+        updated to match.
+        :param hook: dict of a registered webhook
+        :return: True if name, target URL, secret or status differ
+        """
+        if hook.get("name") != self.name:
+            return True
+        if hook.get("targetUrl") != self.target_url:
+            return True
+        if hook.get("status", "active") != "active":
+            return True
+        # The API doesn't return the secret, so one that isn't shown may
+        # never have been set.  Re-send it rather than let a webhook
+        # without it fail every signature check.
+        return bool(self.secret) and hook.get("secret") != self.secret
+
+    def create_args(self):
+        """
+        :return: dict of arguments for webhooks.create
+        """
+        args = dict(name=self.name, targetUrl=self.target_url,
+                    resource=self.resource, event=self.event)
+        if self.filter:
+            args["filter"] = self.filter
+        if self.secret:
+            args["secret"] = self.secret
+        return args
+
+    def update_args(self, hook_id):
+        """
+        :param hook_id: ID of the webhook to update
+        :return: dict of arguments for webhooks.update
+        """
+        args = dict(webhookId=hook_id, name=self.name,
+                    targetUrl=self.target_url, status="active")
+        if self.secret:
+            args["secret"] = self.secret
+        return args
+
+    def __repr__(self):
+        return "WebhookSpec(%r, %r, %r, %r)" % (self.name, self.target_url,
+                                                self.resource, self.event)
+
+
+class ReconcileResult(object):
+    """The outcome of a reconcile"""
+
+    def __init__(self):
+        # Webhook objects by declared name, as registered after the reconcile
+        self.webhooks = {}
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = []
+        # Tuples of (action, name or webhook ID, exception)
+        self.errors = []
+        self.api_calls = 0
+
+    def as_dict(self):
+        """
+        Summary of the reconcile.
+        :return: dict of counts
+        """
+        return dict(created=len(self.created), updated=len(self.updated),
+                    deleted=len(self.deleted), unchanged=len(self.unchanged),
+                    errors=len(self.errors), api_calls=self.api_calls)
+
+
+class WebhookReconciler(object):
+    """Keeps the webhooks of one access token in line with a declared set"""
+
+    def __init__(self, api, workers=4, executor=None, page_size=MAX_PAGE_SIZE):
+        """
+        :param api: A CiscoSparkAPI for the bot's access token
+        :param workers: Threads issuing the create, update and delete calls
+        :param executor: Optional concurrent.futures executor to use instead,
+                         for example one shared by several bots in a process
+        :param page_size: Webhooks requested per page when listing
+        """
+        self.api = api
+        self.workers = workers
+        self.executor = executor
+        self.page_size = page_size
+
+    def list_webhooks(self, result):
+        """
+        List every registered webhook, counting the pages fetched.
+        :param result: ReconcileResult counting the API calls
+        :return: list of webhook dicts
+        """
+        hooks = []
+        pages = self.api._session.get_pages("webhooks",
+                                            params={"max": self.page_size})
+        for page in pages:
+            result.api_calls += 1
+            hooks.extend(page.get("items", []))
+        return hooks
+
+    def reconcile(self, specs):
+        """
+        Create, update and delete webhooks so that exactly one webhook exists
+        for each spec.  Webhooks with other names are left alone.  Failed
+        calls are recorded in the result rather than raised.
+        :param specs: WebhookSpecs to reconcile
+        :return: ReconcileResult
+        """
+        result = ReconcileResult()
+        hooks = self.list_webhooks(result)
+        creates, updates, deletes, unchanged = plan(specs, hooks)
+
+        for spec, hook in unchanged:
+            result.unchanged.append(spec.name)
+            result.webhooks[spec.name] = spark_data_factory("webhook", hook)
+        # Until an update succeeds the existing webhook stands
+        for spec, hook in updates:
+            result.webhooks[spec.name] = spark_data_factory("webhook", hook)
+
+        calls = []
+        for spec in creates:
+            calls.append(("create", spec.name,
+                          self.api.webhooks.create, spec.create_args()))
+        for spec, hook in updates:
+            calls.append(("update", spec.name,
+                          self.api.webhooks.update,
+                          spec.update_args(hook["id"])))
+        for hook in deletes:
+            calls.append(("delete", hook["id"],
+                          self.api.webhooks.delete,
+                          dict(webhookId=hook["id"])))
+
+        for (action, name, _, _), (webhook, error) in zip(
+                calls, self._run(calls)):
+            result.api_calls += 1
+            if error is not None:
+                logger.warning("Failed to %s webhook %s: %s",
+                               action, name, error)
+                result.errors.append((action, name, error))
+            elif action == "delete":
+                result.deleted.append(name)
+            else:
+                getattr(result, action + "d").append(name)
+                result.webhooks[name] = webhook
+        return result
+
+    def _run(self, calls):
+        """
+        Issue API calls, concurrently when there are several.
+        :param calls: list of (action, name, function, kwargs)
+        :return: list of (result, error) in the order of calls
+        """
+        def call(function, kwargs):
+            try:
+                return function(**kwargs), None
+            except Exception as e:
+                return None, e
+
+        if len(calls) <= 1 or (self.executor is None and self.workers <= 1):
+            return [call(c[2], c[3]) for c in calls]
+        if self.executor is not None:
+            futures = [self.executor.submit(call, c[2], c[3]) for c in calls]
+            return [f.result() for f in futures]
+        with ThreadPoolExecutor(min(self.workers, len(calls))) as executor:
+            futures = [executor.submit(call, c[2], c[3]) for c in calls]
+            return [f.result() for f in futures]
@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+"""
+Split ingress and worker deployment
+
+A SparkBot normally handles every webhook in the web process that received
+it.  In a split deployment a thin ingress only verifies webhooks and puts
+them on a work queue, and worker processes take them off and run the
+commands.  Ingress replicas never touch the Spark API, so they don't race
+to set up the webhook; the workers do that, and scale on their own.
+
+    queue = RedisWorkQueue(RespClient("redis.internal"))
+
+    # ingress.py, behind the load balancer
+    app = build_ingress("mybot", token, email, url, queue, secret)
+
+    # worker.py
+    bot = SparkBot("mybot", spark_bot_token=token, spark_bot_email=email,
+                   spark_bot_url=url, webhook_secret=secret,
+                   dedup_cache=DedupCache(RedisDedupBackend(redis_client)),
+                   startup="lazy")
+    bot.add_command(...)
+    Worker(bot, queue, threads=8).run()
+
+Webhooks are partitioned by room, and a partition is handed to one worker
+at a time, so the messages of a room are handled in the order received.
+Delivery is at least once: a webhook stays on the queue until a worker acks
+it, and is handed out again if the worker fails or dies.  Workers record
+each message handled in the bot's dedup cache and skip those already done,
+so a redelivery or a webhook Spark sent twice runs its command once, unless
+a worker died between replying and recording it.
+
+Classes:
+    Delivery: A webhook taken off a queue, to ack or nack.
+    WorkQueue: Interface of a partitioned, at least once queue of webhooks.
+    MemoryWorkQueue: A queue within one process.
+    RedisWorkQueue: A queue in Redis, shared by ingress and worker processes.
+    RespClient: A minimal client of the Redis protocol.
+    QueueIngress: Lets a SparkBot put its webhooks on a queue.
+    Worker: Threads handling the webhooks of a queue with a bot.
+
+Functions:
+    build_ingress: A SparkBot that only enqueues its webhooks.
+"""
+
+import collections
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+
+__author__ = "imapex"
+__author_email__ = "CiscoSparkBot@imapex.io"
+__copyright__ = "Copyright (c) 2016 Cisco Systems, Inc."
+__license__ = "Apache 2.0"
+
+logger = logging.getLogger(__name__)
+
+
+class Delivery(object):
+    """A webhook handed to a worker, unacknowledged"""
+
+    __slots__ = ("partition", "post_data", "attempts", "consumer")
+
+    def __init__(self, partition, post_data, attempts, consumer):
+        """
+        :param partition: Partition the webhook came from
+        :param post_data: The webhook payload
+        :param attempts: Earlier deliveries of the webhook that failed
+        :param consumer: ID of the worker it was handed to
+        """
+        self.partition = partition
+        self.post_data = post_data
+        self.attempts = attempts
+        self.consumer = consumer
+
+    @property
+    def message_id(self):
+        return self.post_data["data"]["id"]
+
+
+class WorkQueue(object):
+    """
+    A queue of webhooks, partitioned by room.  Only one delivery of each
+    partition is out at a time, which keeps every room in order.
+    """
+
+    def __init__(self, partitions=16, max_attempts=5):
+        """
+        :param partitions: Number of partitions; the most webhooks handled
+                           at the same time
+        :param max_attempts: Deliveries of a webhook before it is moved to
+                             the dead letters
+        """
+        self.partitions = partitions
+        self.max_attempts = max_attempts
+
+    def partition(self, post_data):
+        """
+        The partition of a webhook, the same in every process.
+        :param post_data: The webhook payload
+        :return: Partition number
+        """
+        key = post_data["data"].get("roomId") or post_data["data"]["id"]
+        return zlib.crc32(key.encode("utf-8")) % self.partitions
+
+    def put(self, post_data):
+        """
+        Queue a webhook.
+        :param post_data: The webhook payload
+        :return: True if queued
+        """
+        raise NotImplementedError
+
+    def get(self, consumer, timeout=None):
+        """
+        Take the next webhook of a partition no other worker holds.
+        :param consumer: ID of the worker
+        :param timeout: Seconds to wait for one
+        :return: A Delivery, or None
+        """
+        raise NotImplementedError
+
+    def ack(self, delivery):
+        """
+        Remove a handled webhook and release its partition.
+        :param delivery: The Delivery
+        :return: False if the delivery had expired and was handed out again
+        """
+        raise NotImplementedError
+
+    def nack(self, delivery):
+        """
+        Release a webhook that failed, to be handed out again first.  After
+        max_attempts it is moved to the dead letters instead.
+        :param delivery: The Delivery
+        :return:
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+        :return: dict of statistics
+        """
+        return {}
+
+
+class MemoryWorkQueue(WorkQueue):
+    """A work queue within one process"""
+
+    def __init__(self, partitions=16, max_attempts=5, max_size=10000):
+        """
+        :param partitions: Number of partitions
+        :param max_attempts: Deliveries of a webhook before it is dropped
+        :param max_size: Most webhooks queued; put() fails beyond this
+        """
+        super(MemoryWorkQueue, self).__init__(partitions, max_attempts)
+        self.max_size = max_size
+        # Per partition: deque of [post_data, attempts]
+        self._queues = [collections.deque() for _ in range(partitions)]
+        self._held = set()
+        self._size = 0
+        self._next = 0
+        self._ready = threading.Condition()
+        self.dead = []
+
+    def put(self, post_data):
+        partition = self.partition(post_data)
+        with self._ready:
+            if self._size >= self.max_size:
+                return False
+            self._queues[partition].append([post_data, 0])
+            self._size += 1
+            self._ready.notify()
+        return True
+
+    def _take(self, consumer):
+        for i in range(self.partitions):
+            partition = (self._next + i) % self.partitions
+            if partition not in self._held and self._queues[partition]:
+                self._next = partition + 1
+                self._held.add(partition)
+                post_data, attempts = self._queues[partition][0]
+                return Delivery(partition, post_data, attempts, consumer)
+        return None
+
+    def get(self, consumer, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        with self._ready:
+            while True:
+                delivery = self._take(consumer)
+                if delivery is not None:
+                    return delivery
+                if deadline is None:
+                    self._ready.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return None
+                    self._ready.wait(remaining)
+
+    def ack(self, delivery):
+        with self._ready:
+            self._queues[delivery.partition].popleft()
+            self._size -= 1
+            self._held.discard(delivery.partition)
+            self._ready.notify()
+        return True
+
+    def nack(self, delivery):
+        with self._ready:
+            queue = self._queues[delivery.partition]
+            queue[0][1] += 1
+            if queue[0][1] >= self.max_attempts:
+                self.dead.append(queue.popleft()[0])
+                self._size -= 1
+            self._held.discard(delivery.partition)
+            self._ready.notify()
+
+    def stats(self):
+        with self._ready:
+            return dict(queued=self._size, held=len(self._held),
+                        dead=len(self.dead))
+
+
+class RespClient(object):
+    """
+    A minimal, thread safe Redis protocol client, for deployments without
+    redis-py.  A redis.Redis client can be used in its place.
+    """
+
+    def __init__(self, host="localhost", port=6379, timeout=10):
+        """
+        :param host: Redis host
+        :param port: Redis port
+        :param timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port),
+                                            self.timeout)
+            connection = self._local.connection = (sock, sock.makefile("rb"))
+        return connection
+
+    def execute_command(self, *args):
+        """
+        Run a command.
+        :param args: Command name and arguments
+        :return: The reply: bytes, int, list or None
+        :raises RuntimeError: On an error reply
+        """
+        # bytes has no % formatting before Python 3.5
+        parts = [("*%d\r\n" % len(args)).encode("ascii")]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.extend((("$%d\r\n" % len(arg)).encode("ascii"), arg,
+                          b"\r\n"))
+        sock, reader = self._connection()
+        try:
+            sock.sendall(b"".join(parts))
+            return self._read(reader)
+        except (socket.error, ValueError):
+            # Don't reuse a connection left mid reply
+            self.close()
+            raise
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise socket.error("Connection closed by Redis")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RuntimeError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise ValueError("Unexpected Redis reply %r" % line)
+
+    def close(self):
+        """
+        Close this thread's connection.
+        :return:
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._local.connection = None
+            connection[1].close()
+            connection[0].close()
+
+
+# Scripts run by RedisWorkQueue, so checking that a worker still holds a
+# partition and changing it are one atomic step.  KEYS[1] is the partition
+# list, KEYS[2] its lock, and ARGV[1] the worker expected to hold it.
+RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[2]) ~= ARGV[1] then return 0 end
+redis.call("DEL", KEYS[2])
+return 1
+"""
+
+ACK_SCRIPT = """
+if redis.call("GET", KEYS[2]) ~= ARGV[1] then return 0 end
+redis.call("LPOP", KEYS[1])
+redis.call("DEL", KEYS[2])
+return 1
+"""
+
+# KEYS[3] is the dead list.  ARGV[2] is the webhook to retry, or empty to
+# move it to the dead list.
+NACK_SCRIPT = """
+if redis.call("GET", KEYS[2]) ~= ARGV[1] then return 0 end
+if ARGV[2] == "" then
+    local item = redis.call("LPOP", KEYS[1])
+    if item then redis.call("RPUSH", KEYS[3], item) end
+else
+    redis.call("LSET", KEYS[1], 0, ARGV[2])
+end
+redis.call("DEL", KEYS[2])
+return 1
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    A work queue in Redis.  Each partition is a list, and a worker holds a
+    partition with a lock key that expires after lease seconds, so the
+    partition of a worker that died is handed out again.
+    """
+
+    def __init__(self, client, name="ciscosparkbot:work", partitions=16,
+                 max_attempts=5, lease=300, poll_interval=0.1):
+        """
+        :param client: RespClient, or redis.Redis client
+        :param name: Prefix of the Redis keys
+        :param partitions: Number of partitions
+        :param max_attempts: Deliveries of a webhook before it is moved to
+                             the name:dead list
+        :param lease: Seconds a worker may hold a partition; longer than
+                      any command takes
+        :param poll_interval: Seconds between looks at the partitions when
+                              they are all empty or held
+        """
+        super(RedisWorkQueue, self).__init__(partitions, max_attempts)
+        self.client = client
+        self.name = name
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._next = 0
+
+    def _list(self, partition):
+        return "%s:p:%d" % (self.name, partition)
+
+    def _lock(self, partition):
+        return "%s:lock:%d" % (self.name, partition)
+
+    def put(self, post_data):
+        item = json.dumps(dict(attempts=0, post_data=post_data))
+        self.client.execute_command("RPUSH",
+                                    self._list(self.partition(post_data)),
+                                    item)
+        return True
+
+    def _take(self, consumer):
+        run = self.client.execute_command
+        start = self._next
+        for i in range(self.partitions):
+            partition = (start + i) % self.partitions
+            # Look before locking, so idle partitions cost one command
+            if not run("LLEN", self._list(partition)):
+                continue
+            if not run("SET", self._lock(partition), consumer, "NX", "PX",
+                       int(self.lease * 1000)):
+                continue
+            item = run("LINDEX", self._list(partition), 0)
+            if item is None:
+                run("EVAL", RELEASE_SCRIPT, 2, self._list(partition),
+                    self._lock(partition), consumer)
+                continue
+            self._next = partition + 1
+            item = json.loads(item.decode("utf-8"))
+            return Delivery(partition, item["post_data"], item["attempts"],
+                            consumer)
+        return None
+
+    def get(self, consumer, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            delivery = self._take(consumer)
+            if delivery is not None:
+                return delivery
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def ack(self, delivery):
+        if not self.client.execute_command(
+                "EVAL", ACK_SCRIPT, 2, self._list(delivery.partition),
+                self._lock(delivery.partition), delivery.consumer):
+            logger.warning("Lease of partition %d expired before the ack",
+                           delivery.partition)
+            return False
+        return True
+
+    def nack(self, delivery):
+        attempts = delivery.attempts + 1
+        retry = ""
+        if attempts < self.max_attempts:
+            retry = json.dumps(dict(attempts=attempts,
+                                    post_data=delivery.post_data))
+        self.client.execute_command(
+            "EVAL", NACK_SCRIPT, 3, self._list(delivery.partition),
+            self._lock(delivery.partition), self.name + ":dead",
+            delivery.consumer, retry)
+
+    def stats(self):
+        run = self.client.execute_command
+        queued = sum(run("LLEN", self._list(partition))
+                     for partition in range(self.partitions))
+        return dict(queued=queued, dead=run("LLEN", self.name + ":dead"))
+
+
+class QueueIngress(object):
+    """
+    Puts a SparkBot's webhooks on a work queue.  Given to the bot as its
+    dispatcher.
+    """
+
+    def __init__(self, queue):
+        """
+        :param queue: The WorkQueue
+        """
+        self.queue = queue
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    def submit(self, post_data):
+        try:
+            queued = self.queue.put(post_data)
+        except Exception:
+            logger.exception("Failed to queue a webhook")
+            queued = False
+        with self._lock:
+            if queued:
+                self.submitted += 1
+            else:
+                self.rejected += 1
+        return queued
+
+    def shutdown(self, timeout=None):
+        return True
+
+    def stats(self):
+        stats = dict(self.queue.stats())
+        with self._lock:
+            stats.update(submitted=self.submitted, rejected=self.rejected)
+        return stats
+
+
+def build_ingress(spark_bot_name, spark_bot_token, spark_bot_email,
+                  spark_bot_url, queue, webhook_secret=None, **options):
+    """
+    Create a SparkBot that only verifies webhooks and queues them.  It never
+    calls the Spark API; the workers set up the webhook.
+    :param spark_bot_name: Name of the bot
+    :param spark_bot_token: The bot's access token
+    :param spark_bot_email: The bot's email address
+    :param spark_bot_url: URL of the ingress, the webhook's target
+    :param queue: WorkQueue shared with the workers
+    :param webhook_secret: Secret the webhook is signed with
+    :param options: Further SparkBot arguments
+    :return: The SparkBot, a Flask application
+    """
+    from ciscosparkbot.Spark import SparkBot
+    # Repeated webhooks are caught by the workers, which know whether the
+    # first delivery was handled
+    options.setdefault("dedup_cache", False)
+    return SparkBot(spark_bot_name, spark_bot_token=spark_bot_token,
+                    spark_bot_email=spark_bot_email,
+                    spark_bot_url=spark_bot_url,
+                    webhook_secret=webhook_secret,
+                    dispatcher=QueueIngress(queue), startup="external",
+                    **options)
+
+
+class Worker(object):
+    """Threads taking webhooks off a work queue and handling them"""
+
+    def __init__(self, bot, queue, threads=4, dedup_cache=None, setup=True,
+                 poll_timeout=1.0):
+        """
+        :param bot: SparkBot with the commands; its webhook_url should be
+                    the ingress
+        :param queue: The WorkQueue
+        :param threads: Webhooks handled at the same time
+        :param dedup_cache: DedupCache recording the messages handled,
+                            shared by every worker.  Defaults to the bot's.
+        :param setup: Set up the bot's identity and webhook on start
+        :param poll_timeout: Seconds a thread waits for work before checking
+                             whether the worker is stopping
+        """
+        self.bot = bot
+        self.queue = queue
+        self.threads = threads
+        self.dedup_cache = dedup_cache if dedup_cache is not None else \
+            bot.dedup_cache
+        self.setup = setup
+        self.poll_timeout = poll_timeout
+        self.name = "%s:%d" % (socket.gethostname(), os.getpid())
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.handled = 0
+        self.duplicates = 0
+        self.failed = 0
+
+    def process(self, consumer, timeout=None):
+        """
+        Take one webhook off the queue and handle it.
+        :param consumer: ID of the worker thread
+        :param timeout: Seconds to wait for a webhook
+        :return: True if a webhook was taken
+        """
+        delivery = self.queue.get(consumer, timeout)
+        if delivery is None:
+            return False
+        message_id = delivery.message_id
+        dedup = self.dedup_cache
+        if dedup is not None and message_id in dedup:
+            logger.debug("Skipping message already handled",
+                         extra={"correlation_id": message_id})
+            self.queue.ack(delivery)
+            with self._lock:
+                self.duplicates += 1
+            return True
+        try:
+            self.bot.handle_webhook(delivery.post_data)
+        except Exception:
+            logger.exception("Failed to handle message %s, attempt %d",
+                             message_id, delivery.attempts + 1)
+            self.queue.nack(delivery)
+            with self._lock:
+                self.failed += 1
+            return True
+        # Recorded only once handled, so a worker dying first leaves the
+        # message to be handled again
+        if dedup is not None:
+            dedup.seen(message_id)
+        self.queue.ack(delivery)
+        with self._lock:
+            self.handled += 1
+        return True
+
+    def _work(self, consumer):
+        while not self._stopping.is_set():
+            try:
+                self.process(consumer, self.poll_timeout)
+            except Exception:
+                # For example the queue being unreachable
+                logger.exception("Worker %s failed to take work", consumer)
+                self._stopping.wait(self.poll_timeout)
+
+    def start(self):
+        """
+        Set up the bot, unless told not to, and start the threads.
+        :return:
+        """
+        if self.setup and not self.bot.ready.is_set():
+            self.bot.spark_setup()
+        for i in range(self.threads):
+            consumer = "%s:%d" % (self.name, i)
+            t = threading.Thread(target=self._work, args=(consumer,),
+                                 name="worker-%d" % i)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=None):
+        """
+        Stop the threads once they finish the webhook in hand.
+        :param timeout: Seconds to wait for each thread
+        :return:
+        """
+        self._stopping.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def run(self):
+        """
+        Start and handle webhooks until interrupted.
+        :return:
+        """
+        self.start()
+        try:
+            while not self._stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stats(self):
+        """
+        :return: dict of statistics
+        """
+        with self._lock:
+            stats = dict(handled=self.handled, duplicates=self.duplicates,
+                         failed=self.failed, threads=len(self._threads))
+        stats.update(("queue_" + k, v) for k, v in self.queue.stats().items())
+        return stats
@@ -28,9 +28,14 @@ setup(
     url=about["__uri__"],
     license=about["__license__"],
     install_requires=["requests",
-                      "ciscosparkapi==0.5.5",
-                      "Flask>=0.12.1"
+                      "ciscosparkapi~=0.10.0",
+                      "requests-toolbelt",
+                      "Flask>=0.12.1",
+                      "futures; python_version < '3'"
                       ],
+    extras_require={
+        "aio": ["aiohttp>=3.5"],
+    },
     description="Python Bot for Cisco Spark",
     test_suite='tests',
     tests_require=test_requirements,
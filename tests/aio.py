@@ -0,0 +1,7 @@
+import sys
+
+# The coroutine tests are kept in tests/coroutines, which has no __init__.py
+# so setup.py test doesn't import them on Pythons that can't parse async def
+if sys.version_info >= (3, 8):
+    from .coroutines.aio import (AsyncSparkAPITests,  # noqa: F401
+                                 AsyncSparkBotTests)
@@ -0,0 +1,63 @@
+import unittest
+from ciscosparkbot.args import Arg, ArgParser, ArgumentError, Flag, Option
+
+
+def deploy_parser():
+    return ArgParser("/deploy", [
+        Arg("service"),
+        Arg("replicas", type=int, default=1),
+        Option("env", choices=("staging", "prod"), default="staging",
+               help="Where to deploy"),
+        Flag("dry-run"),
+    ])
+
+
+class ArgParserTests(unittest.TestCase):
+
+    def test_typed_values_and_defaults(self):
+        parser = deploy_parser()
+        args = parser.parse(" web")
+        self.assertEqual(args, dict(service="web", replicas=1, env="staging",
+                                    dry_run=False))
+        args = parser.parse('"web app" 3 --env=prod --dry-run')
+        self.assertEqual((args.service, args.replicas, args.env,
+                          args.dry_run), ("web app", 3, "prod", True))
+        self.assertEqual(parser.parse("web --env prod 2").replicas, 2)
+        with self.assertRaises(AttributeError):
+            args.missing
+
+    def test_malformed_input(self):
+        parser = deploy_parser()
+        for text, error in (
+                ("", "Missing service"),
+                ("web three", "replicas must be a whole number, not three"),
+                ("web --env dev", "env must be one of staging, prod"),
+                ("web --env", "--env needs a value"),
+                ("web --force", "Unknown option --force"),
+                ("web --dry-run=yes", "--dry-run takes no value"),
+                ("web 1 2", "Unexpected 2")):
+            with self.assertRaises(ArgumentError) as raised:
+                parser.parse(text)
+            self.assertEqual(str(raised.exception), error)
+
+    def test_rest_takes_raw_text(self):
+        parser = ArgParser("/say", [Arg("room"), Arg("text", rest=True)])
+        args = parser.parse('ops  hello   "world" --loud')
+        self.assertEqual(args.text, 'hello   "world" --loud')
+        self.assertEqual(parser.usage, "<room> <text...>")
+
+    def test_usage(self):
+        parser = deploy_parser()
+        self.assertEqual(parser.usage, "<service> [replicas] "
+                                       "[--env staging|prod] [--dry-run]")
+        self.assertEqual(
+            parser.error_reply(ArgumentError("Missing service")),
+            "Missing service  \nUsage: /deploy <service> [replicas] "
+            "[--env staging|prod] [--dry-run]  \n--env: Where to deploy")
+
+    def test_invalid_declarations(self):
+        self.assertRaises(ValueError, ArgParser, "/x",
+                          [Arg("a", default=1), Arg("b")])
+        self.assertRaises(ValueError, ArgParser, "/x",
+                          [Arg("a", rest=True), Arg("b", default=1)])
+        self.assertRaises(ValueError, ArgParser, "/x", [Arg("a"), Flag("a")])
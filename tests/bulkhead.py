@@ -0,0 +1,50 @@
+import threading
+import unittest
+from ciscosparkbot.bulkhead import Bulkhead, BulkheadFull, CommandTimeout
+
+
+class BulkheadTests(unittest.TestCase):
+
+    def test_inline_limit(self):
+        bulkhead = Bulkhead("/slow", max_concurrency=1)
+        inner = []
+
+        def callback(message):
+            # A second message while the first runs is shed
+            with self.assertRaises(BulkheadFull):
+                bulkhead.run(lambda m: "second", "m2")
+            inner.append(threading.current_thread())
+            return "first " + message
+
+        self.assertEqual(bulkhead.run(callback, "m1"), "first m1")
+        self.assertEqual(inner, [threading.current_thread()])
+        stats = bulkhead.stats()
+        self.assertEqual((stats["active"], stats["completed"],
+                          stats["rejected"], stats["peak"]), (0, 1, 1, 1))
+        self.assertEqual(stats["saturation"], 0.0)
+
+    def test_timeout_keeps_slot(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        bulkhead = Bulkhead("/slow", max_concurrency=1)
+        self.addCleanup(bulkhead.shutdown)
+        with self.assertRaises(CommandTimeout):
+            bulkhead.run(lambda m: release.wait(5), "m1", timeout=0.05)
+        # The timed out callback is still running
+        with self.assertRaises(BulkheadFull):
+            bulkhead.run(lambda m: "late", "m2", timeout=0.05)
+        release.set()
+        bulkhead.shutdown(wait=True)
+        self.assertEqual(bulkhead.run(lambda m: "ok", "m3", timeout=1), "ok")
+        stats = bulkhead.stats()
+        self.assertEqual((stats["timeouts"], stats["rejected"]), (1, 1))
+
+    def test_workers_isolate_callbacks(self):
+        bulkhead = Bulkhead("reports", workers=2)
+        self.addCleanup(bulkhead.shutdown)
+        thread = bulkhead.run(lambda m: threading.current_thread(), "m1")
+        self.assertIsNot(thread, threading.current_thread())
+        self.assertNotIn("limit", bulkhead.stats())
+
+    def test_invalid_limit(self):
+        self.assertRaises(ValueError, Bulkhead, "/slow", max_concurrency=0)
@@ -0,0 +1,183 @@
+import binascii
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from ciscosparkbot.conversations import (MemorySessionBackend,
+                                         RedisSessionBackend,
+                                         SQLiteSessionBackend, SessionStore,
+                                         dumps, loads)
+from ciscosparkbot.models import IncomingMessage
+from ciscosparkbot.workqueue import RespClient
+from .redis_stub import RedisStub
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def message(room_id="room1", person_id="person1"):
+    return IncomingMessage(dict(id="m1", roomId=room_id,
+                                personId=person_id))
+
+
+class CodecTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        small = {"step": 2, "answers": ["a", "b"]}
+        self.assertEqual(dumps(small), b'j{"answers":["a","b"],"step":2}')
+        large = {"rows": ["row %d" % i for i in range(200)]}
+        blob = dumps(large)
+        self.assertEqual(blob[:1], b"z")
+        self.assertLess(len(blob), len(json.dumps(large)) / 4)
+        self.assertEqual(loads(blob), large)
+        self.assertEqual(loads(dumps(small)), small)
+
+
+class BackendTests(object):
+    """Behaviour every SessionBackend has"""
+
+    def make_backend(self, clock, **options):
+        raise NotImplementedError
+
+    def test_ttl_slides_with_use(self):
+        clock = Clock()
+        backend = self.make_backend(clock, ttl=10)
+        backend.set("a", b"ja")
+        clock.now += 8
+        self.assertEqual(backend.get("a"), b"ja")
+        clock.now += 8
+        self.assertEqual(backend.get("a"), b"ja")
+        clock.now += 11
+        self.assertIsNone(backend.get("a"))
+        backend.set("b", b"jb")
+        backend.delete("b")
+        self.assertIsNone(backend.get("b"))
+
+
+class MemorySessionBackendTests(BackendTests, unittest.TestCase):
+
+    def make_backend(self, clock, **options):
+        return MemorySessionBackend(clock=clock, **options)
+
+    def test_lru_and_memory_budget(self):
+        backend = MemorySessionBackend(max_size=2)
+        backend.set("a", b"j1")
+        backend.set("b", b"j2")
+        backend.get("a")
+        backend.set("c", b"j3")
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(len(backend), 2)
+
+        backend = MemorySessionBackend(max_bytes=2000)
+        for i in range(20):
+            backend.set("room%d" % i, b"j" + b"x" * 100)
+        stats = backend.stats()
+        self.assertLessEqual(stats["bytes"], 2000)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIsNotNone(backend.get("room19"))
+        self.assertIsNone(backend.get("room0"))
+
+    def test_oversized_session_rejected(self):
+        store = SessionStore(MemorySessionBackend(max_bytes=1000))
+        session = store.get("room:r1")
+        session["cursor"] = 1
+        self.assertTrue(store.save(session))
+        session["big"] = [binascii.hexlify(os.urandom(8)).decode("ascii")
+                          for _ in range(200)]
+        with self.assertLogs("ciscosparkbot.conversations", "WARNING"):
+            self.assertFalse(store.save(session))
+        # The stored session is kept, not evicted with the rejected one
+        self.assertEqual(store.get("room:r1"), {"cursor": 1})
+        self.assertEqual(store.stats()["rejected"], 1)
+
+
+class SQLiteSessionBackendTests(BackendTests, unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def make_backend(self, clock, **options):
+        backend = SQLiteSessionBackend(os.path.join(self.dir, "s.db"),
+                                       clock=clock, **options)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_purge_keeps_most_recently_used(self):
+        clock = Clock()
+        backend = self.make_backend(clock, max_size=2)
+        for key in ("a", "b", "c"):
+            backend.set(key, b"j" + key.encode("ascii"))
+            clock.now += 1
+        backend.get("a")
+        backend.purge()
+        self.assertEqual(len(backend), 2)
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), b"ja")
+        self.assertEqual(backend.stats()["evictions"], 1)
+
+    def test_survives_reopening(self):
+        backend = self.make_backend(Clock())
+        backend.set("a", b"ja")
+        backend.close()
+        self.assertEqual(self.make_backend(Clock()).get("a"), b"ja")
+
+
+class RedisSessionBackendTests(unittest.TestCase):
+
+    def test_shared_sessions(self):
+        redis = RedisStub()
+        redis.start()
+        client = RespClient("127.0.0.1", redis.port)
+        self.addCleanup(redis.stop)
+        self.addCleanup(client.close)
+        first = SessionStore(RedisSessionBackend(client))
+        second = SessionStore(RedisSessionBackend(client))
+
+        session = first.load(message())
+        session["step"] = 1
+        self.assertTrue(first.save(session))
+        self.assertEqual(second.load(message()), {"step": 1})
+        self.assertIn(b"ciscosparkbot:session:room:room1", redis.expires)
+
+
+class SessionStoreTests(unittest.TestCase):
+
+    def test_saves_only_changes(self):
+        store = SessionStore()
+        msg = message()
+        msg.sessions = store
+        self.assertFalse(msg.save_session())
+        msg.session["cursor"] = 10
+        self.assertTrue(msg.save_session())
+        self.assertFalse(msg.save_session())
+
+        again = message()
+        again.sessions = store
+        self.assertEqual(again.session["cursor"], 10)
+        again.session.clear()
+        self.assertTrue(again.save_session())
+        self.assertEqual(len(store.backend), 0)
+        stats = store.stats()
+        self.assertEqual((stats["loads"], stats["hits"], stats["saves"],
+                          stats["unchanged"]), (2, 1, 2, 1))
+
+    def test_scopes(self):
+        msg = message("room1", "person1")
+        self.assertEqual(SessionStore().key(msg), "room:room1")
+        self.assertEqual(SessionStore(scope="person").key(msg),
+                         "person:person1")
+        self.assertEqual(SessionStore(scope="room_person").key(msg),
+                         "room:room1:person:person1")
+        self.assertRaises(ValueError, SessionStore, scope="team")
+
+    def test_no_store(self):
+        with self.assertRaises(ValueError):
+            message().session
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import threading
+import unittest
+from ..spark_mock import MockSparkAPI
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+    from ciscosparkbot.aio import AsyncSparkAPI, AsyncSparkBot, _retry_after
+    from ciscosparkbot.files import Attachment
+    from ciscosparkbot.models import MultiResponse
+except ImportError:  # pragma: no cover - aiohttp not installed
+    web = None
+
+
+def fake_spark_api(sent):
+    """An aiohttp app answering the Spark API calls the bot makes"""
+
+    async def webhooks(request):
+        return web.json_response(MockSparkAPI.list_webhooks())
+
+    async def create_webhook(request):
+        return web.json_response(MockSparkAPI.create_webhook())
+
+    async def me(request):
+        return web.json_response(MockSparkAPI.me())
+
+    async def get_message(request):
+        return web.json_response(MockSparkAPI.get_message_dosomething())
+
+    async def create_message(request):
+        sent.append(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get("/v1/webhooks", webhooks)
+    app.router.add_post("/v1/webhooks", create_webhook)
+    app.router.add_get("/v1/people/me", me)
+    app.router.add_get("/v1/messages/{message_id}", get_message)
+    app.router.add_post("/v1/messages", create_message)
+    return app
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncSparkBotTests(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sent = []
+        self.api = TestServer(fake_spark_api(self.sent))
+        await self.api.start_server()
+        self.bot = AsyncSparkBot("testbot",
+                                 spark_bot_token="somefaketoken",
+                                 spark_api_url=str(self.api.make_url("/v1/")),
+                                 spark_bot_email="test@test.com",
+                                 spark_bot_url="http://fakebot.com")
+        self.client = TestClient(TestServer(self.bot.app))
+        await self.client.start_server()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.api.close()
+
+    async def test_setup_resolves_identity_and_webhook(self):
+        self.assertEqual(self.bot.bot_person_id, "myid")
+        self.assertEqual(self.bot.webhook.id, "newwebhook")
+
+    async def test_health_endpoint(self):
+        resp = await self.client.get("/health")
+        self.assertEqual(resp.status, 200)
+        self.assertIn("I'm Alive", await resp.text())
+
+    async def test_sync_callback_runs_on_executor(self):
+        resp = await self.client.post("/",
+                                      data=MockSparkAPI.incoming_msg(),
+                                      headers={"Content-Type":
+                                               "application/json"})
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(await resp.text(), " imtheecho")
+        self.assertEqual(self.sent, [{"roomId": "some_room_id",
+                                      "markdown": " imtheecho"}])
+
+    async def test_async_callback_is_awaited(self):
+        async def echo(message):
+            return "async " + message.text
+
+        self.bot.remove_command("/echo")
+        self.bot.add_command("/echo", "async echo", echo)
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "async /echo imtheecho")
+
+    async def test_session_saved_off_the_event_loop(self):
+        loop_thread = threading.current_thread()
+        saved_on = []
+        save = self.bot.session_store.save
+
+        def record_save(session):
+            saved_on.append(threading.current_thread())
+            return save(session)
+
+        self.bot.session_store.save = record_save
+
+        async def count(message):
+            message.session["count"] = message.session.get("count", 0) + 1
+            return str(message.session["count"])
+
+        self.bot.add_command("/echo", "count", count)
+        for expected in ("1", "2"):
+            resp = await self.client.post("/",
+                                          data=MockSparkAPI.incoming_msg())
+            self.assertEqual(await resp.text(), expected)
+        self.assertEqual(len(saved_on), 2)
+        self.assertNotIn(loop_thread, saved_on)
+
+    async def test_multi_response(self):
+        multi = MultiResponse.broadcast(["room1", "room2"], wait=True,
+                                        markdown="hello")
+        self.bot.add_command("/echo", "broadcast", lambda message: multi)
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "ok")
+        self.assertEqual(sorted(m["roomId"] for m in self.sent),
+                         ["room1", "room2"])
+        self.assertEqual(sorted(multi.succeeded), ["room1", "room2"])
+
+    async def test_multi_response_delivered_before_cleanup(self):
+        multi = MultiResponse.broadcast(["room1", "room2"], markdown="hello")
+        self.bot.add_command("/echo", "broadcast", lambda message: multi)
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "ok")
+        await self.client.close()
+        self.assertEqual(sorted(multi.succeeded), ["room1", "room2"])
+        self.assertEqual(self.bot._deliveries, set())
+
+    async def test_command_limits(self):
+        release = asyncio.Event()
+        self.addCleanup(release.set)
+
+        async def slow(message):
+            await release.wait()
+            return "done"
+
+        self.bot.add_command("/echo", "slow", slow, max_concurrency=1,
+                             timeout=0.05, busy_reply="busy")
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "Sorry, that took too long.")
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "busy")
+        release.set()
+        await asyncio.sleep(0)
+        bulkhead = self.bot.commands["/echo"]["bulkhead"]
+        self.assertEqual(bulkhead.stats()["active"], 0)
+
+    async def test_session_of_timed_out_command(self):
+        release = asyncio.Event()
+        self.addCleanup(release.set)
+        done = asyncio.Event()
+
+        async def steps(message):
+            message.session["step"] = 1
+            await release.wait()
+            message.session["step"] = 2
+            done.set()
+            return "done"
+
+        self.bot.add_command("/echo", "steps", steps, timeout=0.05)
+        resp = await self.client.post("/", data=MockSparkAPI.incoming_msg())
+        self.assertEqual(await resp.text(), "Sorry, that took too long.")
+        self.assertEqual(self.bot.session_store.stats()["saves"], 0)
+        release.set()
+        await done.wait()
+        bulkhead = self.bot.commands["/echo"]["bulkhead"]
+        while bulkhead.stats()["active"]:
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.bot.session_store.get("room:some_room_id"),
+                         {"step": 2})
+
+    async def test_reply_cache(self):
+        calls = []
+
+        async def status(message):
+            calls.append(message.id)
+            await asyncio.sleep(0.01)
+            return "all good"
+
+        self.bot.add_command("/echo", "status", status, cache_ttl=60)
+        resps = await asyncio.gather(*[
+            self.client.post("/", data=MockSparkAPI.incoming_msg())
+            for _ in range(3)])
+        self.assertEqual([await r.text() for r in resps], ["all good"] * 3)
+        self.assertEqual(len(calls), 1)
+        stats = self.bot.reply_cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 2))
+        self.assertEqual(self.bot._reply_tasks, {})
+
+    async def test_self_message_ignored(self):
+        resp = await self.client.post(
+            "/", data=MockSparkAPI.incoming_msg_from_bot())
+        self.assertEqual(await resp.text(), "")
+        self.assertEqual(self.sent, [])
+
+    async def test_invalid_payload_rejected(self):
+        resp = await self.client.post("/", data=json.dumps({"data": {}}))
+        self.assertEqual(resp.status, 400)
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class AsyncSparkAPITests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_upload_retried_after_rate_limit(self):
+        uploads = []
+
+        async def create_message(request):
+            if not uploads:
+                uploads.append(None)
+                return web.Response(status=429, headers={"Retry-After": "1"})
+            form = await request.post()
+            uploads.append(form["files"].file.read())
+            return web.json_response({"id": "m1"})
+
+        app = web.Application()
+        app.router.add_post("/v1/messages", create_message)
+        server = TestServer(app)
+        await server.start_server()
+        self.addAsyncCleanup(server.close)
+        api = AsyncSparkAPI("token", base_url=str(server.make_url("/v1/")))
+        self.addAsyncCleanup(api.close)
+        await api.create_message(files=[Attachment(b"report", "r.txt")],
+                                 roomId="room1")
+        self.assertEqual(uploads, [None, b"report"])
+
+    def test_retry_after_header(self):
+        self.assertEqual(_retry_after({"Retry-After": "30"}), 30)
+        self.assertEqual(_retry_after({"Retry-After": "0"}), 1)
+        self.assertEqual(
+            _retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 15)
+        self.assertEqual(_retry_after({}), 15)
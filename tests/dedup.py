@@ -0,0 +1,75 @@
+import unittest
+from ciscosparkbot.dedup import (DedupCache, MemoryDedupBackend,
+                                 RedisDedupBackend)
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+    def exists(self, name):
+        return int(name in self.data)
+
+
+class DedupTests(unittest.TestCase):
+
+    def test_memory_backend_ttl(self):
+        clock = FakeClock()
+        backend = MemoryDedupBackend(ttl=10, clock=clock)
+        self.assertTrue(backend.add("a"))
+        self.assertFalse(backend.add("a"))
+        clock.now += 11
+        self.assertTrue(backend.add("a"))
+
+    def test_memory_backend_lru(self):
+        backend = MemoryDedupBackend(max_size=2)
+        backend.add("a")
+        backend.add("b")
+        backend.add("a")
+        backend.add("c")
+        self.assertEqual(len(backend), 2)
+        self.assertFalse(backend.add("a"))
+        self.assertTrue(backend.add("b"))
+
+    def test_cache_counts(self):
+        cache = DedupCache()
+        self.assertFalse(cache.seen("a"))
+        self.assertTrue(cache.seen("a"))
+        cache.forget("a")
+        self.assertFalse(cache.seen("a"))
+        self.assertEqual(cache.stats(), dict(hits=1, misses=2, size=1))
+
+    def test_redis_backend_shared_between_replicas(self):
+        redis = FakeRedis()
+        first = DedupCache(RedisDedupBackend(redis))
+        second = DedupCache(RedisDedupBackend(redis))
+        self.assertFalse(first.seen("a"))
+        self.assertTrue(second.seen("a"))
+        second.forget("a")
+        self.assertFalse(first.seen("a"))
+
+    def test_contains_does_not_record(self):
+        redis = DedupCache(RedisDedupBackend(FakeRedis()))
+        for cache in (DedupCache(), redis):
+            self.assertNotIn("a", cache)
+            self.assertFalse(cache.seen("a"))
+            self.assertIn("a", cache)
@@ -0,0 +1,69 @@
+import threading
+import unittest
+from ciscosparkbot.dispatch import Dispatcher
+
+
+class DispatcherTests(unittest.TestCase):
+
+    def test_items_are_handled(self):
+        handled = []
+        d = Dispatcher(handled.append, workers=2, max_queue=10)
+        d.start()
+        for i in range(5):
+            self.assertTrue(d.submit(i))
+        self.assertTrue(d.drain(5))
+        self.assertEqual(sorted(handled), [0, 1, 2, 3, 4])
+        self.assertEqual(d.stats()["processed"], 5)
+        d.shutdown(5)
+
+    def test_full_queue_rejects(self):
+        release = threading.Event()
+        d = Dispatcher(lambda item: release.wait(5), workers=1, max_queue=1)
+        d.start()
+        results = [d.submit(i) for i in range(4)]
+        self.assertIn(False, results)
+        self.assertGreater(d.stats()["rejected"], 0)
+        release.set()
+        d.shutdown(5)
+
+    def test_handler_errors_are_counted(self):
+        def boom(item):
+            raise RuntimeError("boom")
+        d = Dispatcher(boom, workers=1)
+        d.start()
+        d.submit(1)
+        d.drain(5)
+        self.assertEqual(d.stats()["errors"], 1)
+        d.shutdown(5)
+
+    def test_shutdown_drains_and_stops(self):
+        handled = []
+        d = Dispatcher(handled.append, workers=3)
+        d.start()
+        for i in range(20):
+            d.submit(i)
+        self.assertTrue(d.shutdown(5))
+        self.assertEqual(len(handled), 20)
+        self.assertEqual(d.stats()["workers"], 0)
+        self.assertFalse(d.submit(21))
+
+    def test_shutdown_honours_timeout_on_full_queue(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        handled = []
+
+        def handler(item):
+            release.wait(5)
+            handled.append(item)
+        d = Dispatcher(handler, workers=1, max_queue=2)
+        d.start()
+        for i in range(3):
+            d.submit(i)
+        threading.Timer(0.3, release.set).start()
+        self.assertFalse(d.shutdown(0.1))
+        # The running item finishes; the queued ones are abandoned
+        self.assertLessEqual(len(handled), 1)
+
+    def test_requires_a_worker(self):
+        with self.assertRaises(ValueError):
+            Dispatcher(lambda item: None, workers=0)
@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import requests_mock
+from ciscosparkapi import CiscoSparkAPI
+from ciscosparkbot.files import Attachment, FileUploader
+
+MESSAGES_URL = "https://api.ciscospark.com/v1/messages"
+CONTENT_URL = "https://api.ciscospark.com/v1/contents/abc"
+
+
+class AttachmentTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "report.png")
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 100000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_file_is_read_in_chunks(self):
+        for use_mmap in (False, True):
+            attachment = Attachment(self.path, use_mmap=use_mmap)
+            self.assertEqual(attachment.content_type, "image/png")
+            with attachment.open() as f:
+                self.assertEqual(len(f.read(4096)), 4096)
+                self.assertEqual(len(f.read()), 100000 - 4096)
+
+    def test_buffer_needs_a_filename(self):
+        self.assertRaises(ValueError, Attachment, b"data")
+        attachment = Attachment(bytearray(b"data"), "data.txt")
+        self.assertEqual(attachment.size, 4)
+        with attachment.open() as f:
+            self.assertEqual(f.read(), b"data")
+
+    def test_text_path_is_a_path(self):
+        # A unicode path on Python 2 too
+        attachment = Attachment(u"%s" % self.path)
+        self.assertEqual(attachment.filename, "report.png")
+        self.assertEqual(attachment.size, 100000)
+        self.assertEqual(attachment.cache_key(),
+                         Attachment(self.path).cache_key())
+
+    def test_digest_matches_for_same_content(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.assertEqual(Attachment(self.path).digest(),
+                         Attachment(data, "copy.png").digest())
+
+
+class FileUploaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.api = CiscoSparkAPI("somefaketoken")
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "report.txt")
+        with open(self.path, "w") as f:
+            f.write("the report")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_upload_is_multipart(self):
+        uploader = FileUploader(use_mmap=True)
+        sent = []
+
+        def created(request, context):
+            # The body streams from the file until the request is sent
+            sent.append((request, request.body.read()))
+            return {"id": "m1", "files": [CONTENT_URL]}
+
+        with requests_mock.mock() as m:
+            m.post(MESSAGES_URL, json=created)
+            message = uploader.create_message(
+                self.api, dict(roomId="room1", markdown="*hi*",
+                               files=[self.path]))
+        request, body = sent[0]
+        self.assertEqual(message.id, "m1")
+        self.assertTrue(request.headers["Content-type"].startswith(
+            "multipart/form-data"))
+        self.assertIn(b"the report", body)
+        self.assertIn(b'filename="report.txt"', body)
+        self.assertIn(b"room1", body)
+        self.assertEqual(uploader.stats()["uploaded_bytes"], 10)
+
+    def test_repeated_upload_reuses_url(self):
+        uploader = FileUploader(reuse_uploads=True)
+        with requests_mock.mock() as m:
+            m.post(MESSAGES_URL, json={"id": "m1", "files": [CONTENT_URL]})
+            for room in ("room1", "room2"):
+                uploader.create_message(
+                    self.api, dict(roomId=room, files=[self.path]))
+            second = m.request_history[1]
+        self.assertEqual(json.loads(second.text),
+                         {"roomId": "room2", "files": [CONTENT_URL]})
+        stats = uploader.stats()
+        self.assertEqual((stats["uploads"], stats["hits"]), (1, 1))
+
+    def test_publish_replaces_upload(self):
+        published = []
+
+        def publish(attachment, digest):
+            published.append(attachment.filename)
+            return "https://files.example.com/" + digest
+
+        uploader = FileUploader(publish=publish)
+        with requests_mock.mock() as m:
+            m.post(MESSAGES_URL, json={"id": "m1"})
+            for _ in range(2):
+                uploader.create_message(
+                    self.api, dict(roomId="room1",
+                                   files=[Attachment(b"the report",
+                                                     "report.txt")]))
+            sent = [json.loads(r.text) for r in m.request_history]
+        self.assertEqual(published, ["report.txt"])
+        self.assertTrue(all(s["files"][0].startswith(
+            "https://files.example.com/") for s in sent))
+        self.assertEqual(uploader.stats()["uploads"], 0)
+
+    def test_url_is_not_uploaded(self):
+        uploader = FileUploader(reuse_uploads=True)
+        with requests_mock.mock() as m:
+            m.post(MESSAGES_URL, json={"id": "m1"})
+            uploader.create_message(
+                self.api, dict(roomId="room1",
+                               files=["https://example.com/a.png"]))
+        self.assertEqual(uploader.stats()["misses"], 0)
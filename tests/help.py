@@ -0,0 +1,102 @@
+import unittest
+from ciscosparkbot.args import Arg, Flag
+from ciscosparkbot.base import BotBase
+from ciscosparkbot.help import HelpText
+
+
+def callback(message):
+    return ""
+
+
+class Message(object):
+
+    def __init__(self, text):
+        self.text = text
+
+
+class HelpTextTests(unittest.TestCase):
+
+    def setUp(self):
+        self.bot = BotBase()
+        self.bot._init_commands()
+
+    def test_help_lists_visible_commands(self):
+        self.bot.add_command("/secret", "*hidden", callback)
+        text = self.bot.send_help(Message("/help"))
+        self.assertTrue(text.startswith(
+            "Hello!  I understand the following commands:  \n"))
+        self.assertIn("* **/echo**: Reply back with the same message sent. \n",
+                      text)
+        self.assertNotIn("/secret", text)
+
+    def test_help_is_cached_until_commands_change(self):
+        first = self.bot.send_help(Message("/help"))
+        self.assertIs(self.bot.send_help(Message("/help")), first)
+        self.bot.add_command("/status", "Show the status.", callback)
+        self.assertIn("/status", self.bot.send_help(Message("/help")))
+        self.bot.remove_command("/status")
+        self.assertEqual(self.bot.send_help(Message("/help")), first)
+
+    def test_cached_reply_is_looked_up_first(self):
+        help_text = self.bot.help
+        first = help_text.markdown()
+        card = help_text.card()
+        # Nothing is worked out again for a reply already rendered
+        help_text.layout = help_text.page = None
+        self.assertIs(help_text.markdown(), first)
+        self.assertEqual(help_text.card().as_dict(), card.as_dict())
+        del help_text.layout, help_text.page
+        help_text.invalidate()
+        self.assertEqual(help_text.markdown(), first)
+
+    def test_usage_of_declared_arguments(self):
+        self.bot.add_command("/deploy", "Deploy a service.", callback,
+                             args=[Arg("service"), Flag("dry-run")])
+        self.assertIn("* **/deploy** `<service> [--dry-run]`: "
+                      "Deploy a service. \n",
+                      self.bot.send_help(Message("/help")))
+
+    def test_default_action_ignores_message_text(self):
+        self.assertEqual(self.bot.send_help(Message("hello 2")),
+                         self.bot.send_help(Message("/help")))
+
+    def test_groups_and_pages(self):
+        commands = {}
+        for i in range(5):
+            commands["/user%d" % i] = {"help": "user %d" % i}
+            commands["/admin%d" % i] = {"help": "admin %d" % i,
+                                        "group": "Admin"}
+        help_text = HelpText(commands, page_size=4)
+        self.assertEqual(help_text.groups(), ["Admin"])
+        self.assertEqual(help_text.parse(" admin 2"), ("Admin", 2))
+
+        first = help_text.markdown()
+        self.assertIn("Page 1 of 3.  Send **/help 2** for more.", first)
+        self.assertIn("one of: Admin", first)
+        self.assertNotIn("/admin0", first)
+
+        second = help_text.markdown(page=2)
+        self.assertIn("* **/user4**: user 4 \n\n**Admin**  \n* **/admin0**",
+                      second)
+
+        admin = help_text.markdown("Admin", 2)
+        self.assertIn("/admin4", admin)
+        self.assertNotIn("/user", admin)
+        self.assertIn("Page 2 of 2.", admin)
+        # Past the end gives the last page, cached once
+        self.assertIs(help_text.markdown("Admin", 9), admin)
+        for page in range(3, 100):
+            help_text.markdown(page=page)
+            help_text.markdown("nosuchgroup%d" % page)
+        self.assertEqual(len(help_text._cache), 4)
+
+    def test_card(self):
+        self.bot.help_format = "card"
+        self.bot.add_command("/deploy", "Deploy.", callback, group="Ops")
+        reply = self.bot.send_help(Message("/help"))
+        card = reply.attachments[0]["content"]
+        self.assertEqual(card["type"], "AdaptiveCard")
+        facts = [b for b in card["body"] if b["type"] == "FactSet"]
+        self.assertEqual([f["title"] for f in facts[1]["facts"]],
+                         ["/deploy"])
+        self.assertIn("/deploy", reply.markdown)
@@ -0,0 +1,108 @@
+import json
+import re
+import threading
+import unittest
+import requests_mock
+from ciscosparkapi.models import spark_data_factory
+from ciscosparkbot.host import BotHost
+from .spark_mock import MockSparkAPI
+
+
+def webhook(message_id="incoming_message_id", webhook_id="asdfadfsadfasdf"):
+    data = json.loads(MockSparkAPI.incoming_msg())
+    data["id"] = webhook_id
+    data["data"]["id"] = message_id
+    return json.dumps(data)
+
+
+class BotHostTests(unittest.TestCase):
+
+    def setUp(self):
+        mock = requests_mock.Mocker()
+        mock.start()
+        self.addCleanup(mock.stop)
+        mock.get('https://api.ciscospark.com/v1/webhooks',
+                 json=MockSparkAPI.list_webhooks())
+        mock.post('https://api.ciscospark.com/v1/webhooks',
+                  json=MockSparkAPI.create_webhook())
+        mock.get('https://api.ciscospark.com/v1/people/me',
+                 json=MockSparkAPI.me())
+        mock.get(re.compile('https://api.ciscospark.com/v1/messages/.*'),
+                 json=MockSparkAPI.get_message_dosomething())
+        mock.post('https://api.ciscospark.com/v1/messages', json={})
+        self.mock = mock
+
+        self.host = BotHost("http://host.example.com/", workers=2,
+                            max_queue=4)
+        self.addCleanup(self.host.shutdown, 5)
+        self.alpha = self.host.add_bot("alpha", "alphatoken",
+                                       "alpha@test.com", startup="eager")
+        self.beta = self.host.add_bot("beta", "betatoken", "beta@test.com",
+                                      startup="eager")
+        self.beta.webhook = spark_data_factory("webhook", {"id": "betahook"})
+        self.app = self.host.test_client()
+
+    def sent(self):
+        return [r for r in self.mock.request_history
+                if r.method == "POST" and r.path == "/v1/messages"]
+
+    def test_webhooks_target_bot_paths(self):
+        targets = [json.loads(r.text)["targetUrl"]
+                   for r in self.mock.request_history
+                   if r.method == "POST" and r.path == "/v1/webhooks"]
+        self.assertEqual(targets, ["http://host.example.com/bots/alpha",
+                                   "http://host.example.com/bots/beta"])
+
+    def test_route_by_path(self):
+        resp = self.app.post("/bots/alpha", data=webhook())
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(self.alpha.dispatcher.shutdown(5))
+        self.assertEqual(len(self.sent()), 1)
+        self.assertEqual(self.alpha.dispatcher.stats()["submitted"], 1)
+        self.assertEqual(self.beta.dispatcher.stats()["submitted"], 0)
+
+    def test_route_by_webhook_id(self):
+        self.app.post("/", data=webhook(),
+                      headers={"X-Webhook-Id": "betahook"})
+        self.app.post("/", data=webhook(webhook_id="newwebhook"))
+        self.assertEqual(self.alpha.dispatcher.stats()["submitted"], 1)
+        self.assertEqual(self.beta.dispatcher.stats()["submitted"], 1)
+        resp = self.app.post("/", data=webhook(webhook_id="unknown"))
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(self.app.post("/bots/gamma",
+                                       data=webhook()).status_code, 404)
+
+    def test_busy_bot_does_not_starve_others(self):
+        release = threading.Event()
+        self.alpha.remove_command("/echo")
+        self.alpha.add_command("/echo", "blocks", lambda m: release.wait(5))
+        # A bot may hold a quarter of the queue of 4
+        codes = [self.app.post("/bots/alpha",
+                               data=webhook("m%d" % i)).status_code
+                 for i in range(2)]
+        self.assertEqual(codes, [200, 503])
+        self.assertEqual(self.app.post("/bots/beta",
+                                       data=webhook()).status_code, 200)
+        release.set()
+
+    def test_bot_error_is_isolated(self):
+        def fail(*args):
+            raise RuntimeError("boom")
+
+        self.alpha.process_incoming_message = fail
+        self.assertEqual(self.app.post("/bots/alpha",
+                                       data=webhook()).status_code, 500)
+        self.assertEqual(self.app.post("/bots/beta",
+                                       data=webhook()).status_code, 200)
+        health = json.loads(self.app.get("/health").data)
+        self.assertEqual(health["tenants"]["alpha"]["status"], "ready")
+
+    def test_metrics_by_tenant(self):
+        self.app.post("/bots/beta", data=webhook())
+        self.beta.dispatcher.shutdown(5)
+        text = self.app.get("/metrics").data.decode("utf-8")
+        self.assertIn('sparkbot_host_tenant_submitted{tenant="beta"} 1',
+                      text)
+        self.assertIn('sparkbot_webhooks_total{tenant="beta",'
+                      'outcome="queued"} 1', text)
+        self.assertEqual(text.count("# TYPE sparkbot_webhooks_total "), 1)
@@ -0,0 +1,124 @@
+import json
+import logging
+import sys
+import unittest
+
+try:
+    import queue
+except ImportError:  # pragma: no cover - Python 2
+    import Queue as queue
+
+try:
+    # StreamHandler writes native str, which io.StringIO refuses on
+    # Python 2
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+from ciscosparkbot.logs import (JSONFormatter, SamplingFilter, _QueueHandler,
+                                correlation, configure_logging,
+                                get_correlation_id)
+
+
+class Counted(object):
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "counted"
+
+
+class LogsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = StringIO()
+        self.logger = logging.getLogger("ciscosparkbot.tests.logs")
+        self.logger.propagate = False
+
+    def tearDown(self):
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+
+    def configure(self, **kwargs):
+        listener = configure_logging(stream=self.stream,
+                                     logger_name=self.logger.name, **kwargs)
+        self.addCleanup(listener.stop)
+        return listener
+
+    def test_correlation(self):
+        self.assertIsNone(get_correlation_id())
+        with correlation("message1"):
+            self.assertEqual(get_correlation_id(), "message1")
+        self.assertIsNone(get_correlation_id())
+
+    def test_json_records(self):
+        listener = self.configure(json_format=True)
+        with correlation("message1"):
+            self.logger.info("Found command: %s", "/echo",
+                             extra=dict(room="room1"))
+        listener.stop()
+        record = json.loads(self.stream.getvalue())
+        self.assertEqual(record["message"], "Found command: /echo")
+        self.assertEqual(record["correlation_id"], "message1")
+        self.assertEqual(record["room"], "room1")
+        self.assertEqual(record["level"], "INFO")
+        self.assertTrue(record["time"].endswith("Z"))
+
+    def test_lazy_formatting(self):
+        records = queue.Queue()
+        handler = _QueueHandler(records)
+        counted = Counted()
+        record = self.logger.makeRecord(self.logger.name, logging.INFO, "",
+                                        0, "Message content: %s", (counted,),
+                                        None)
+        handler.handle(record)
+        # Queued as is, to be formatted by the listener thread
+        self.assertIs(records.get_nowait(), record)
+        self.assertEqual(counted.formatted, 0)
+
+    def test_full_queue_drops(self):
+        handler = _QueueHandler(queue.Queue(1))
+        for _ in range(3):
+            handler.handle(self.logger.makeRecord(
+                self.logger.name, logging.INFO, "", 0, "x", (), None))
+        self.assertEqual(handler.dropped, 2)
+
+    def test_sampling(self):
+        listener = self.configure(sample_rate=0.5)
+        for i in range(200):
+            with correlation("message%d" % i):
+                self.logger.info("one")
+                self.logger.info("two")
+                self.logger.warning("always")
+        self.logger.info("startup")
+        listener.stop()
+        lines = self.stream.getvalue().splitlines()
+        ones = [line for line in lines if line.endswith(" one")]
+        twos = [line for line in lines if line.endswith(" two")]
+        self.assertEqual(len([line for line in lines if "always" in line]),
+                         200)
+        self.assertTrue(50 < len(ones) < 150)
+        # Records of one message are kept or dropped together
+        self.assertEqual([line.split(" one")[0].split("[")[1]
+                          for line in ones],
+                         [line.split(" two")[0].split("[")[1]
+                          for line in twos])
+        self.assertTrue(lines[-1].endswith("startup"))
+
+    def test_sampling_filter_rates(self):
+        record = logging.LogRecord("x", logging.INFO, "", 0, "", (), None)
+        record.correlation_id = "message"
+        self.assertTrue(SamplingFilter(1.0).filter(record))
+        self.assertFalse(SamplingFilter(0.0).filter(record))
+        record.levelno = logging.ERROR
+        self.assertTrue(SamplingFilter(0.0).filter(record))
+
+    def test_json_formatter_exceptions(self):
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            record = self.logger.makeRecord(
+                self.logger.name, logging.ERROR, "", 0, "failed", (),
+                sys.exc_info())
+        data = json.loads(JSONFormatter().format(record))
+        self.assertIn("ValueError: bad", data["exc_info"])
@@ -0,0 +1,89 @@
+import threading
+import unittest
+from ciscosparkbot.metrics import Metrics, render_all
+
+
+class MetricsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1.0))
+
+    def test_counters(self):
+        self.metrics.inc("webhooks_total", (("outcome", "handled"),))
+        self.metrics.inc("webhooks_total", (("outcome", "handled"),), 2)
+        self.metrics.describe("webhooks_total", "counter", "Webhooks")
+        text = self.metrics.render()
+        self.assertIn("# TYPE sparkbot_webhooks_total counter\n", text)
+        self.assertIn('sparkbot_webhooks_total{outcome="handled"} 3\n', text)
+
+    def test_histogram(self):
+        labels = (("stage", "parse"),)
+        self.metrics.observe("stage_seconds", 0.05, labels)
+        self.metrics.observe("stage_seconds", 0.5, labels)
+        self.metrics.observe("stage_seconds", 5, labels)
+        text = self.metrics.render()
+        self.assertIn(
+            'sparkbot_stage_seconds_bucket{stage="parse",le="0.1"} 1', text)
+        self.assertIn(
+            'sparkbot_stage_seconds_bucket{stage="parse",le="1.0"} 2', text)
+        self.assertIn(
+            'sparkbot_stage_seconds_bucket{stage="parse",le="+Inf"} 3', text)
+        self.assertIn('sparkbot_stage_seconds_count{stage="parse"} 3', text)
+        self.assertIn('sparkbot_stage_seconds_sum{stage="parse"} 5.55', text)
+
+    def test_timer_counts_errors(self):
+        with self.assertRaises(KeyError):
+            with self.metrics.time("stage_seconds", (("stage", "lookup"),)):
+                raise KeyError("x")
+        values, histograms = self.metrics.snapshot()
+        self.assertEqual(values[("errors_total", (("stage", "lookup"),
+                                                  ("type", "KeyError")))], 1)
+        self.assertEqual(
+            histograms[("stage_seconds", (("stage", "lookup"),))][-2], 1)
+
+    def test_threads_are_added_up(self):
+        def work():
+            for _ in range(100):
+                self.metrics.inc("count")
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.metrics.inc("count")
+        values, _ = self.metrics.snapshot()
+        self.assertEqual(values[("count", ())], 401)
+        # Exited threads are folded together, and not counted twice
+        self.assertEqual(len(self.metrics._shards), 1)
+        values, _ = self.metrics.snapshot()
+        self.assertEqual(values[("count", ())], 401)
+
+    def test_exited_threads_retired_without_scrape(self):
+        for _ in range(200):
+            t = threading.Thread(target=self.metrics.inc, args=("count",))
+            t.start()
+            t.join()
+        self.assertLessEqual(len(self.metrics._shards), 64)
+        values, _ = self.metrics.snapshot()
+        self.assertEqual(values[("count", ())], 200)
+
+    def test_collectors(self):
+        self.metrics.add_collector(lambda: [("queue_depth", (), 7)])
+        text = self.metrics.render()
+        self.assertIn("# TYPE sparkbot_queue_depth gauge\n", text)
+        self.assertIn("sparkbot_queue_depth 7\n", text)
+
+    def test_label_escaping(self):
+        self.metrics.inc("x", (("command", 'say "hi"'),))
+        self.assertIn('sparkbot_x{command="say \\"hi\\""} 1',
+                      self.metrics.render())
+
+    def test_render_all_labels_registries(self):
+        other = Metrics(labels=(("tenant", "b"),))
+        self.metrics.inc("webhooks_total")
+        other.inc("webhooks_total", (("outcome", "queued"),))
+        text = render_all([self.metrics, other])
+        self.assertEqual(text.count("# TYPE sparkbot_webhooks_total"), 1)
+        self.assertIn("sparkbot_webhooks_total 1\n", text)
+        self.assertIn('sparkbot_webhooks_total{tenant="b",outcome="queued"} 1',
+                      text)
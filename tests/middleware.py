@@ -0,0 +1,111 @@
+import threading
+import unittest
+from ciscosparkbot.base import BotBase
+from ciscosparkbot.middleware import (CommandContext, Middleware,
+                                      ProfileMiddleware, TimeoutMiddleware,
+                                      TracingMiddleware, build_chain)
+from ciscosparkbot.models import IncomingMessage
+
+
+def context(command="/slow", callback=None):
+    message = IncomingMessage(dict(id="message_id", roomId="room_id",
+                                   text="/slow"))
+    ctx = CommandContext(None, message)
+    ctx.command = command
+    ctx.callback = callback
+    return ctx
+
+
+def run(ctx):
+    ctx.reply = ctx.callback(ctx.message) if ctx.callback else ""
+    ctx.mark("callback")
+    return ctx.reply
+
+
+class ChainTests(unittest.TestCase):
+
+    def test_order(self):
+        calls = []
+
+        def outer(ctx, call_next):
+            calls.append("outer")
+            return call_next(ctx) + "!"
+
+        class Inner(Middleware):
+            def before(self, ctx):
+                calls.append("before")
+
+            def after(self, ctx):
+                calls.append("after %s" % ctx.reply)
+
+        chain = build_chain([outer, Inner()], run)
+        self.assertEqual(chain(context(callback=lambda m: "done")), "done!")
+        self.assertEqual(calls, ["outer", "before", "after done"])
+
+
+class TimeoutMiddlewareTests(unittest.TestCase):
+
+    def test_timeout(self):
+        release = threading.Event()
+        timeouts = TimeoutMiddleware(timeout=5, timeouts={"/slow": 0.05},
+                                     timeout_reply="too slow")
+        self.addCleanup(release.set)
+        self.addCleanup(timeouts.shutdown)
+        chain = build_chain([timeouts], run)
+        self.assertEqual(chain(context(callback=lambda m: release.wait(5))),
+                         "too slow")
+        self.assertEqual(chain(context("/fast", lambda m: "fast")), "fast")
+        self.assertEqual(timeouts.bulkhead.stats()["timeouts"], 1)
+
+    def test_command_timeout_takes_precedence(self):
+        bot = BotBase()
+        bot._init_commands()
+        bot.add_command("/slow", "Slow", lambda m: "slow", timeout=5)
+        bot.add_command("/other", "Other", lambda m: "other")
+        timeouts = TimeoutMiddleware(timeout=0.05)
+        self.addCleanup(timeouts.shutdown)
+        chain = build_chain([timeouts], run)
+        ctx = context(callback=lambda m: "slow")
+        ctx.bot = bot
+        chain(ctx)
+        # Left to the command's own limit, so not moved to the middleware's
+        self.assertEqual(timeouts.bulkhead.stats()["completed"], 0)
+        ctx = context("/other", lambda m: "other")
+        ctx.bot = bot
+        self.assertEqual(chain(ctx), "other")
+        self.assertEqual(timeouts.bulkhead.stats()["completed"], 1)
+
+
+class TracingMiddlewareTests(unittest.TestCase):
+
+    def test_spans(self):
+        spans = []
+        chain = build_chain([TracingMiddleware(exporter=spans.append)], run)
+        chain(context(callback=lambda m: "ok"))
+        with self.assertRaises(ValueError):
+            chain(context(callback=lambda m: int("x")))
+        self.assertEqual([s["status"] for s in spans], ["OK", "ERROR"])
+        attributes = spans[0]["attributes"]
+        self.assertEqual(attributes["sparkbot.command"], "/slow")
+        self.assertEqual(attributes["sparkbot.room_id"], "room_id")
+        self.assertIn("sparkbot.timing.callback", attributes)
+        self.assertEqual(len(spans[0]["trace_id"]), 32)
+
+
+class ProfileMiddlewareTests(unittest.TestCase):
+
+    def test_slow_commands_reported(self):
+        reports = []
+        profiler = ProfileMiddleware(threshold=0, sample_rate=1,
+                                     report=lambda c, t: reports.append(t))
+        chain = build_chain([profiler], run)
+        chain(context(callback=lambda m: sorted(range(1000))))
+        self.assertEqual(len(reports), 1)
+        self.assertIn("function calls", reports[0])
+
+    def test_unsampled(self):
+        reports = []
+        profiler = ProfileMiddleware(threshold=0, sample_rate=0,
+                                     report=lambda c, t: reports.append(t))
+        build_chain([profiler], run)(context(callback=lambda m: "ok"))
+        self.assertEqual(reports, [])
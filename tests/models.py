@@ -1,5 +1,6 @@
+import json
 import unittest
-from ciscosparkbot.models import Response
+from ciscosparkbot.models import IncomingMessage, MultiResponse, Response
 
 
 class ModelTests(unittest.TestCase):
@@ -38,3 +39,121 @@ class ModelTests(unittest.TestCase):
         r = Response()
         r.text = "foo"
         self.assertIn('text', r.as_dict())
+
+    def test_response_as_dict_skips_unset(self):
+        r = Response(markdown="**hi**", roomId="someid")
+        self.assertEqual(r.as_dict(), {"markdown": "**hi**",
+                                       "roomId": "someid"})
+
+    def test_response_attributes_copied(self):
+        attributes = {"text": "hi", "files": ["one"]}
+        r = Response(attributes)
+        r.files = "two"
+        self.assertEqual(attributes["files"], ["one"])
+        self.assertEqual(r.files, ["one", "two"])
+        self.assertEqual(r.attributes["text"], "hi")
+        self.assertIsNone(r.attributes["html"])
+
+    def test_response_attributes_write_through(self):
+        r = Response()
+        r.attributes['text'] = "hi"
+        r.attributes['files'] = "someurl"
+        self.assertEqual(r.as_dict(), {"text": "hi", "files": ["someurl"]})
+        self.assertEqual(dict(r.attributes)["text"], "hi")
+        with self.assertRaises(KeyError):
+            r.attributes['colour'] = "red"
+        r.attributes = {"markdown": "**hi**"}
+        self.assertEqual(r.as_dict(), {"markdown": "**hi**"})
+
+    def test_response_files_not_shared(self):
+        first, second = Response(), Response()
+        first.files = "someurl"
+        self.assertEqual(second.files, [])
+        self.assertNotIn("files", second.as_dict())
+
+    def test_response_full_payload(self):
+        r = Response(toPersonEmail="julie@example.com", parentId="parent",
+                     text="fallback")
+        r.add_card({"type": "AdaptiveCard", "version": "1.0"})
+        d = r.as_dict()
+        self.assertEqual(d["toPersonEmail"], "julie@example.com")
+        self.assertEqual(d["parentId"], "parent")
+        self.assertEqual(d["attachments"][0]["contentType"],
+                         "application/vnd.microsoft.card.adaptive")
+        self.assertEqual(json.loads(r.json()), d)
+
+    def test_response_slots(self):
+        r = Response()
+        with self.assertRaises(AttributeError):
+            r.color = "blue"
+        with self.assertRaises(TypeError):
+            Response(color="blue")
+
+
+class MultiResponseTests(unittest.TestCase):
+
+    def test_broadcast(self):
+        multi = MultiResponse.broadcast(["room1", "room2"], markdown="hi")
+        self.assertEqual([r.as_dict() for r in multi.responses],
+                         [{"roomId": "room1", "markdown": "hi"},
+                          {"roomId": "room2", "markdown": "hi"}])
+
+    def test_results(self):
+        completed = []
+        multi = MultiResponse(on_complete=completed.append)
+        multi.delivery_started(2)
+        multi.record("room1", "message", None)
+        self.assertFalse(multi.wait(0))
+        error = ValueError("no")
+        multi.record("room2", None, error)
+        self.assertTrue(multi.wait(0))
+        self.assertEqual(completed, [multi])
+        self.assertEqual(multi.succeeded, ["room1"])
+        self.assertEqual(multi.failed, ["room2"])
+        self.assertEqual(multi.results["room2"], (None, error))
+
+    def test_nothing_to_send(self):
+        multi = MultiResponse()
+        multi.delivery_started(0)
+        self.assertTrue(multi.wait(0))
+
+
+class IncomingMessageTests(unittest.TestCase):
+
+    data = {"id": "msgid", "roomId": "roomid", "roomType": "group",
+            "personId": "personid", "personEmail": "matt@example.com"}
+
+    class Message(object):
+        text = "/echo hi"
+        markdown = None
+        personId = "personid"
+        created = "2015-10-18T14:26:16+00:00"
+
+    def test_payload_fields_do_not_fetch(self):
+        fetches = []
+        m = IncomingMessage(self.data, fetches.append)
+        self.assertEqual(m.roomId, "roomid")
+        self.assertEqual(m.roomType, "group")
+        self.assertEqual(m.personEmail, "matt@example.com")
+        self.assertEqual(m.mentionedPeople, [])
+        self.assertFalse(m.fetched)
+        self.assertEqual(fetches, [])
+
+    def test_text_fetches_once(self):
+        fetches = []
+
+        def fetch(message_id):
+            fetches.append(message_id)
+            return self.Message()
+        m = IncomingMessage(self.data, fetch)
+        self.assertEqual(m.text, "/echo hi")
+        self.assertEqual(m.created, "2015-10-18T14:26:16+00:00")
+        self.assertTrue(m.fetched)
+        self.assertEqual(fetches, ["msgid"])
+
+    def test_load(self):
+        m = IncomingMessage(self.data)
+        with self.assertRaises(ValueError):
+            m.text
+        m.load(self.Message())
+        self.assertEqual(m.text, "/echo hi")
@@ -0,0 +1,173 @@
+"""A local stand-in for Redis, speaking enough of its protocol for tests"""
+import threading
+import time
+
+from ciscosparkbot import workqueue
+
+try:
+    import socketserver
+except ImportError:  # pragma: no cover - Python 2
+    import SocketServer as socketserver
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            with self.server.lock:
+                reply = self.server.run(args)
+            self.wfile.write(encode(reply))
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return b"-ERR " + str(value).encode("utf-8") + b"\r\n"
+    if value is True:
+        return b"+OK\r\n"
+    if isinstance(value, int):
+        return (":%d\r\n" % value).encode("ascii")
+    if isinstance(value, list):
+        return (("*%d\r\n" % len(value)).encode("ascii") +
+                b"".join(encode(v) for v in value))
+    return ("$%d\r\n" % len(value)).encode("ascii") + value + b"\r\n"
+
+
+class RedisStub(socketserver.ThreadingTCPServer):
+    """
+    Strings with expiry and lists, in memory.  EVAL runs Python stand-ins
+    of the package's Lua scripts.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(self, ("127.0.0.1", 0),
+                                                 _Handler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        t = threading.Thread(target=self.serve_forever, args=(0.01,))
+        t.daemon = True
+        t.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def get(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def run(self, args):
+        command = args[0].upper().decode("ascii")
+        self.commands.append(command)
+        handler = getattr(self, "cmd_" + command.lower(), None)
+        if handler is None:
+            return Exception("unknown command " + command)
+        return handler(*args[1:])
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        if b"NX" in options and self.get(key) is not None:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b"PX" in options:
+            ms = int(options[options.index(b"PX") + 1])
+            self.expires[key] = time.time() + ms / 1000.0
+        return True
+
+    def cmd_get(self, key):
+        return self.get(key)
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self.get(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+        return removed
+
+    def cmd_exists(self, key):
+        return int(self.get(key) is not None)
+
+    def cmd_pexpire(self, key, ms):
+        if self.get(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(ms) / 1000.0
+        return 1
+
+    def cmd_rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    def cmd_lpop(self, key):
+        items = self.get(key)
+        if not items:
+            return None
+        value = items.pop(0)
+        if not items:
+            del self.data[key]
+        return value
+
+    def cmd_lindex(self, key, index):
+        items = self.get(key) or []
+        index = int(index)
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def cmd_lset(self, key, index, value):
+        self.get(key)[int(index)] = value
+        return True
+
+    def cmd_llen(self, key):
+        return len(self.get(key) or [])
+
+    def cmd_eval(self, script, numkeys, *args):
+        numkeys = int(numkeys)
+        keys, argv = args[:numkeys], args[numkeys:]
+        stand_ins = {workqueue.RELEASE_SCRIPT: self._release,
+                     workqueue.ACK_SCRIPT: self._ack,
+                     workqueue.NACK_SCRIPT: self._nack}
+        run = stand_ins.get(script.decode("utf-8"))
+        if run is None:
+            return Exception("unknown script")
+        if self.get(keys[1]) != argv[0]:
+            return 0
+        run(keys, argv)
+        self.cmd_del(keys[1])
+        return 1
+
+    def _release(self, keys, argv):
+        pass
+
+    def _ack(self, keys, argv):
+        self.cmd_lpop(keys[0])
+
+    def _nack(self, keys, argv):
+        if argv[1]:
+            self.cmd_lset(keys[0], 0, argv[1])
+        else:
+            item = self.cmd_lpop(keys[0])
+            if item is not None:
+                self.cmd_rpush(keys[2], item)
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from ciscosparkbot.replycache import ReplyCache
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReplyCacheTests(unittest.TestCase):
+
+    def test_hit_and_expiry(self):
+        clock = Clock()
+        cache = ReplyCache(clock=clock)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "reply %d" % len(calls)
+
+        self.assertEqual(cache.get_or_run(("/s", ""), 10, compute),
+                         ("reply 1", "miss"))
+        self.assertEqual(cache.get_or_run(("/s", ""), 10, compute),
+                         ("reply 1", "hit"))
+        clock.now += 11
+        self.assertEqual(cache.get_or_run(("/s", ""), 10, compute),
+                         ("reply 2", "miss"))
+        self.assertEqual(cache.stats()["hit_rate"], 1 / 3.0)
+
+    def test_size_bound(self):
+        cache = ReplyCache(max_size=2)
+        for key in ("a", "b", "a", "c"):
+            cache.get_or_run(("/s", key), 60, lambda: key)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_run(("/s", "a"), 60, lambda: "new"),
+                         ("a", "hit"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.invalidate("/s")
+        self.assertEqual(len(cache), 0)
+
+    def test_single_flight(self):
+        cache = ReplyCache()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "status"
+
+        def ask():
+            results.append(cache.get_or_run(("/s", ""), 60, compute))
+
+        threads = [threading.Thread(target=ask) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        while cache.stats()["coalesced"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcome for _, outcome in results),
+                         ["coalesced"] * 4 + ["miss"])
+
+    def test_errors_are_shared_not_cached(self):
+        cache = ReplyCache()
+
+        def fail():
+            raise RuntimeError("backend down")
+
+        self.assertRaises(RuntimeError, cache.get_or_run, ("/s", ""), 60,
+                          fail)
+        self.assertEqual(cache.get_or_run(("/s", ""), 60, lambda: "up"),
+                         ("up", "miss"))
@@ -0,0 +1,74 @@
+import unittest
+from ciscosparkbot.router import CommandIndex
+
+
+class CommandIndexTests(unittest.TestCase):
+
+    def test_match_anywhere(self):
+        index = CommandIndex(["/echo", "/help"])
+        self.assertEqual(index.match("BotName /help"), "/help")
+        self.assertEqual(index.match("/echo foo"), "/echo")
+        self.assertIsNone(index.match("nothing to see"))
+        self.assertIsNone(index.match(""))
+        self.assertIsNone(index.match(None))
+
+    def test_longest_match_wins(self):
+        index = CommandIndex(["/echo", "/echoall"])
+        self.assertEqual(index.match("/echoall foo"), "/echoall")
+        self.assertEqual(index.match("/echo foo"), "/echo")
+
+    def test_word_boundaries(self):
+        index = CommandIndex(["/echo", "status"])
+        self.assertIsNone(index.match("/echoall foo"))
+        self.assertIsNone(index.match("the statuses"))
+        self.assertEqual(index.match("what is the status?"), "status")
+
+    def test_search_gives_end(self):
+        index = CommandIndex(["/echo"])
+        self.assertEqual(index.search("/echoall /echo x"), ("/echo", 14))
+        self.assertEqual(index.search("nothing"), (None, None))
+        anchored = CommandIndex(["/echo"], anchored=True)
+        self.assertEqual(anchored.search("  /echo x"), ("/echo", 7))
+
+    def test_leftmost_match_wins(self):
+        index = CommandIndex(["/help", "/echo"])
+        self.assertEqual(index.match("/echo /help"), "/echo")
+        self.assertEqual(index.match("/help /echo"), "/help")
+
+    def test_overlapping_commands(self):
+        index = CommandIndex(["/a", "/ab", "b c"])
+        self.assertEqual(index.match("x/ab c"), "/ab")
+        self.assertEqual(index.match("say b c"), "b c")
+
+    def test_anchored(self):
+        index = CommandIndex(["/echo", "/help"], anchored=True)
+        self.assertEqual(index.match("  /echo foo"), "/echo")
+        self.assertIsNone(index.match("please /echo foo"))
+        self.assertIsNone(index.match("/echoall"))
+
+    def test_add_and_remove(self):
+        index = CommandIndex(["/echo"])
+        self.assertEqual(index.match("/status now"), None)
+        index.add("/status")
+        self.assertEqual(index.match("/status now"), "/status")
+        index.remove("/status")
+        self.assertIsNone(index.match("/status now"))
+        self.assertNotIn("/status", index)
+        self.assertEqual(len(index), 1)
+        with self.assertRaises(KeyError):
+            index.remove("/status")
+
+    def test_remove_keeps_shared_prefix(self):
+        index = CommandIndex(["/echo", "/echoall"])
+        index.remove("/echoall")
+        self.assertEqual(index.match("/echo hi"), "/echo")
+        index.add("/echoall")
+        index.remove("/echo")
+        self.assertEqual(index.match("/echoall hi"), "/echoall")
+        self.assertIsNone(index.match("/echo hi"))
+
+    def test_many_commands(self):
+        commands = ["/cmd%d" % i for i in range(1000)]
+        index = CommandIndex(commands)
+        self.assertEqual(index.match("run /cmd999 now"), "/cmd999")
+        self.assertEqual(index.match("run /cmd10 now"), "/cmd10")
@@ -0,0 +1,118 @@
+import threading
+import unittest
+from ciscosparkbot.scheduler import SendScheduler, TokenBucket
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Throttled(Exception):
+    retry_after = 0.05
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, 3, clock=clock)
+        self.assertTrue(all(bucket.consume() for _ in range(3)))
+        self.assertFalse(bucket.consume())
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        clock.now += 0.5
+        self.assertTrue(bucket.consume())
+
+    def test_pause(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, 10, clock=clock)
+        bucket.pause(2)
+        self.assertAlmostEqual(bucket.delay(), 2)
+        clock.now += 2.1
+        self.assertTrue(bucket.consume())
+
+
+class SendSchedulerTests(unittest.TestCase):
+
+    def make_scheduler(self, send, **kwargs):
+        kwargs.setdefault("rate", 1000)
+        kwargs.setdefault("burst", 1000)
+        kwargs.setdefault("room_rate", 1000)
+        kwargs.setdefault("room_burst", 1000)
+        scheduler = SendScheduler(send, workers=1, **kwargs)
+        self.addCleanup(scheduler.shutdown, 5)
+        return scheduler
+
+    def test_round_robin_between_rooms(self):
+        sent = []
+        gate = threading.Event()
+
+        def send(roomId, text):
+            gate.wait(5)
+            sent.append((roomId, text))
+
+        scheduler = self.make_scheduler(send)
+        for i in range(5):
+            scheduler.submit("chatty", dict(roomId="chatty", text=str(i)))
+        scheduler.submit("quiet", dict(roomId="quiet", text="hi"))
+        scheduler.start()
+        gate.set()
+        self.assertTrue(scheduler.drain(5))
+        self.assertEqual(sent[1], ("quiet", "hi"))
+        self.assertEqual([t for r, t in sent if r == "chatty"],
+                         ["0", "1", "2", "3", "4"])
+
+    def test_room_rate_limit(self):
+        sent = []
+        scheduler = self.make_scheduler(lambda **p: sent.append(p),
+                                        room_rate=20, room_burst=1)
+        scheduler.start()
+        for i in range(3):
+            scheduler.submit("room", dict(text=str(i)))
+        self.assertFalse(scheduler.drain(0.05))
+        self.assertTrue(scheduler.drain(5))
+        self.assertEqual(len(sent), 3)
+
+    def test_retry_after_is_followed(self):
+        calls = []
+
+        def send(**payload):
+            calls.append(payload)
+            if len(calls) == 1:
+                raise Throttled()
+
+        results = []
+        scheduler = self.make_scheduler(send)
+        scheduler.start()
+        scheduler.submit("room", dict(text="hi"),
+                         callback=lambda r, e: results.append(e))
+        self.assertTrue(scheduler.drain(5))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results, [None])
+        stats = scheduler.stats()
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["sent"], 1)
+
+    def test_permanent_failure_is_reported(self):
+        def send(**payload):
+            raise ValueError("bad message")
+
+        results = []
+        scheduler = self.make_scheduler(send)
+        scheduler.start()
+        scheduler.submit("room", dict(text="hi"),
+                         callback=lambda r, e: results.append(e))
+        self.assertTrue(scheduler.drain(5))
+        self.assertIsInstance(results[0], ValueError)
+        self.assertEqual(scheduler.stats()["failed"], 1)
+
+    def test_full_queue_rejects(self):
+        scheduler = SendScheduler(lambda **p: None, max_queue=1)
+        self.assertTrue(scheduler.submit("room", dict(text="1")))
+        self.assertFalse(scheduler.submit("room", dict(text="2")))
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+        self.assertEqual(scheduler.stats()["queue_depth"], 1)
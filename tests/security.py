@@ -0,0 +1,37 @@
+import hashlib
+import hmac
+import unittest
+from ciscosparkbot.security import WebhookVerifier
+
+
+class WebhookVerifierTests(unittest.TestCase):
+
+    body = b'{"data": {"id": "abc"}}'
+
+    def expected(self, secret):
+        return hmac.new(secret, self.body, hashlib.sha1).hexdigest()
+
+    def test_sign_matches_hmac_sha1(self):
+        verifier = WebhookVerifier("s3cret")
+        self.assertEqual(verifier.sign(self.body), self.expected(b"s3cret"))
+
+    def test_verify(self):
+        verifier = WebhookVerifier("s3cret")
+        good = self.expected(b"s3cret")
+        self.assertTrue(verifier.verify(self.body, good))
+        self.assertTrue(verifier.verify(self.body, good.upper()))
+        self.assertFalse(verifier.verify(self.body, self.expected(b"other")))
+        self.assertFalse(verifier.verify(self.body + b" ", good))
+        self.assertFalse(verifier.verify(self.body, None))
+        self.assertFalse(verifier.verify(self.body, u"é" * 40))
+
+    def test_verify_unicode_and_bytes_signatures(self):
+        verifier = WebhookVerifier("s3cret")
+        good = self.expected(b"s3cret")
+        self.assertTrue(verifier.verify(self.body, u"" + good))
+        self.assertTrue(verifier.verify(self.body, good.encode("ascii")))
+        self.assertFalse(verifier.verify(self.body, b"\xff" * 40))
+
+    def test_requires_secret(self):
+        with self.assertRaises(ValueError):
+            WebhookVerifier("")
@@ -0,0 +1,68 @@
+import json
+import threading
+import unittest
+from ciscosparkbot.session import PooledHTTPAdapter, build_spark_api
+from .spark_mock import MockSparkAPI
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover - Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps(MockSparkAPI.me()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledHTTPAdapterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs=dict(poll_interval=0.05))
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/v1/" % self.server.server_port
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        adapter = PooledHTTPAdapter()
+        api = build_spark_api("somefaketoken", base_url=self.url,
+                              adapter=adapter)
+        for _ in range(3):
+            self.assertEqual(api.people.me().id, "myid")
+        stats = adapter.stats.as_dict()
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 2)
+
+    def test_clients_share_an_adapter(self):
+        adapter = PooledHTTPAdapter()
+        first = build_spark_api("token1", base_url=self.url, adapter=adapter)
+        second = build_spark_api("token2", base_url=self.url,
+                                 adapter=adapter)
+        first.people.me()
+        second.people.me()
+        self.assertEqual(adapter.stats.as_dict()["new_connections"], 1)
+
+    def test_configured_timeouts_override(self):
+        adapter = PooledHTTPAdapter(connect_timeout=3, read_timeout=30)
+        self.assertEqual(adapter.request_timeout(60), (3, 30))
+        adapter = PooledHTTPAdapter(read_timeout=30)
+        self.assertEqual(adapter.request_timeout(60), (60, 30))
+        self.assertEqual(adapter.request_timeout((5, 10)), (5, 30))
+        self.assertEqual(PooledHTTPAdapter().request_timeout(60), 60)
@@ -60,6 +60,7 @@ class MockSparkAPI:
               "data": {
                 "id": "incoming_message_id",
                 "roomId": "some_room_id",
+                "roomType": "group",
                 "personId": "some_person_id",
                 "personEmail": "matt@example.com",
                 "created": "2015-10-18T14:26:16.000Z"
@@ -67,6 +68,20 @@ class MockSparkAPI:
         }
         return json.dumps(data)
 
+    @classmethod
+    def incoming_msg_from_bot(cls):
+        data = json.loads(MockSparkAPI.incoming_msg())
+        data['actorId'] = "myid"
+        data['data']['personId'] = "myid"
+        return json.dumps(data)
+
+    @classmethod
+    def incoming_msg_mentioning_bot(cls):
+        data = json.loads(MockSparkAPI.incoming_msg())
+        data['data']['id'] = "mentioning_message_id"
+        data['data']['mentionedPeople'] = ["myid"]
+        return json.dumps(data)
+
     @classmethod
     def get_message_help(cls):
         data = {
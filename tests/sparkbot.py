@@ -1,5 +1,16 @@
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 from ciscosparkbot import SparkBot
+from ciscosparkbot.args import Arg
+from ciscosparkbot.bulkhead import Bulkhead
+from ciscosparkbot.filters import direct_only, mention_only, room_allowlist
+from ciscosparkbot.models import MultiResponse, Response
+from ciscosparkbot.scheduler import SendScheduler
 import requests_mock
 from .spark_mock import MockSparkAPI
 
@@ -12,6 +23,8 @@ class SparkBotTests(unittest.TestCase):
               json=MockSparkAPI.list_webhooks())
         m.post('https://api.ciscospark.com/v1/webhooks',
                json=MockSparkAPI.create_webhook())
+        m.get('https://api.ciscospark.com/v1/people/me',
+              json=MockSparkAPI.me())
         bot_email = "test@test.com"
         spark_token = "somefaketoken"
         bot_url = "http://fakebot.com"
@@ -28,6 +41,7 @@ class SparkBotTests(unittest.TestCase):
                         'help for do something',
                         self.do_something)
         bot.testing = True
+        self.bot = bot
         self.app = bot.test_client()
 
     def do_something(self, incoming_msg):
@@ -44,6 +58,8 @@ class SparkBotTests(unittest.TestCase):
               json=MockSparkAPI.list_webhooks_exist())
         m.post('https://api.ciscospark.com/v1/webhooks',
                json=MockSparkAPI.create_webhook())
+        m.get('https://api.ciscospark.com/v1/people/me',
+              json=MockSparkAPI.me())
 
         bot_email = "test@test.com"
         spark_token = "somefaketoken"
@@ -101,6 +117,222 @@ class SparkBotTests(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn(b"I'm Alive", resp.data)
 
+    @requests_mock.mock()
+    def test_metrics_endpoint(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                      content_type="application/json")
+        resp = self.app.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith("text/plain"))
+        text = resp.data.decode("utf-8")
+        for stage in ("parse", "self_check", "messages_get", "lookup",
+                      "messages_create"):
+            self.assertIn('sparkbot_stage_seconds_count{stage="%s"} 1'
+                          % stage, text)
+        self.assertIn(
+            'sparkbot_callback_seconds_count{command="/echo"} 1', text)
+        self.assertIn('sparkbot_webhooks_total{outcome="handled"} 1', text)
+        self.assertIn('sparkbot_in_flight{kind="webhook"} 0', text)
+        self.assertIn("sparkbot_dedup_misses 1", text)
+
+    @requests_mock.mock()
+    def test_metrics_count_errors(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              status_code=500)
+        with self.assertRaises(Exception):
+            self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                          content_type="application/json")
+        text = self.app.get('/metrics').data.decode("utf-8")
+        self.assertIn('sparkbot_errors_total{stage="messages_get",'
+                      'type="SparkApiError"} 1', text)
+        self.assertIn('sparkbot_errors_total{stage="webhook",'
+                      'type="SparkApiError"} 1', text)
+
+    @requests_mock.mock()
+    def test_middleware(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        seen = []
+
+        def record(context, call_next):
+            reply = call_next(context)
+            seen.append((context.command, reply, sorted(context.timings)))
+            return reply
+
+        self.bot.add_middleware(record)
+        self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                      content_type="application/json")
+        self.assertEqual(seen, [("/echo", " imtheecho",
+                                 ["callback", "fetch", "lookup", "reply"])])
+
+        self.bot.remove_middleware(record)
+        self.assertIsNone(self.bot._middleware_chain)
+
+    @requests_mock.mock()
+    def test_command_limits(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        release = threading.Event()
+        self.addCleanup(release.set)
+        # The same message is posted twice
+        self.bot.dedup_cache = None
+        self.bot.remove_command("/echo")
+        self.bot.add_command("/echo", "slow",
+                             lambda message: release.wait(5),
+                             max_concurrency=1, timeout=0.05,
+                             busy_reply="busy")
+        post = functools.partial(self.app.post, '/',
+                                 data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+        self.assertEqual(post().data, b"Sorry, that took too long.")
+        # The callback that timed out still holds the only slot
+        self.assertEqual(post().data, b"busy")
+        self.assertEqual(m.request_history[-1].json()["markdown"], "busy")
+
+        text = self.app.get('/metrics').data.decode("utf-8")
+        self.assertIn('sparkbot_commands_shed_total{command="/echo",'
+                      'reason="timeout"} 1', text)
+        self.assertIn('sparkbot_commands_shed_total{command="/echo",'
+                      'reason="busy"} 1', text)
+        self.assertIn('sparkbot_bulkhead_saturation{bulkhead="/echo"} 1.0',
+                      text)
+        health = json.loads(self.app.get('/health').data.decode("utf-8"))
+        self.assertEqual(health["bulkheads"]["/echo"]["rejected"], 1)
+        self.assertRaises(ValueError, self.bot.add_command, "/x", "x",
+                          lambda message: "", max_concurrency=1,
+                          bulkhead=Bulkhead("shared"))
+
+    @requests_mock.mock()
+    def test_reply_cache(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        # The same message is posted repeatedly
+        self.bot.dedup_cache = None
+        calls = []
+
+        def status(message):
+            calls.append(message.id)
+            return "all good"
+
+        self.bot.add_command("/echo", "status", status, cache_ttl=60,
+                             cache_key="room")
+        post = functools.partial(self.app.post, '/',
+                                 data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+        self.assertEqual([post().data for _ in range(3)], [b"all good"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(m.request_history), 6)
+        self.assertEqual(list(self.bot.reply_cache._replies),
+                         [("/echo", "imtheecho", "some_room_id")])
+        text = self.app.get('/metrics').data.decode("utf-8")
+        self.assertIn('sparkbot_reply_cache_total{command="/echo",'
+                      'outcome="hit"} 2', text)
+        self.assertIn('sparkbot_reply_cache_hit_rate', text)
+
+        # A busy reply is not cached
+        bulkhead = Bulkhead("status", max_concurrency=1)
+        self.bot.add_command("/echo", "status", status, cache_ttl=60,
+                             bulkhead=bulkhead, busy_reply="busy")
+        bulkhead.acquire()
+        self.assertEqual(post().data, b"busy")
+        bulkhead.release()
+        self.assertEqual(post().data, b"all good")
+        self.assertEqual(len(calls), 2)
+
+    @requests_mock.mock()
+    def test_command_arguments(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        self.bot.dedup_cache = None
+        self.bot.add_command("/echo", "Echo a word",
+                             lambda message: message.args.word.upper(),
+                             args=[Arg("word")])
+        post = functools.partial(self.app.post, '/',
+                                 data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+        self.assertEqual(post().data, b"IMTHEECHO")
+
+        # The message text is "/echo imtheecho", not a number
+        self.bot.add_command("/echo", "Echo a number",
+                             lambda message: "unreachable",
+                             args=[Arg("count", type=int)])
+        self.assertEqual(post().data.decode("utf-8"),
+                         "count must be a whole number, not imtheecho  \n"
+                         "Usage: /echo <count>")
+        text = self.app.get('/metrics').data.decode("utf-8")
+        self.assertIn('sparkbot_commands_rejected_total{command="/echo"} 1',
+                      text)
+
+        # Arguments follow the command where it was found, not the first
+        # occurrence of its text
+        data = MockSparkAPI.get_message_dosomething()
+        data["text"] = "/echoall /echo 3"
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=data)
+        self.bot.add_command("/echo", "Echo a number",
+                             lambda message: "%d" % message.args.count,
+                             args=[Arg("count", type=int)])
+        self.assertEqual(post().data, b"3")
+
+    @requests_mock.mock()
+    def test_session(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        # The same message is posted twice
+        self.bot.dedup_cache = None
+
+        def count(message):
+            message.session["count"] = message.session.get("count", 0) + 1
+            return str(message.session["count"])
+
+        self.bot.add_command("/echo", "count", count)
+        for expected in (b"1", b"2"):
+            resp = self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+            self.assertEqual(resp.data, expected)
+        self.assertEqual(self.bot.session_store.stats()["saves"], 2)
+
+    @requests_mock.mock()
+    def test_session_of_timed_out_command(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def steps(message):
+            message.session["step"] = 1
+            release.wait(5)
+            message.session["step"] = 2
+            return "done"
+
+        self.bot.add_command("/echo", "steps", steps, timeout=0.05)
+        resp = self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                             content_type="application/json")
+        self.assertEqual(resp.data, b"Sorry, that took too long.")
+        # Nothing is saved while the callback still runs
+        self.assertEqual(self.bot.session_store.stats()["saves"], 0)
+        release.set()
+        self.bot.commands["/echo"]["bulkhead"].shutdown(wait=True)
+        self.assertEqual(self.bot.session_store.get("room:some_room_id"),
+                         {"step": 2})
+
+    def test_build_reply_to_person(self):
+        reply = Response(toPersonEmail="julie@example.com", text="hi")
+        self.assertEqual(self.bot.build_reply("some_room_id", reply),
+                         {"toPersonEmail": "julie@example.com",
+                          "text": "hi"})
+        self.assertEqual(self.bot.build_reply("some_room_id", Response(
+            text="hi")), {"roomId": "some_room_id", "text": "hi"})
+
     def test_config_endpoint(self):
         resp = self.app.get('/config')
         self.assertEqual(resp.status_code, 200)
@@ -157,5 +389,296 @@ class SparkBotTests(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         print(resp.data)
 
+    def test_bot_person_id_resolved_at_setup(self):
+        self.assertEqual(self.bot.bot_person_id, "myid")
+
+    @requests_mock.mock()
+    def test_identity_cached_across_messages(self, m):
+        me = m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_help())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        for _ in range(3):
+            resp = self.app.post('/',
+                                 data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(me.call_count, 0)
+
+    @requests_mock.mock()
+    def test_identity_refreshed_after_ttl(self, m):
+        me = m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        self.bot.identity_ttl = 0
+        self.bot.invalidate_identity()
+        self.assertEqual(self.bot.bot_person_id, "myid")
+        self.assertEqual(me.call_count, 1)
+
+    @requests_mock.mock()
+    def test_identity_invalidated_on_auth_error(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              status_code=401, json={"message": "Unauthorized"})
+        with self.assertRaises(Exception):
+            self.app.post('/',
+                          data=MockSparkAPI.incoming_msg(),
+                          content_type="application/json")
+        me = m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        self.assertEqual(self.bot.bot_person_id, "myid")
+        self.assertEqual(me.call_count, 1)
+
+    @requests_mock.mock()
+    def test_self_message_skips_fetch(self, m):
+        fetch = m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+                      json=MockSparkAPI.get_message_help())
+        resp = self.app.post('/',
+                             data=MockSparkAPI.incoming_msg_from_bot(),
+                             content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, b"")
+        self.assertEqual(fetch.call_count, 0)
+
+    @requests_mock.mock()
+    def test_dispatch_mode_returns_before_reply(self, m):
+        m.get('https://api.ciscospark.com/v1/webhooks',
+              json=MockSparkAPI.list_webhooks())
+        m.post('https://api.ciscospark.com/v1/webhooks',
+               json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_help())
+        reply = m.post('//api.ciscospark.com/v1/messages', json={})
+        bot = SparkBot("testbot",
+                       spark_bot_token="somefaketoken",
+                       spark_bot_url="http://fakebot.com",
+                       spark_bot_email="test@test.com",
+                       dispatch_workers=2)
+        bot.testing = True
+        app = bot.test_client()
+        resp = app.post('/',
+                        data=MockSparkAPI.incoming_msg(),
+                        content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(bot.shutdown(5))
+        self.assertEqual(reply.call_count, 1)
+        health = json.loads(app.get('/health').data.decode())
+        self.assertEqual(health["dispatch"]["processed"], 1)
+
+    @requests_mock.mock()
+    def test_replies_through_send_scheduler(self, m):
+        m.get('https://api.ciscospark.com/v1/webhooks',
+              json=MockSparkAPI.list_webhooks())
+        m.post('https://api.ciscospark.com/v1/webhooks',
+               json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_help())
+        reply = m.post('//api.ciscospark.com/v1/messages',
+                       [{"status_code": 429, "json": {},
+                         "headers": {"Retry-After": "0"}},
+                        {"json": {}}])
+        scheduler = SendScheduler()
+        bot = SparkBot("testbot",
+                       spark_bot_token="somefaketoken",
+                       spark_bot_url="http://fakebot.com",
+                       spark_bot_email="test@test.com",
+                       send_scheduler=scheduler)
+        bot.testing = True
+        resp = bot.test_client().post('/',
+                                      data=MockSparkAPI.incoming_msg(),
+                                      content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(bot.shutdown(5))
+        self.assertEqual(reply.call_count, 2)
+        self.assertEqual(scheduler.stats()["throttled"], 1)
+        self.assertEqual(scheduler.stats()["sent"], 1)
+
+    @requests_mock.mock()
+    def test_multi_response(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        sent = m.post('//api.ciscospark.com/v1/messages', json={})
+        m.post('//api.ciscospark.com/v1/messages', status_code=400, json={},
+               additional_matcher=lambda r: r.json()["roomId"] == "room2")
+        multi = MultiResponse.broadcast(["room1", "room2", "room3"],
+                                        markdown="**Alert**")
+        multi.add(Response(text="Sent the alert"))
+        self.bot.add_command("/echo", "broadcast", lambda message: multi)
+
+        resp = self.app.post('/', data=MockSparkAPI.incoming_msg(),
+                             content_type="application/json")
+        self.assertEqual(resp.data, b"ok")
+        self.assertTrue(multi.wait(5))
+        self.assertEqual(sorted(multi.succeeded),
+                         ["room1", "room3", "some_room_id"])
+        self.assertEqual(multi.failed, ["room2"])
+        self.assertEqual(sent.call_count, 3)
+        self.assertTrue(self.bot.shutdown(5))
+
+    @requests_mock.mock()
+    def test_filtered_message_makes_no_api_calls(self, m):
+        self.bot.add_filter(direct_only())
+        resp = self.app.post('/',
+                             data=MockSparkAPI.incoming_msg(),
+                             content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, b"")
+        self.assertEqual(m.call_count, 0)
+
+    @requests_mock.mock()
+    def test_room_allowlist_and_mention_filters(self, m):
+        m.get('//api.ciscospark.com/v1/messages/mentioning_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        self.bot.add_filter(room_allowlist(["some_room_id"]))
+        mentions = mention_only(self.bot)
+        self.bot.add_filter(mentions)
+        resp = self.app.post('/',
+                             data=MockSparkAPI.incoming_msg(),
+                             content_type="application/json")
+        self.assertEqual(m.call_count, 0)
+        resp = self.app.post('/',
+                             data=MockSparkAPI.incoming_msg_mentioning_bot(),
+                             content_type="application/json")
+        self.assertEqual(resp.data, b" imtheecho")
+        self.bot.remove_filter(mentions)
+        self.assertEqual(len(self.bot.filters), 1)
+
+    @requests_mock.mock()
+    def test_repeated_webhook_is_ignored(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        reply = m.post('//api.ciscospark.com/v1/messages', json={})
+        for _ in range(3):
+            resp = self.app.post('/',
+                                 data=MockSparkAPI.incoming_msg(),
+                                 content_type="application/json")
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(reply.call_count, 1)
+        health = json.loads(self.app.get('/health').data.decode())
+        self.assertEqual(health["dedup"]["hits"], 2)
+        self.assertEqual(health["dedup"]["misses"], 1)
+
+    @requests_mock.mock()
+    def test_failed_webhook_can_be_retried(self, m):
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              status_code=500, json={})
+        with self.assertRaises(Exception):
+            self.app.post('/',
+                          data=MockSparkAPI.incoming_msg(),
+                          content_type="application/json")
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        reply = m.post('//api.ciscospark.com/v1/messages', json={})
+        self.app.post('/',
+                      data=MockSparkAPI.incoming_msg(),
+                      content_type="application/json")
+        self.assertEqual(reply.call_count, 1)
+
+    @requests_mock.mock()
+    def test_webhook_secret(self, m):
+        m.get('https://api.ciscospark.com/v1/webhooks',
+              json=MockSparkAPI.list_webhooks())
+        create = m.post('https://api.ciscospark.com/v1/webhooks',
+                        json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        bot = SparkBot("testbot",
+                       spark_bot_token="somefaketoken",
+                       spark_bot_url="http://fakebot.com",
+                       spark_bot_email="test@test.com",
+                       webhook_secret="s3cret")
+        self.assertEqual(create.last_request.json()["secret"], "s3cret")
+        bot.testing = True
+        app = bot.test_client()
+        body = MockSparkAPI.incoming_msg()
+        m.reset_mock()
+
+        resp = app.post('/', data=body, content_type="application/json",
+                        headers={"X-Spark-Signature": "forged"})
+        self.assertEqual(resp.status_code, 403)
+        resp = app.post('/', data=body, content_type="application/json")
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(m.call_count, 0)
+
+        m.get('//api.ciscospark.com/v1/messages/incoming_message_id',
+              json=MockSparkAPI.get_message_dosomething())
+        m.post('//api.ciscospark.com/v1/messages', json={})
+        signature = bot.webhook_verifier.sign(body.encode("utf-8"))
+        resp = app.post('/', data=body, content_type="application/json",
+                        headers={"X-Spark-Signature": signature})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, b" imtheecho")
+
+    @requests_mock.mock()
+    def test_lazy_startup(self, m):
+        bot = SparkBot("testbot",
+                       spark_bot_token="somefaketoken",
+                       spark_bot_url="http://fakebot.com",
+                       spark_bot_email="test@test.com",
+                       startup="lazy")
+        self.assertEqual(m.call_count, 0)
+        self.assertFalse(bot.ready.is_set())
+        bot.testing = True
+        app = bot.test_client()
+
+        # Setup fails while the API is unreachable
+        resp = app.get('/health')
+        self.assertEqual(resp.status_code, 503)
+
+        m.get('https://api.ciscospark.com/v1/webhooks',
+              json=MockSparkAPI.list_webhooks())
+        m.post('https://api.ciscospark.com/v1/webhooks',
+               json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        resp = app.get('/health')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(bot.ready.is_set())
+        self.assertEqual(bot.webhook.id, "newwebhook")
+
+    @requests_mock.mock()
+    def test_background_startup(self, m):
+        m.get('https://api.ciscospark.com/v1/webhooks',
+              json=MockSparkAPI.list_webhooks())
+        m.post('https://api.ciscospark.com/v1/webhooks',
+               json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        bot = SparkBot("testbot",
+                       spark_bot_token="somefaketoken",
+                       spark_bot_url="http://fakebot.com",
+                       spark_bot_email="test@test.com",
+                       startup="background")
+        self.assertTrue(bot.ready.wait(5))
+        self.assertEqual(bot.bot_person_id, "myid")
+
+    @requests_mock.mock()
+    def test_setup_lock_reconciles_once(self, m):
+        listing = m.get('https://api.ciscospark.com/v1/webhooks',
+                        json=MockSparkAPI.list_webhooks())
+        m.post('https://api.ciscospark.com/v1/webhooks',
+               json=MockSparkAPI.create_webhook())
+        m.get('//api.ciscospark.com/v1/people/me', json=MockSparkAPI.me())
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        for _ in range(3):
+            bot = SparkBot("testbot",
+                           spark_bot_token="somefaketoken",
+                           spark_bot_url="http://fakebot.com",
+                           spark_bot_email="test@test.com",
+                           setup_lock_file=os.path.join(lock_dir, "lock"))
+            self.assertEqual(bot.webhook.id, "newwebhook")
+        self.assertEqual(listing.call_count, 1)
+
+    def test_unknown_startup_mode(self):
+        with self.assertRaises(ValueError):
+            SparkBot("testbot",
+                     spark_bot_token="somefaketoken",
+                     spark_bot_url="http://fakebot.com",
+                     spark_bot_email="test@test.com",
+                     startup="sometime")
+
+    def test_invalid_payload_rejected(self):
+        resp = self.app.post('/',
+                             data='{"data": {}}',
+                             content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+
     def tearDown(self):
         pass
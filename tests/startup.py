@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ciscosparkbot.startup import SetupLock
+
+
+class SetupLockTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "bot.setup")
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def setup(self):
+        self.calls.append(1)
+        return {"id": "webhook%d" % len(self.calls)}
+
+    def test_setup_runs_once_per_key(self):
+        first = SetupLock(self.path)
+        second = SetupLock(self.path)
+        self.assertEqual(first.run("key", self.setup), {"id": "webhook1"})
+        self.assertEqual(second.run("key", self.setup), {"id": "webhook1"})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.run("other", self.setup), {"id": "webhook2"})
+
+    def test_expired_result_runs_again(self):
+        lock = SetupLock(self.path, ttl=0)
+        lock.run("key", self.setup)
+        lock.run("key", self.setup)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_failed_setup_is_not_recorded(self):
+        def fail():
+            raise RuntimeError("no network")
+        lock = SetupLock(self.path)
+        with self.assertRaises(RuntimeError):
+            lock.run("key", fail)
+        self.assertEqual(lock.run("key", self.setup), {"id": "webhook1"})
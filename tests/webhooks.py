@@ -0,0 +1,131 @@
+import unittest
+import requests_mock
+from ciscosparkapi import CiscoSparkAPI
+from ciscosparkbot.webhooks import WebhookReconciler, WebhookSpec, plan
+
+WEBHOOKS_URL = "https://api.ciscospark.com/v1/webhooks"
+
+
+def hook(hook_id, name, target_url="http://fakebot.com", **fields):
+    data = dict(id=hook_id, name=name, targetUrl=target_url,
+                resource="messages", event="created", status="active")
+    data.update(fields)
+    return data
+
+
+class PlanTests(unittest.TestCase):
+
+    def test_missing_webhook_is_created(self):
+        spec = WebhookSpec("testbot", "http://fakebot.com")
+        creates, updates, deletes, unchanged = plan(
+            [spec], [hook("other", "someone else", "http://other.com")])
+        self.assertEqual(creates, [spec])
+        self.assertEqual((updates, deletes, unchanged), ([], [], []))
+
+    def test_duplicates_are_deleted(self):
+        spec = WebhookSpec("testbot", "http://fakebot.com")
+        hooks = [hook("a", "testbot", "http://old.com"),
+                 hook("b", "testbot"),
+                 hook("c", "testbot")]
+        creates, updates, deletes, unchanged = plan([spec], hooks)
+        self.assertEqual(unchanged, [(spec, hooks[1])])
+        self.assertEqual([h["id"] for h in deletes], ["a", "c"])
+        self.assertEqual((creates, updates), ([], []))
+
+    def test_changed_target_is_updated(self):
+        spec = WebhookSpec("testbot", "http://fakebot.com")
+        existing = hook("a", "testbot", "http://old.com")
+        creates, updates, deletes, unchanged = plan([spec], [existing])
+        self.assertEqual(updates, [(spec, existing)])
+
+    def test_secret_switched_on_is_sent(self):
+        spec = WebhookSpec("testbot", "http://fakebot.com", secret="s3cret")
+        # Spark doesn't return the secret, so the webhook may have none
+        existing = hook("a", "testbot")
+        creates, updates, deletes, unchanged = plan([spec], [existing])
+        self.assertEqual(updates, [(spec, existing)])
+        self.assertEqual(spec.update_args("a")["secret"], "s3cret")
+        # Shown and equal, it is left alone
+        creates, updates, deletes, unchanged = plan(
+            [spec], [hook("a", "testbot", secret="s3cret")])
+        self.assertEqual(updates, [])
+
+    def test_changed_subscription_is_replaced(self):
+        spec = WebhookSpec("testbot", "http://fakebot.com",
+                           resource="memberships")
+        existing = hook("a", "testbot")
+        creates, updates, deletes, unchanged = plan([spec], [existing])
+        self.assertEqual(creates, [spec])
+        self.assertEqual(deletes, [existing])
+
+    def test_renamed_webhook_is_reused(self):
+        spec = WebhookSpec("newname", "http://fakebot.com")
+        existing = hook("a", "oldname")
+        creates, updates, deletes, unchanged = plan([spec], [existing])
+        self.assertEqual(updates, [(spec, existing)])
+        self.assertEqual((creates, deletes), ([], []))
+
+    def test_several_webhooks(self):
+        specs = [WebhookSpec("messages", "http://fakebot.com"),
+                 WebhookSpec("rooms", "http://fakebot.com",
+                             resource="memberships")]
+        hooks = [hook("a", "messages"),
+                 hook("b", "rooms", resource="memberships")]
+        creates, updates, deletes, unchanged = plan(specs, hooks)
+        self.assertEqual(len(unchanged), 2)
+
+
+class WebhookReconcilerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.api = CiscoSparkAPI(access_token="somefaketoken")
+
+    @requests_mock.mock()
+    def test_reconcile(self, m):
+        listing = m.get(WEBHOOKS_URL, [
+            dict(json=dict(items=[hook("a", "testbot"),
+                                  hook("x", "someone else")]),
+                 headers={"Link": '<%s?max=100&cursor=2>; rel="next"'
+                                  % WEBHOOKS_URL}),
+            dict(json=dict(items=[hook("b", "testbot")])),
+        ])
+        create = m.post(WEBHOOKS_URL, json=hook("new", "rooms",
+                                                resource="memberships"))
+        delete = m.delete(WEBHOOKS_URL + "/b", status_code=204)
+
+        reconciler = WebhookReconciler(self.api)
+        result = reconciler.reconcile([
+            WebhookSpec("testbot", "http://fakebot.com"),
+            WebhookSpec("rooms", "http://fakebot.com",
+                        resource="memberships")])
+
+        self.assertEqual(listing.call_count, 2)
+        self.assertIn("max=100", listing.request_history[0].url)
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(delete.call_count, 1)
+        self.assertEqual(result.as_dict(),
+                         dict(created=1, updated=0, deleted=1, unchanged=1,
+                              errors=0, api_calls=4))
+        self.assertEqual(result.webhooks["testbot"].id, "a")
+        self.assertEqual(result.webhooks["rooms"].id, "new")
+
+    @requests_mock.mock()
+    def test_failed_update_keeps_existing(self, m):
+        m.get(WEBHOOKS_URL, json=dict(items=[hook("a", "testbot",
+                                                  "http://old.com")]))
+        m.put(WEBHOOKS_URL + "/a", status_code=500)
+
+        result = WebhookReconciler(self.api).reconcile([
+            WebhookSpec("testbot", "http://fakebot.com")])
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], "update")
+        self.assertEqual(result.webhooks["testbot"].id, "a")
+        self.assertEqual(result.api_calls, 2)
+
+    @requests_mock.mock()
+    def test_nothing_to_do(self, m):
+        m.get(WEBHOOKS_URL, json=dict(items=[hook("a", "testbot")]))
+        result = WebhookReconciler(self.api).reconcile([
+            WebhookSpec("testbot", "http://fakebot.com")])
+        self.assertEqual(result.api_calls, 1)
+        self.assertEqual(result.unchanged, ["testbot"])
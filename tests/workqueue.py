@@ -0,0 +1,185 @@
+import json
+import re
+import time
+import unittest
+import requests_mock
+from ciscosparkbot import SparkBot
+from ciscosparkbot.workqueue import (MemoryWorkQueue, RedisWorkQueue,
+                                     RespClient, Worker, build_ingress)
+from .redis_stub import RedisStub
+from .spark_mock import MockSparkAPI
+
+
+def webhook(message_id, room_id="room1"):
+    data = json.loads(MockSparkAPI.incoming_msg())
+    data["data"]["id"] = message_id
+    data["data"]["roomId"] = room_id
+    return data
+
+
+class QueueTests(object):
+    """Behaviour every WorkQueue has"""
+
+    def make_queue(self, **options):
+        raise NotImplementedError
+
+    def test_rooms_are_handled_in_order(self):
+        queue = self.make_queue()
+        for message_id in ("a1", "a2"):
+            queue.put(webhook(message_id, "roomA"))
+        queue.put(webhook("b1", "roomB"))
+
+        first = queue.get("c1", 0)
+        second = queue.get("c2", 0)
+        self.assertEqual(sorted([first.message_id, second.message_id]),
+                         ["a1", "b1"])
+        # Both rooms are held until acked
+        self.assertIsNone(queue.get("c3", 0))
+        held = first if first.message_id == "a1" else second
+        self.assertTrue(queue.ack(held))
+        self.assertEqual(queue.get("c3", 0).message_id, "a2")
+
+    def test_nack_redelivers_then_gives_up(self):
+        queue = self.make_queue(max_attempts=2)
+        queue.put(webhook("a1"))
+        queue.put(webhook("a2"))
+        delivery = queue.get("c1", 0)
+        queue.nack(delivery)
+        again = queue.get("c1", 0)
+        self.assertEqual((again.message_id, again.attempts), ("a1", 1))
+        queue.nack(again)
+        self.assertEqual(queue.get("c1", 0).message_id, "a2")
+        self.assertEqual(queue.stats()["dead"], 1)
+
+
+class MemoryWorkQueueTests(QueueTests, unittest.TestCase):
+
+    def make_queue(self, **options):
+        return MemoryWorkQueue(**options)
+
+    def test_full_queue_rejects(self):
+        queue = MemoryWorkQueue(max_size=1)
+        self.assertTrue(queue.put(webhook("a1")))
+        self.assertFalse(queue.put(webhook("a2")))
+
+
+class RedisWorkQueueTests(QueueTests, unittest.TestCase):
+
+    def setUp(self):
+        self.redis = RedisStub()
+        self.redis.start()
+        self.client = RespClient("127.0.0.1", self.redis.port)
+        self.addCleanup(self.redis.stop)
+        self.addCleanup(self.client.close)
+
+    def make_queue(self, **options):
+        return RedisWorkQueue(self.client, poll_interval=0.01, **options)
+
+    def test_expired_lease_is_redelivered(self):
+        queue = self.make_queue(lease=0.05)
+        queue.put(webhook("a1"))
+        first = queue.get("c1", 0)
+        time.sleep(0.1)
+        second = queue.get("c2", 0)
+        self.assertEqual(second.message_id, "a1")
+        # The first worker lost the partition
+        self.assertFalse(queue.ack(first))
+        self.assertTrue(queue.ack(second))
+        self.assertEqual(queue.stats()["queued"], 0)
+
+    def test_late_worker_leaves_new_holder_alone(self):
+        queue = self.make_queue(lease=0.05)
+        queue.put(webhook("a1"))
+        queue.put(webhook("a2"))
+        first = queue.get("c1", 0)
+        time.sleep(0.1)
+        second = queue.get("c2", 0)
+        # The late nack neither changes the item nor frees the partition
+        queue.nack(first)
+        self.assertEqual(second.attempts, 0)
+        self.assertIsNone(queue.get("c3", 0))
+        self.assertTrue(queue.ack(second))
+        self.assertEqual(queue.get("c3", 0).message_id, "a2")
+
+    def test_resp_client(self):
+        run = self.client.execute_command
+        self.assertEqual(run("SET", "k", "v"), b"OK")
+        self.assertEqual(run("GET", "k"), b"v")
+        self.assertIsNone(run("GET", "missing"))
+        self.assertEqual(run("RPUSH", "l", "x", "y"), 2)
+        self.assertRaises(RuntimeError, run, "NOPE")
+
+
+class WorkerTests(unittest.TestCase):
+
+    def setUp(self):
+        mock = requests_mock.Mocker()
+        mock.start()
+        self.addCleanup(mock.stop)
+        mock.get('https://api.ciscospark.com/v1/people/me',
+                 json=MockSparkAPI.me())
+        mock.get(re.compile('https://api.ciscospark.com/v1/messages/.*'),
+                 json=MockSparkAPI.get_message_dosomething())
+        mock.post('https://api.ciscospark.com/v1/messages', json={})
+        self.mock = mock
+
+        self.queue = MemoryWorkQueue()
+        self.ingress = build_ingress("testbot", "somefaketoken",
+                                     "test@test.com", "http://fakebot.com",
+                                     self.queue)
+        self.bot = SparkBot("testbot", spark_bot_token="somefaketoken",
+                            spark_bot_email="test@test.com",
+                            spark_bot_url="http://fakebot.com",
+                            startup="lazy")
+        self.worker = Worker(self.bot, self.queue, setup=False)
+
+    def sent(self):
+        return [r for r in self.mock.request_history
+                if r.method == "POST" and r.path == "/v1/messages"]
+
+    def test_ingress_only_enqueues(self):
+        app = self.ingress.test_client()
+        resp = app.post("/", data=json.dumps(webhook("m1")))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.queue.stats()["queued"], 1)
+        self.assertEqual(self.mock.request_history, [])
+
+    def test_duplicate_is_handled_once(self):
+        app = self.ingress.test_client()
+        for _ in range(2):
+            app.post("/", data=json.dumps(webhook("m1")))
+        self.assertTrue(self.worker.process("c1", 0))
+        self.assertTrue(self.worker.process("c1", 0))
+        self.assertFalse(self.worker.process("c1", 0))
+        stats = self.worker.stats()
+        self.assertEqual((stats["handled"], stats["duplicates"]), (1, 1))
+        self.assertEqual(len(self.sent()), 1)
+
+    def test_failed_message_is_retried(self):
+        calls = []
+
+        def flaky(message):
+            calls.append(message.id)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return "done"
+
+        self.bot.remove_command("/echo")
+        self.bot.add_command("/echo", "flaky", flaky)
+        self.queue.put(webhook("m1"))
+        self.worker.process("c1", 0)
+        self.worker.process("c1", 0)
+        self.assertEqual(calls, ["m1", "m1"])
+        self.assertEqual(self.worker.stats()["failed"], 1)
+        self.assertEqual(len(self.sent()), 1)
+
+    def test_threads(self):
+        for i in range(5):
+            self.queue.put(webhook("m%d" % i, "room%d" % (i % 2)))
+        self.worker.poll_timeout = 0.01
+        self.worker.start()
+        deadline = time.time() + 5
+        while self.worker.stats()["handled"] < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        self.worker.stop(5)
+        self.assertEqual(self.worker.stats()["handled"], 5)